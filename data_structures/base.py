@@ -1,26 +1,109 @@
-from abc import ABC
-from collections.abc import MutableMapping
+from abc import ABC, ABCMeta
+from array import array
+from collections.abc import Mapping, MutableMapping
 from datetime import datetime, date
+import hashlib
 import json
 import os
-from typing import Any
+import struct
+import sys
+from types import MappingProxyType
+from typing import Any, Dict
+
+
+# the value of an unset field
+MISSING = object()
 
 
 def dict_equal_with_debug(a: Any, b: Any) -> bool:
     # this is really just for testing so far
-    if isinstance(b, type(a)):
-        if a.__dict__ != b.__dict__:
-            for attr, value in a.__dict__.items():
-                if a.__dict__[attr] != b.__dict__[attr]:
-                    if 'TEST' in os.environ and int(os.environ['TEST']) == 1:
-                        print('%s\t%s != %s' % (attr,
-                                                a.__dict__[attr],
-                                                b.__dict__[attr]))
-        else:
-            return True
+    if not isinstance(b, type(a)):
+        return False
+    a_attrs = get_attrs(a)
+    b_attrs = get_attrs(b)
+    if a_attrs == b_attrs:
+        return True
+    # only walk the attributes if there is someone to tell
+    if 'TEST' in os.environ and int(os.environ['TEST']) == 1:
+        for attr, value in a_attrs.items():
+            if value != b_attrs.get(attr):
+                print('%s\t%s != %s' % (attr, value, b_attrs.get(attr)))
     return False
 
 
+def get_attrs(obj: Any) -> Dict[str, Any]:
+    # slotted classes have no __dict__, but define __getstate__ as a dict
+    if hasattr(obj, '__dict__'):
+        if '_cache' in obj.__dict__:
+            # cached values are derived, not content
+            return {k: v for k, v in obj.__dict__.items() if k != '_cache'}
+        return obj.__dict__
+    return obj.__getstate__()
+
+
+def get_digest(value: Any) -> bytes:
+    """Stable digest of a value's content.
+
+    Unlike `hash`, it is the same across processes and runs, so it can be
+    stored, e.g. to find records seen before.
+
+    Args:
+        value: None, bool, int, float, str, bytes, date, datetime, array, or
+          a list, tuple, set or mapping of those, or an object with a
+          `digest`.
+
+    Returns:
+        16 bytes.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    update_digest(h, value)
+    return h.digest()
+
+
+def update_digest(h, value: Any):
+    # each value is tagged with its type, and sized where it varies
+    if value is None:
+        h.update(b'N')
+    elif isinstance(value, bool):
+        h.update(b'T' if value else b'F')
+    elif isinstance(value, int):
+        h.update(b'i%d;' % value)
+    elif isinstance(value, float):
+        h.update(b'f' + repr(value).encode() + b';')
+    elif isinstance(value, str):
+        encoded = value.encode('utf-8', 'surrogatepass')
+        h.update(b's' + struct.pack('<Q', len(encoded)) + encoded)
+    elif isinstance(value, bytes):
+        h.update(b'b' + struct.pack('<Q', len(value)) + value)
+    elif isinstance(value, datetime):
+        h.update(b'd' + value.isoformat().encode() + b';')
+    elif isinstance(value, date):
+        h.update(b'D' + value.isoformat().encode() + b';')
+    elif isinstance(value, array):
+        if sys.byteorder == 'big':
+            value = array(value.typecode, value)
+            value.byteswap()
+        h.update(b'a' + value.typecode.encode()
+                 + struct.pack('<Q', len(value)) + value.tobytes())
+    elif isinstance(getattr(value, 'digest', None), bytes):
+        h.update(b'o' + value.digest)
+    elif isinstance(value, (list, tuple)):
+        h.update(b'l' + struct.pack('<Q', len(value)))
+        for x in value:
+            update_digest(h, x)
+    elif isinstance(value, (set, frozenset)):
+        h.update(b'e' + struct.pack('<Q', len(value)))
+        for x in sorted(get_digest(x) for x in value):
+            h.update(x)
+    elif isinstance(value, Mapping):
+        h.update(b'm' + struct.pack('<Q', len(value)))
+        for key in sorted(value, key=get_digest):
+            update_digest(h, key)
+            update_digest(h, value[key])
+    else:
+        raise TypeError(f'Cannot digest {type(value)}.')
+
+
 def json_serial(obj):
     """JSON serializer for objects not serializable by default json code.
 
@@ -37,30 +120,174 @@ def json_serial(obj):
         raise TypeError("Type %s not serializable" % type(obj))
 
 
-class DataBase(MutableMapping, ABC):
+class SchemaMeta(ABCMeta):
+    """Turns the `_fields` a record class declares into slots.
+
+    A slot is a descriptor on the class, so reading `tweet.text` costs no
+    more than reading a plain attribute, and records hold no `__dict__`.
+    Fields are inherited, and a subclass only declares the ones it adds.
+    Slots that are not fields can still be declared in `__slots__`.
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        fields = tuple(namespace.get('_fields', ()))
+        inherited = tuple(x for base in bases
+                          for x in getattr(base, '_schema', ()))
+        for field in fields:
+            if field in inherited or any(hasattr(x, field) for x in bases):
+                raise TypeError(f'Field {field} of {name} clashes with an '
+                                f'existing attribute.')
+        namespace['__slots__'] = fields + tuple(namespace.get('__slots__', ()))
+        cls = super().__new__(mcs, name, bases, namespace, **kwargs)
+        cls._schema = inherited + fields
+        cls._field_set = frozenset(cls._schema)
+        return cls
+
+
+class DataBase(MutableMapping, ABC, metaclass=SchemaMeta):
+    """Record with declared fields, also usable as a mapping.
+
+    Subclasses list their fields in `_fields`, in the order they are
+    serialized, and each becomes a slot read and written as an attribute.
+    Keys that are not fields, e.g. passed to `__init__` as extra kwargs, are
+    kept in a dict on the side, so `record[key]` works for both.
+    """
+    __slots__ = ('_extra', '_cache')
     # https://stackoverflow.com/questions/3387691/how-to-perfectly-override-a-dict
 
     def __init__(self, *args, **kwargs):
-        self.store = dict()
-        self.update(dict(*args, **kwargs))
+        if args:
+            kwargs = dict(*args, **kwargs)
+        set_attr = object.__setattr__
+        set_attr(self, '_cache', None)
+        set_attr(self, '_extra', None)
+        fields = self._field_set
+        for key, value in kwargs.items():
+            if key in fields:
+                set_attr(self, key, value)
+            else:
+                self._set_extra(key, value)
 
     def __eq__(self, other):
+        if not isinstance(other, type(self)):
+            return False
+        # digests are only compared once known, as computing them costs more
+        # than a single comparison
+        if self._cache and 'digest' in self._cache \
+                and other._cache and 'digest' in other._cache:
+            return self.digest == other.digest
         return dict_equal_with_debug(self, other)
 
+    def __hash__(self):
+        return int.from_bytes(self.digest[:8], 'little')
+
+    def __contains__(self, key: Any) -> bool:
+        # the Mapping mixin would go through `__getitem__` and catch KeyError
+        if key in self._field_set:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
     def __getitem__(self, key: str) -> Any:
-        return self.store[key]
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
 
     def __setitem__(self, key: str, value: Any):
-        self.store[key] = value
+        if key in self._field_set:
+            object.__setattr__(self, key, value)
+        else:
+            self._set_extra(key, value)
+        self.invalidate()
 
     def __delitem__(self, key: str) -> None:
-        del self.store[key]
+        if key in self._field_set:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+        self.invalidate()
+
+    def __setattr__(self, name: str, value: Any):
+        object.__setattr__(self, name, value)
+        if self._cache is not None:
+            self.invalidate()
 
     def __iter__(self):
-        return iter(self.store)
+        for field in self._schema:
+            if hasattr(self, field):
+                yield field
+        if self._extra:
+            yield from self._extra
 
     def __len__(self) -> int:
-        return len(self.store)
+        return sum(1 for _ in self)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self._get_store()
+
+    def __setstate__(self, state: Dict[str, Any]):
+        # records pickled before fields were slots kept everything in `store`
+        if 'store' in state and set(state) <= {'store', '_cache'}:
+            state = state['store']
+        DataBase.__init__(self, **state)
+
+    @property
+    def digest(self) -> bytes:
+        """Digest of the record's type and content, computed once.
+
+        Setting or deleting a key clears it; after changing a value in place,
+        e.g. appending to a list, call `invalidate`.
+        """
+        if self._cache is None:
+            object.__setattr__(self, '_cache', {})
+        if 'digest' not in self._cache:
+            self._cache['digest'] = get_digest(
+                (type(self).__name__, self._get_store()))
+        return self._cache['digest']
+
+    @property
+    def store(self) -> MappingProxyType:
+        """Read only copy of the fields and extra keys.
+
+        Records no longer keep a dict, so change them through the record
+        itself, e.g. `record[key] = value`.
+        """
+        return MappingProxyType(self._get_store())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # the Mapping mixin would go through `__getitem__` and catch KeyError
+        if key in self._field_set:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def invalidate(self):
+        object.__setattr__(self, '_cache', None)
+
+    def _get_store(self) -> Dict[str, Any]:
+        store = {}
+        for field in self._schema:
+            value = getattr(self, field, MISSING)
+            if value is not MISSING:
+                store[field] = value
+        if self._extra:
+            store.update(self._extra)
+        return store
+
+    def _set_extra(self, key: str, value: Any):
+        if self._extra is None:
+            object.__setattr__(self, '_extra', {})
+        self._extra[key] = value
 
     def to_json(self) -> str:
-        return json.dumps(self.store, default=json_serial)
+        return json.dumps(self._get_store(), default=json_serial)
@@ -0,0 +1,233 @@
+"""Near-duplicate detection with MinHash and locality sensitive hashing.
+
+Each text is reduced to a set of shingles, and the set to a MinHash
+signature, whose agreement with another estimates their Jaccard similarity.
+Signatures are split into bands, and texts sharing any band end up in the
+same bucket, so a new text is only compared with the few clusters it
+collides with rather than with everything seen so far.
+
+Works on anything with text, e.g. `Tweet`, `YouTubeComment` or the tokens of
+an `nlp.Document`, see `get_text_shingles` and `get_token_shingles`.
+"""
+import re
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, \
+    Optional, Set, Tuple
+import zlib
+
+import numpy as np
+
+
+# modulus of the hash functions, a Mersenne prime
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+WHITESPACE = re.compile(r'\s+')
+
+
+class LshIndex:
+    """Incremental index assigning each added text to a cluster.
+
+    A text joins the cluster of the first candidate whose first member it
+    resembles with an estimated Jaccard similarity of at least `threshold`,
+    or starts a new one. Buckets hold cluster ids rather than every member,
+    so thousands of copies of a text cost no more to match against than one.
+
+    Args:
+        threshold: Float. Minimum Jaccard similarity of near duplicates.
+        num_perm: Int. Number of hash functions in a signature. More are
+          more accurate, but slower.
+        bands: Int. Number of bands. Chosen to suit `threshold` if None.
+        seed: Int. Seed of the hash functions. Indexes can only share
+          signatures if they use the same seed and `num_perm`.
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.8,
+            num_perm: int = 128,
+            bands: Optional[int] = None,
+            seed: int = 1
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError(f'threshold must be in (0, 1], got {threshold}.')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        if bands is None:
+            bands, rows = get_bands(threshold, num_perm)
+        else:
+            rows = num_perm // bands
+        if bands < 1 or rows < 1:
+            raise ValueError(f'Cannot split {num_perm} hashes into {bands} '
+                             f'bands.')
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, PRIME, num_perm, dtype=np.uint64)
+        # band key -> cluster ids, for each band
+        self.buckets = [{} for _ in range(bands)]
+        # the signature of the first member of each cluster
+        self.signatures = []
+        self.sizes = []
+        self.clusters = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.clusters
+
+    def __len__(self):
+        return len(self.clusters)
+
+    @property
+    def num_clusters(self) -> int:
+        return len(self.signatures)
+
+    def add(self, key: Hashable, shingles: Set[str]) -> int:
+        """Add a text to the index.
+
+        Args:
+            key: a unique key for the text, e.g. the id of its record.
+            shingles: Set of strings, from `get_text_shingles` or
+              `get_token_shingles`.
+
+        Returns:
+            Int, the id of the cluster the text was assigned to.
+        """
+        if key in self.clusters:
+            raise ValueError(f'Key already in index: {key}.')
+        signature = self.signature(shingles)
+        band_keys = self._band_keys(signature)
+        cluster_id = self._find(signature, band_keys)
+        if cluster_id is None:
+            cluster_id = len(self.signatures)
+            self.signatures.append(signature)
+            self.sizes.append(0)
+        for bucket, band_key in zip(self.buckets, band_keys):
+            cluster_ids = bucket.setdefault(band_key, [])
+            if cluster_id not in cluster_ids:
+                cluster_ids.append(cluster_id)
+        self.sizes[cluster_id] += 1
+        self.clusters[key] = cluster_id
+        return cluster_id
+
+    def cluster_of(self, key: Hashable) -> int:
+        return self.clusters[key]
+
+    def query(self, shingles: Set[str]) -> Optional[int]:
+        """The cluster a text would be assigned to, without adding it."""
+        signature = self.signature(shingles)
+        return self._find(signature, self._band_keys(signature))
+
+    def signature(self, shingles: Set[str]) -> np.ndarray:
+        # min over the shingles of each hash function, as uint32
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        if shingles:
+            values = np.array(
+                [zlib.crc32(x.encode('utf-8')) for x in shingles],
+                dtype=np.uint64)
+            # products wrap around at 2 ** 64, which is fine for hashing
+            hashes = (np.outer(values, self.a) + self.b) % np.uint64(PRIME)
+            np.minimum(signature, hashes.min(axis=0) & np.uint64(MAX_HASH),
+                       out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes()
+                for i in range(self.bands)]
+
+    def _find(
+            self,
+            signature: np.ndarray,
+            band_keys: List[bytes]
+    ) -> Optional[int]:
+        # check candidates in the order first found
+        seen = set()
+        for bucket, band_key in zip(self.buckets, band_keys):
+            for cluster_id in bucket.get(band_key, ()):
+                if cluster_id in seen:
+                    continue
+                seen.add(cluster_id)
+                similarity = np.count_nonzero(
+                    self.signatures[cluster_id] == signature) / self.num_perm
+                if similarity >= self.threshold:
+                    return cluster_id
+        return None
+
+
+#
+# functions
+#
+
+
+def deduplicate(
+        records: Iterable[Any],
+        get_text: Callable[[Any], str] = lambda x: x['text'],
+        get_key: Callable[[Any], Hashable] = lambda x: x['id'],
+        index: Optional[LshIndex] = None,
+        shingle_size: int = 5
+) -> Iterator[Any]:
+    """Drop records whose text nearly duplicates that of an earlier one.
+
+    Args:
+        records: Iterable of records, e.g. Tweets or YouTubeComments,
+          consumed lazily.
+        get_text: function giving the text of a record.
+        get_key: function giving the unique key of a record.
+        index: LshIndex to add to, to deduplicate across several calls.
+          Defaults to a new one with the default threshold.
+        shingle_size: Int. Passed on to `get_text_shingles`.
+
+    Yields:
+        The first record of each cluster.
+    """
+    index = LshIndex() if index is None else index
+    for record in records:
+        num_clusters = index.num_clusters
+        index.add(get_key(record),
+                  get_text_shingles(get_text(record), shingle_size))
+        if index.num_clusters > num_clusters:
+            yield record
+
+
+def get_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    # the chance that texts of similarity s collide, 1 - (1 - s^r)^b, rises
+    # most steeply at about (1 / b)^(1 / r), so put that at the threshold
+    best = None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def get_text_shingles(text: str, size: int = 5) -> Set[str]:
+    """Character shingles of a text, ignoring case and runs of whitespace.
+
+    Args:
+        text: String.
+        size: Int. Characters per shingle. Texts shorter than this are one
+          shingle.
+
+    Returns:
+        Set of strings.
+    """
+    text = WHITESPACE.sub(' ', text.lower()).strip()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def get_token_shingles(tokens: Iterable[str], size: int = 2) -> Set[str]:
+    """Shingles of consecutive token texts, e.g. from `Document.tokens`.
+
+    Args:
+        tokens: Iterable of token texts.
+        size: Int. Tokens per shingle.
+
+    Returns:
+        Set of strings, the tokens of each shingle joined by a space.
+    """
+    tokens = [x.lower() for x in tokens]
+    if len(tokens) <= size:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + size])
+            for i in range(len(tokens) - size + 1)}
@@ -0,0 +1,380 @@
+"""Bulk JSON Lines export and loading of DataBase records.
+
+`DataBase.to_json` goes through the `json_serial` hook for every value json
+does not know, formatting each datetime anew. Here each record class gets
+an encoder that reads all its fields at once and only converts the values
+that need it, datetimes are formatted from their parts with the date cached
+per day, and lines are written in chunks. Values decode to the same as
+`to_json` gives, nested records included, which are still encoded as JSON
+strings.
+
+Loading reverses this. The types a class's `__init__` annotates tell which
+fields hold datetimes, dates or nested records, so only those are converted,
+and datetimes are parsed with `fromisoformat` rather than `strptime`. Lines
+are decoded in chunks, optionally across a process pool.
+
+orjson is used when installed, otherwise the stdlib json module.
+"""
+from collections import deque
+from datetime import date, datetime
+import io
+from itertools import islice
+import json
+from multiprocessing import Pool
+from operator import attrgetter
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, \
+    Optional, Tuple, Type, Union
+import typing
+
+from data_structures.base import DataBase, json_serial
+from data_structures.twitter import AUTHOR_FIELDS, get_own_author_fields, \
+    Tweet, UserRegistry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+BACKENDS = ('json', 'orjson')
+# values json takes as they are
+NATIVE = frozenset({str, int, float, bool, type(None)})
+# dates formatted before the cache is cleared, keyed by ordinal
+MAX_CACHED = 1 << 16
+DATE_CACHE = {}
+# hours, minutes and seconds as strftime formats them
+TWO_DIGITS = tuple(f'{x:02d}' for x in range(60))
+
+
+class RecordEncoder:
+    """Turns the records of one class into dicts of JSON values.
+
+    Args:
+        cls: DataBase subclass.
+        exclude: Iterable of fields to leave out.
+    """
+
+    def __init__(self, cls: Type[DataBase], exclude: Iterable[str] = ()):
+        self.cls = cls
+        exclude = set(exclude)
+        self.fields = tuple(x for x in cls._schema if x not in exclude)
+        if len(self.fields) > 1:
+            self.get_values = attrgetter(*self.fields)
+        elif self.fields:
+            field = self.fields[0]
+            self.get_values = lambda x: (getattr(x, field),)
+        else:
+            self.get_values = lambda x: ()
+
+    def encode(self, record: DataBase) -> Dict[str, Any]:
+        try:
+            values = self.get_values(record)
+        except AttributeError:
+            # a field was deleted, so go key by key
+            return {k: to_value(v) for k, v in record.items()}
+        plain = {k: v if type(v) in NATIVE else to_value(v)
+                 for k, v in zip(self.fields, values)}
+        if record._extra:
+            for key, value in record._extra.items():
+                plain[key] = to_value(value)
+        return plain
+
+
+class RecordDecoder:
+    """Turns dicts of JSON values back into records of one class.
+
+    Args:
+        cls: DataBase subclass. Fields its `__init__` annotates as datetime,
+          date or DataBase subclass, optionally in an Optional or List, are
+          converted back.
+    """
+
+    def __init__(self, cls: Type[DataBase]):
+        self.cls = cls
+        hints = typing.get_type_hints(cls.__init__)
+        self.converters = []
+        for field in cls._schema:
+            convert = get_converter(hints.get(field))
+            if convert is not None:
+                self.converters.append((field, convert))
+
+    def decode(self, plain: Dict[str, Any]) -> DataBase:
+        for field, convert in self.converters:
+            value = plain.get(field)
+            if value is not None:
+                plain[field] = convert(value)
+        return self.cls(**plain)
+
+
+DECODERS = {}
+ENCODERS = {}
+
+
+#
+# functions
+#
+
+
+def decode_chunk(
+        lines: List[bytes],
+        cls: Type[DataBase],
+        backend: str
+) -> List[DataBase]:
+    loads = get_loads(backend)
+    decode = get_decoder(cls).decode
+    return [decode(loads(x)) for x in lines if x.strip()]
+
+
+def format_date(value: date) -> str:
+    key = value.toordinal()
+    text = DATE_CACHE.get(key)
+    if text is None:
+        if len(DATE_CACHE) >= MAX_CACHED:
+            DATE_CACHE.clear()
+        text = DATE_CACHE[key] = value.strftime('%Y-%m-%d')
+    return text
+
+
+def format_datetime(value: datetime) -> str:
+    # only the date part is cached, as nearly every datetime in a dump is
+    # distinct but they share few days. Aware datetimes are formatted in
+    # their own zone, as with strftime.
+    key = value.toordinal()
+    day = DATE_CACHE.get(key)
+    if day is None:
+        day = format_date(value)
+    digits = TWO_DIGITS
+    return f'{day} {digits[value.hour]}:{digits[value.minute]}:' \
+           f'{digits[value.second]}'
+
+
+def get_backend(backend: Optional[str] = None) -> str:
+    if backend is None:
+        return 'json' if orjson is None else 'orjson'
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown backend: {backend}.')
+    if backend == 'orjson' and orjson is None:
+        raise ValueError('orjson is not installed.')
+    return backend
+
+
+def get_converter(hint: Any) -> Optional[Callable[[Any], Any]]:
+    # the function turning a JSON value back into one of type `hint`
+    origin = typing.get_origin(hint)
+    if origin is Union:
+        types = [x for x in typing.get_args(hint) if x is not type(None)]
+        return get_converter(types[0]) if len(types) == 1 else None
+    if origin in (list, List):
+        convert = get_converter(typing.get_args(hint)[0])
+        if convert is None:
+            return None
+        return lambda x: [convert(y) for y in x]
+    if hint is datetime:
+        return datetime.fromisoformat
+    if hint is date:
+        return date.fromisoformat
+    if isinstance(hint, type) and issubclass(hint, DataBase):
+        # nested records were written as JSON strings
+        return lambda x: get_decoder(hint).decode(
+            json.loads(x) if isinstance(x, str) else x)
+    return None
+
+
+def get_decoder(cls: Type[DataBase]) -> RecordDecoder:
+    decoder = DECODERS.get(cls)
+    if decoder is None:
+        decoder = DECODERS[cls] = RecordDecoder(cls)
+    return decoder
+
+
+def get_dumps(backend: str) -> Callable[[Dict[str, Any]], bytes]:
+    if backend == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS
+        return lambda x: orjson.dumps(x, option=option)
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    return lambda x: encoder.encode(x).encode('utf-8')
+
+
+def get_encoder(cls: Type[DataBase]) -> RecordEncoder:
+    encoder = ENCODERS.get(cls)
+    if encoder is None:
+        encoder = ENCODERS[cls] = RecordEncoder(cls)
+    return encoder
+
+
+def get_loads(backend: str) -> Callable[[bytes], Dict[str, Any]]:
+    return orjson.loads if backend == 'orjson' else json.loads
+
+
+def load_jsonl(
+        path: str,
+        cls: Type[DataBase] = Tweet,
+        backend: Optional[str] = None,
+        chunk_size: int = 1000,
+        workers: int = 1
+) -> Iterator[DataBase]:
+    """Read records from a JSON Lines file, e.g. written by `to_jsonl`.
+
+    Args:
+        path: String, path to the file.
+        cls: DataBase subclass of the records, e.g. Tweet, TwitterUser,
+          YouTubeVideo or YouTubeComment.
+        backend: String, `json` or `orjson`. Defaults to orjson if it is
+          installed.
+        chunk_size: Int. Number of lines decoded at a time.
+        workers: Int. Number of processes decoding chunks. With one
+          everything runs in this process.
+
+    Yields:
+        Records of type `cls`, in file order.
+    """
+    backend = get_backend(backend)
+    with open(path, 'rb') as f:
+        chunks = iter(lambda: list(islice(f, chunk_size)), [])
+        if workers <= 1:
+            for chunk in chunks:
+                yield from decode_chunk(chunk, cls, backend)
+            return
+        with Pool(workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(
+                    decode_chunk, (chunk, cls, backend)))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+
+
+def to_jsonl(
+        records: Iterable[DataBase],
+        fp: IO,
+        backend: Optional[str] = None,
+        chunk_size: int = 1000
+) -> int:
+    """Write records as JSON Lines, one record per line.
+
+    Args:
+        records: Iterable of DataBase records, consumed lazily. They may be
+          of different classes.
+        fp: file handle, text or binary. Text handles should be UTF-8.
+        backend: String, `json` or `orjson`. Defaults to orjson if it is
+          installed.
+        chunk_size: Int. Number of lines written at once.
+
+    Returns:
+        Int, the number of records written.
+    """
+    def get_plain(records: Iterable[DataBase]) -> Iterator[Dict[str, Any]]:
+        cls = None
+        encode = None
+        for record in records:
+            if type(record) is not cls:
+                cls = type(record)
+                encode = get_encoder(cls).encode
+            yield encode(record)
+
+    return write_plain(get_plain(records), fp, backend, chunk_size)
+
+
+def to_normalized_jsonl(
+        tweets: Iterable[Tweet],
+        tweets_fp: IO,
+        users_fp: IO,
+        users: Optional[UserRegistry] = None,
+        backend: Optional[str] = None,
+        chunk_size: int = 1000
+) -> Tuple[int, int]:
+    """Write Tweets without their author fields, and their authors apart.
+
+    The Tweets are linked to `users` as they are written, and the authors
+    written once all Tweets are. Tweets without an `author_id` keep their
+    author fields, as do other Tweets for the fields that differ from those
+    of their registered author. Read back with `load_jsonl` and link the
+    Tweets to a registry of the users read.
+
+    Args:
+        tweets: Iterable of Tweets, consumed lazily.
+        tweets_fp: file handle for the Tweets, text or binary.
+        users_fp: file handle for the TwitterUsers, text or binary.
+        users: UserRegistry to link the Tweets to, and to take authors from
+          when the Tweets have no author fields. Defaults to a new one.
+        backend: String, `json` or `orjson`. Defaults to orjson if it is
+          installed.
+        chunk_size: Int. Number of lines written at once.
+
+    Returns:
+        Int, Int: the number of Tweets and of users written.
+    """
+    users = UserRegistry() if users is None else users
+    encode = RecordEncoder(Tweet, exclude=AUTHOR_FIELDS).encode
+    author_ids = set()
+
+    def get_plain(tweet: Tweet) -> Dict[str, Any]:
+        users.link(tweet)
+        if not tweet.is_linked:
+            # no author_id, so the author fields stay with the Tweet
+            return get_encoder(Tweet).encode(tweet)
+        if tweet.author_id in users:
+            author_ids.add(tweet.author_id)
+        plain = encode(tweet)
+        # author fields that differ from the registered author's
+        for key, value in get_own_author_fields(tweet).items():
+            plain[key] = to_value(value)
+        return plain
+
+    num_tweets = write_plain(
+        (get_plain(x) for x in tweets), tweets_fp, backend, chunk_size)
+    num_users = to_jsonl(
+        (x for x in users if x.id in author_ids), users_fp, backend,
+        chunk_size)
+    return num_tweets, num_users
+
+
+def to_value(value: Any) -> Any:
+    # the JSON value `json_serial` would give, without its per value hook
+    if type(value) in NATIVE:
+        return value
+    if isinstance(value, datetime):
+        return format_datetime(value)
+    if isinstance(value, date):
+        return format_date(value)
+    if isinstance(value, DataBase):
+        # nested records are strings, as from `to_json`
+        return json.dumps(get_encoder(type(value)).encode(value))
+    if isinstance(value, (list, tuple)):
+        return [to_value(x) for x in value]
+    if isinstance(value, dict):
+        return {k: to_value(v) for k, v in value.items()}
+    if isinstance(value, (str, int, float)):
+        # subclasses, e.g. enums
+        return value
+    return json_serial(value)
+
+
+def write_plain(
+        plains: Iterable[Dict[str, Any]],
+        fp: IO,
+        backend: Optional[str],
+        chunk_size: int
+) -> int:
+    # write encoded records as lines, a chunk at a time
+    dumps = get_dumps(get_backend(backend))
+    binary = not isinstance(fp, io.TextIOBase)
+    lines = []
+    num_records = 0
+    for plain in plains:
+        lines.append(dumps(plain))
+        if len(lines) == chunk_size:
+            write_lines(fp, lines, binary)
+            num_records += len(lines)
+            lines = []
+    if lines:
+        write_lines(fp, lines, binary)
+        num_records += len(lines)
+    return num_records
+
+
+def write_lines(fp: IO, lines: List[bytes], binary: bool):
+    data = b'\n'.join(lines) + b'\n'
+    fp.write(data if binary else data.decode('utf-8'))
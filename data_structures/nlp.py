@@ -1,16 +1,103 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+import copy
 import dill
-from typing import Dict, List, Optional, Tuple
+import functools
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, \
+    Sequence, Tuple
 
 from data_structures import base
 
 
+# attributes stored as codes into the shared vocab
+CATEGORICAL_ATTRS = ('pos', 'entity_type', 'dependency_type')
+# tri-state booleans: None, False, True
+FLAG_ATTRS = ('is_entity', 'is_hashtag', 'is_mention', 'is_url', 'is_stop')
+# optional integer indices
+INDEX_ATTRS = ('ix', 'dependency_head_ix', 'start_char_ix')
+# phrase extraction rules, refer to README.md for details and examples
+NP_TARGET_TYPES = (
+    'nsubj', 'dobj', 'pobj', 'appos', 'attr', 'cop', 'nsubjpass', 'obj',
+)
+NP_HEAD_SHOULD_BE_NOUN = ('cop', 'attr', 'dobj')
+VP_TARGET_TYPES = (
+    'advcl', 'ccomp', 'csubj', 'csubjpass', 'dobj', 'parataxis', 'pcomp',
+    'relcl', 'rcmod', 'root', 'ROOT', 'xcomp',
+)
+VP_HEAD_SHOULD_BE_VERB = ('dobj', 'root', 'ROOT')
+VERB_POS = ('VERB', 'AUX')
+# every attribute of a token, in constructor order
+TOKEN_ATTRS = (
+    'text', 'start_char_ix', 'pos', 'lemma', 'is_entity', 'entity_type',
+    'is_hashtag', 'is_mention', 'is_url', 'is_stop', 'ix',
+    'dependency_head_ix', 'dependency_type',
+)
+
+
+class Vocab:
+    """Interns categorical strings as small integer codes.
+
+    Code 0 is reserved for None. Codes are only meaningful within the process
+    that assigned them, so anything persisted must store the strings.
+    """
+
+    def __init__(self):
+        self.strings = [None]
+        self.codes = {None: 0}
+
+    def __contains__(self, string: Optional[str]) -> bool:
+        return string in self.codes
+
+    def __len__(self):
+        return len(self.strings)
+
+    def add(self, string: Optional[str]) -> int:
+        code = self.codes.get(string)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(string)
+            self.codes[string] = code
+        return code
+
+
+# shared by all token tables in the process
+VOCAB = Vocab()
+
+
+def cached_property(func):
+    """Like `property`, but computed once and kept in the `_cache` dict.
+
+    The cache lives in the instance `__dict__`, so objects that predate it
+    (e.g. old dills) simply start with an empty one.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def getter(self):
+        cache = self.__dict__.setdefault('_cache', {})
+        if name not in cache:
+            cache[name] = func(self)
+        return cache[name]
+
+    return property(getter)
+
+
 class NlpBase:
+    __slots__ = ()
 
     def serialize(self):
         return dill.dumps(self)
 
 
 class Token(NlpBase):
+    # no per instance __dict__; categorical attributes are held as codes into
+    # the shared vocab and exposed as strings through properties
+    __slots__ = (
+        'text', 'start_char_ix', '_pos', 'lemma', 'is_entity', '_entity_type',
+        'is_hashtag', 'is_mention', 'is_url', 'is_stop', 'ix',
+        'dependency_head_ix', '_dependency_type',
+    )
 
     def __init__(
             self,
@@ -29,6 +116,7 @@ class Token(NlpBase):
             dependency_type: Optional[str] = None
     ):
         self.text = text
+        self.start_char_ix = start_char_ix
         self.pos = pos
         self.lemma = lemma
         self.is_entity = is_entity
@@ -44,12 +132,52 @@ class Token(NlpBase):
     def __eq__(self, other):
         return base.dict_equal_with_debug(self, other)
 
+    def __getstate__(self):
+        return {attr: getattr(self, attr) for attr in TOKEN_ATTRS}
+
+    def __hash__(self):
+        return int.from_bytes(self.digest[:8], 'little')
+
     def __len__(self):
         return len(self.text)
 
     def __repr__(self):
         return self.text
 
+    def __setstate__(self, state):
+        # dills from before slots may lack attributes, e.g. start_char_ix
+        for attr in TOKEN_ATTRS:
+            setattr(self, attr, state.get(attr))
+
+    @property
+    def dependency_type(self) -> Optional[str]:
+        return VOCAB.strings[self._dependency_type]
+
+    @dependency_type.setter
+    def dependency_type(self, value: Optional[str]):
+        self._dependency_type = VOCAB.add(value)
+
+    @property
+    def entity_type(self) -> Optional[str]:
+        return VOCAB.strings[self._entity_type]
+
+    @entity_type.setter
+    def entity_type(self, value: Optional[str]):
+        self._entity_type = VOCAB.add(value)
+
+    @property
+    def pos(self) -> Optional[str]:
+        return VOCAB.strings[self._pos]
+
+    @pos.setter
+    def pos(self, value: Optional[str]):
+        self._pos = VOCAB.add(value)
+
+    @property
+    def digest(self) -> bytes:
+        # tokens are usually short lived views of a table, so not cached
+        return base.get_digest([getattr(self, x) for x in TOKEN_ATTRS])
+
     @property
     def end_char_ix(self) -> int:
         if self.start_char_ix is None:
@@ -64,10 +192,18 @@ class Token(NlpBase):
     ) -> List:
         if split_on in self.text:
             splits = self.text.split(split_on)
+            # character offsets of each split, if we know where we start
+            start_char_ixs = []
+            offset = self.start_char_ix
+            for x in splits:
+                start_char_ixs.append(offset)
+                if offset is not None:
+                    offset += len(x) + len(split_on)
             # TODO: what really makes sense here?
             tokens = [
                 Token(
                     text=x,
+                    start_char_ix=start_char_ix,
                     pos=self.pos if copy_meta_attrs else None,
                     lemma=self.lemma if copy_meta_attrs else None,
                     is_entity=self.is_entity if copy_meta_attrs else None,
@@ -81,170 +217,541 @@ class Token(NlpBase):
                         if copy_meta_attrs else None,
                     dependency_type=self.dependency_type
                         if copy_meta_attrs else None)
-                for x in splits]
+                for x, start_char_ix in zip(splits, start_char_ixs)]
             return tokens
         else:
             return [self]
 
 
+class TokenTable:
+    """Columnar storage for the tokens of a sentence.
+
+    Each token attribute is a column. Categorical attributes hold codes into
+    `VOCAB`, flags hold -1 (None), 0 or 1, and indices hold -1 for None.
+    """
+
+    def __init__(self):
+        self.text = []
+        self.lemma = []
+        for attr in CATEGORICAL_ATTRS + INDEX_ATTRS:
+            setattr(self, attr, array('i'))
+        for attr in FLAG_ATTRS:
+            setattr(self, attr, array('b'))
+
+    def __getstate__(self):
+        # codes are process local, so pickle the strings instead
+        state = self.__dict__.copy()
+        for attr in CATEGORICAL_ATTRS:
+            state[attr] = [VOCAB.strings[x] for x in state[attr]]
+        return state
+
+    def __len__(self):
+        return len(self.text)
+
+    def __setstate__(self, state):
+        for attr in CATEGORICAL_ATTRS:
+            state[attr] = array('i', [VOCAB.add(x) for x in state[attr]])
+        self.__dict__.update(state)
+
+    @classmethod
+    def from_tokens(cls, tokens: List[Token]):
+        table = cls()
+        for token in tokens:
+            table.append(token)
+        return table
+
+    def append(self, token: Token):
+        self.text.append(token.text)
+        self.lemma.append(token.lemma)
+        # tokens already hold vocab codes, so just copy them over
+        self.pos.append(token._pos)
+        self.entity_type.append(token._entity_type)
+        self.dependency_type.append(token._dependency_type)
+        for attr in FLAG_ATTRS:
+            getattr(self, attr).append(encode_flag(getattr(token, attr)))
+        for attr in INDEX_ATTRS:
+            getattr(self, attr).append(encode_index(getattr(token, attr)))
+
+    def token(self, i: int) -> Token:
+        # bypass the constructor so the codes need not be looked up again
+        token = Token.__new__(Token)
+        token.text = self.text[i]
+        token.lemma = self.lemma[i]
+        token._pos = self.pos[i]
+        token._entity_type = self.entity_type[i]
+        token._dependency_type = self.dependency_type[i]
+        for attr in FLAG_ATTRS:
+            setattr(token, attr, decode_flag(getattr(self, attr)[i]))
+        for attr in INDEX_ATTRS:
+            setattr(token, attr, decode_index(getattr(self, attr)[i]))
+        return token
+
+    def tokens(self, start: int = 0, end: Optional[int] = None) -> List[Token]:
+        end = len(self) if end is None else end
+        return [self.token(i) for i in range(start, end)]
+
+    def copy_rows(self, other, start: int, end: int):
+        # append the rows of another table without building tokens
+        self.text += other.text[start:end]
+        self.lemma += other.lemma[start:end]
+        for attr in CATEGORICAL_ATTRS + FLAG_ATTRS + INDEX_ATTRS:
+            getattr(self, attr).extend(getattr(other, attr)[start:end])
+
+    def flagged(self, attr: str) -> List[Token]:
+        return list(self.iter_flagged(attr))
+
+    def iter_flagged(self, attr: str) -> Iterator[Token]:
+        for i, x in enumerate(getattr(self, attr)):
+            if x == 1:
+                yield self.token(i)
+
+    def iter_tokens(
+            self,
+            start: int = 0,
+            end: Optional[int] = None
+    ) -> Iterator[Token]:
+        end = len(self) if end is None else end
+        for i in range(start, end):
+            yield self.token(i)
+
+
+class TreeIndex:
+    """Dependency tree lookups for a sentence.
+
+    `spans` holds the `get_left_right` result for every node with children,
+    so phrase extraction never has to traverse the tree itself.
+    """
+
+    def __init__(
+            self,
+            children: Dict[int, List[int]],
+            dep2ixs: Dict[str, List[int]]
+    ):
+        self.children = children
+        self.dep2ixs = dep2ixs
+        self.spans = get_spans(children)
+
+    @classmethod
+    def from_table(cls, table: TokenTable):
+        return cls(*build_tree_info(
+            [decode_index(x) for x in table.ix],
+            [decode_index(x) for x in table.dependency_head_ix],
+            [VOCAB.strings[x] for x in table.dependency_type]))
+
+
+class CharIndex:
+    """Tokens sorted by character offset, for finding them by position.
+
+    Tokens without a `start_char_ix` are left out. Lookups assume tokens do
+    not overlap, as is the case for the output of a tokenizer.
+
+    Attributes:
+        starts: start character offset of each token, ascending.
+        ends: end character offset of each token, exclusive.
+        token_ixs: the position of each token in the tables indexed.
+    """
+
+    def __init__(self, starts: array, ends: array, token_ixs: array):
+        self.starts = starts
+        self.ends = ends
+        self.token_ixs = token_ixs
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_tables(cls, tables: Iterable[TokenTable]):
+        starts = array('q')
+        ends = array('q')
+        token_ixs = array('I')
+        offset = 0
+        for table in tables:
+            for i, start in enumerate(table.start_char_ix):
+                if start != -1:
+                    starts.append(start)
+                    ends.append(start + len(table.text[i]))
+                    token_ixs.append(offset + i)
+            offset += len(table)
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            order = sorted(range(len(starts)), key=lambda x: starts[x])
+            starts = array('q', [starts[i] for i in order])
+            ends = array('q', [ends[i] for i in order])
+            token_ixs = array('I', [token_ixs[i] for i in order])
+        return cls(starts, ends, token_ixs)
+
+    def token_ix_at(self, char_ix: int) -> Optional[int]:
+        # the token covering the character, if any
+        i = bisect_right(self.starts, char_ix) - 1
+        if i >= 0 and char_ix < self.ends[i]:
+            return self.token_ixs[i]
+        return None
+
+    def token_ixs_in_span(self, start: int, end: int) -> List[int]:
+        # tokens overlapping [start, end), in order of their offsets
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+        return self.token_ixs[first:last].tolist()
+
+
+# rules for `Sentence.retokenize`
+SplitRule = Callable[[Token], List[Token]]
+MergeRule = Callable[['Sentence'], Sequence[Tuple[int, int]]]
+
+
 class Sentence(NlpBase):
 
     def __init__(
             self,
             tokens: List[Token]
     ):
-        self.tokens = tokens
-        # one pass over the tokens to get required info for phrase extraction
-        self.children, self.dep2ixs = get_tree_info(tokens)
+        # tokens are stored by column and only built again when asked for
+        self.table = TokenTable.from_tokens(tokens)
+        # the tree index is built on first use
+        self._tree = None
+
+    def __eq__(self, other):
+        # compares content, short-circuiting on the cached digests
+        return isinstance(other, Sentence) and self.digest == other.digest
+
+    def __hash__(self):
+        return int.from_bytes(self.digest[:8], 'little')
+
+    def __getitem__(self, i: int) -> Token:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.table.token(i)
 
     def __len__(self):
         # number of tokens
-        return len(self.tokens)
+        return len(self.table)
 
     def __repr__(self):
         return self.text
 
+    @classmethod
+    def from_table(cls, table: TokenTable):
+        sentence = cls.__new__(cls)
+        sentence.table = table
+        sentence._tree = None
+        return sentence
+
+    def __getstate__(self):
+        # the tree index and cache are derived, so rebuild them after loading
+        state = self.__dict__.copy()
+        state['_tree'] = None
+        state.pop('_cache', None)
+        return state
+
+    def __setstate__(self, state):
+        # maintain backwards compatibility with dills of token lists
+        if 'tokens' in state:
+            state['table'] = TokenTable.from_tokens(state.pop('tokens'))
+        # older dills also carry the tree info, which is now derived
+        state.pop('children', None)
+        state.pop('dep2ixs', None)
+        state['_tree'] = None
+        self.__dict__.update(state)
+
+    @property
+    def children(self) -> Dict[int, List[int]]:
+        return self.tree.children
+
+    @property
+    def dep2ixs(self) -> Dict[str, List[int]]:
+        return self.tree.dep2ixs
+
+    @cached_property
+    def digest(self) -> bytes:
+        # categorical columns are digested as strings, codes vary by process
+        return base.get_digest(self.table.__getstate__())
+
     @property
     def entities(self) -> List[Token]:
-        return [x for x in self.tokens if x.is_entity]
+        return self.table.flagged('is_entity')
 
     @property
     def hashtags(self) -> List[Token]:
-        return [x for x in self.tokens if x.is_hashtag]
+        return self.table.flagged('is_hashtag')
 
     @property
     def mentions(self) -> List[Token]:
-        return [x for x in self.tokens if x.is_mention]
+        return self.table.flagged('is_mention')
 
     @property
     def urls(self) -> List[Token]:
-        return [x for x in self.tokens if x.is_url]
+        return self.table.flagged('is_url')
+
+    @property
+    def tokens(self) -> List[Token]:
+        """The tokens, built anew from `table` on every access.
+
+        Changing the list or its tokens leaves the sentence as it was, so
+        read it once outside of loops, and assign a new list to change the
+        tokens.
+        """
+        return self.table.tokens()
+
+    @tokens.setter
+    def tokens(self, tokens: List[Token]):
+        self.table = TokenTable.from_tokens(tokens)
+        self.invalidate()
+
+    @property
+    def tree(self) -> TreeIndex:
+        if self._tree is None:
+            self._tree = TreeIndex.from_table(self.table)
+        return self._tree
+
+    @cached_property
+    def char_index(self) -> CharIndex:
+        return CharIndex.from_tables([self.table])
 
     def get_noun_phrases(
             self,
             det: bool = False,
             max_len: int = 10
     ) -> List[List[Token]]:
-        # check to maintain backwards compatibility will dills
-        if 'dep2ixs' not in self.__dict__:
-            self.children, self.dep2ixs = get_tree_info(self.tokens)
-
-        # refer to README.md for details and examples
-        target_types = [
-            'nsubj', 'dobj', 'pobj', 'appos', 'attr', 'cop', 'nsubjpass', 'obj',
-        ]
-        head_should_be_noun = ['cop', 'attr', 'dobj']
-
-        np_ixs = []
-
-        # use our map to lookup those ixs we need
-        for dep in target_types:
-            if dep in self.dep2ixs:
-                for ix in self.dep2ixs[dep]:
-                    # NOTE: the below should be refactored into a separate
-                    # function
-
-                    # noun check here
-                    if dep in head_should_be_noun \
-                            and self.tokens[ix].pos != 'NOUN':
-                        continue
-                    # if we somehow have a terminal node, continue now
-                    if len(self.children[ix]) == 0:
-                        continue
-                    # don't take pronouns
-                    if self.tokens[ix].pos == 'PRON':
-                        continue
-                    # now look for the span of the NP
-                    # NOTE: this is probably the most expensive operation
-                    left, right = get_left_right(self.children, ix)
-                    # skip spans that are too long
-                    if right - left > max_len:
-                        continue
-                    # if left is a PREP, increment
-                    if self.tokens[left].dependency_type == 'prep':
-                        left += 1
-                    # if no tokens left, skip
-                    if left > len(self.tokens) - 1:
-                        continue
-                    # if left is a det and we don't want it, increment
-                    if self.tokens[left].dependency_type == 'det' and not det:
-                        left += 1
-                    # if no tokens left, skip
-                    if left > len(self.tokens) - 1:
-                        continue
-                    # check if we are left with just one token
-                    if right - left < 2:
-                        continue
-                    # if we get to here, we are good to go
-                    np_ixs.append([left, right])
-
-        # now we just look up the tokens with the ixs
-        nps = [
-            [self.tokens[i] for i in range(left, right + 1)]
-            for left, right in np_ixs
-        ]
+        return [self.table.tokens(left, right + 1)
+                for left, right in self.get_noun_phrase_spans(det, max_len)]
 
-        return nps
+    def get_noun_phrase_spans(
+            self,
+            det: bool = False,
+            max_len: int = 10
+    ) -> List[Tuple[int, int]]:
+        return get_noun_phrase_spans(
+            self.tree, self.table.pos, self.table.dependency_type,
+            det=det, max_len=max_len)
+
+    def get_entity_spans(self) -> List[Tuple[int, int]]:
+        # runs of consecutive entity tokens of the same type
+        spans = []
+        for ix, is_entity in enumerate(self.table.is_entity):
+            if is_entity != 1:
+                continue
+            if spans and spans[-1][1] == ix - 1 \
+                    and self.table.entity_type[ix] \
+                    == self.table.entity_type[ix - 1]:
+                spans[-1] = (spans[-1][0], ix)
+            else:
+                spans.append((ix, ix))
+        return spans
 
     def get_verb_phrases(
             self,
             max_len: int = 10
     ) -> List[List[Token]]:
-        # check to maintain backwards compatibility will dills
-        if 'dep2ixs' not in self.__dict__:
-            self.children, self.dep2ixs = get_tree_info(self.tokens)
-
-        # refer to README.md for details and examples
-        target_types = [
-            'advcl', 'ccomp', 'csubj', 'csubjpass', 'dobj', 'parataxis',
-            'pcomp', 'relcl', 'rcmod', 'root', 'ROOT', 'xcomp',
-        ]
-        head_should_be_verb = ['dobj', 'root', 'ROOT']
-        verb_pos = ['VERB', 'AUX']
-
-        vp_ixs = []
-
-        # use our map to lookup those ixs we need
-        for dep in target_types:
-            if dep in self.dep2ixs:
-                for ix in self.dep2ixs[dep]:
-                    # verb check here
-                    if dep in head_should_be_verb \
-                            and self.tokens[ix].pos not in verb_pos:
-                        continue
-                    # if we somehow have a terminal node, continue now
-                    if len(self.children[ix]) == 0:
-                        continue
-                    # now look for the span of the NP
-                    # NOTE: this is probably the most expensive operation
-                    left, right = get_left_right(self.children, ix)
-                    # skip spans that are too long
-                    if right - left > max_len:
-                        continue
-                    # check if we are left with just one token
-                    if right - left < 2:
-                        continue
-                    # if we get to here, we are good to go
-                    vp_ixs.append([left, right])
-
-        # now we just look up the tokens with the ixs
-        vps = [
-            [self.tokens[i] for i in range(left, right + 1)]
-            for left, right in vp_ixs
-        ]
+        return [self.table.tokens(left, right + 1)
+                for left, right in self.get_verb_phrase_spans(max_len)]
 
-        return vps
+    def get_verb_phrase_spans(
+            self,
+            max_len: int = 10
+    ) -> List[Tuple[int, int]]:
+        return get_verb_phrase_spans(
+            self.tree, self.table.pos, max_len=max_len)
 
-    @property
+    def iter_entities(self) -> Iterator[Token]:
+        return self.table.iter_flagged('is_entity')
+
+    def iter_hashtags(self) -> Iterator[Token]:
+        return self.table.iter_flagged('is_hashtag')
+
+    def iter_mentions(self) -> Iterator[Token]:
+        return self.table.iter_flagged('is_mention')
+
+    def iter_noun_phrases(
+            self,
+            det: bool = False,
+            max_len: int = 10
+    ) -> Iterator[List[Token]]:
+        for left, right in self.get_noun_phrase_spans(det, max_len):
+            yield self.table.tokens(left, right + 1)
+
+    def iter_tokens(self) -> Iterator[Token]:
+        return self.table.iter_tokens()
+
+    def iter_urls(self) -> Iterator[Token]:
+        return self.table.iter_flagged('is_url')
+
+    def iter_verb_phrases(self, max_len: int = 10) -> Iterator[List[Token]]:
+        for left, right in self.get_verb_phrase_spans(max_len):
+            yield self.table.tokens(left, right + 1)
+
+    def invalidate(self):
+        """Clear derived values, to be called after changing the table."""
+        self._tree = None
+        self.__dict__.pop('_cache', None)
+
+    def merge_spans(
+            self,
+            spans: Sequence[Tuple[int, int]],
+            merge_det: bool = False,
+            word_join_char: str = ' '
+    ):
+        """Merge each span of tokens into one token, in a single pass.
+
+        Each span is merged with `merge_tokens`. Afterwards `ix` is the
+        position in the sentence (offset by the `ix` of the first token, if
+        it had one) and every `dependency_head_ix` that pointed into a span
+        points to its merged token. Containing Paragraphs and Documents need
+        to be invalidated afterwards.
+
+        Args:
+            spans: Sequence of inclusive (left, right) token indices, e.g. from
+              `get_noun_phrase_spans` or `get_entity_spans`. They must not
+              overlap; see `filter_spans`.
+            merge_det: Bool. Passed on to `merge_tokens`.
+            word_join_char: String. Passed on to `merge_tokens`.
+        """
+        self._rebuild(spans, (), merge_det, word_join_char, None)
+
+    def retokenize(
+            self,
+            split_rules: Sequence[SplitRule] = (),
+            merge_rules: Sequence[MergeRule] = (),
+            merge_det: bool = False,
+            word_join_char: str = ' ',
+            split_dependency_type: Optional[str] = 'dep'
+    ):
+        """Apply splits and merges to the tokens, in a single pass.
+
+        Merges are found on the sentence as it is, and tokens in a merged
+        span are not split. Afterwards `ix` is renumbered and heads are
+        remapped as in `merge_spans`. The first piece of a split token takes
+        its place in the tree, and the other pieces depend on the first.
+        Containing Paragraphs and Documents need to be invalidated
+        afterwards.
+
+        Args:
+            split_rules: Sequence of functions taking a Token and returning
+              the tokens to replace it with, e.g.
+              `lambda x: x.split('_') if x.is_hashtag else [x]`. The first
+              rule to return more than one token is used.
+            merge_rules: Sequence of functions taking the Sentence and
+              returning inclusive (left, right) spans to merge, e.g.
+              `Sentence.get_entity_spans`. Overlaps between the spans are
+              resolved with `filter_spans`.
+            merge_det: Bool. Passed on to `merge_tokens`.
+            word_join_char: String. Passed on to `merge_tokens`.
+            split_dependency_type: String. Dependency type of the pieces
+              after the first of a split token.
+        """
+        spans = filter_spans([x for rule in merge_rules for x in rule(self)])
+        self._rebuild(spans, split_rules, merge_det, word_join_char,
+                      split_dependency_type)
+
+    def _rebuild(
+            self,
+            spans: Sequence[Tuple[int, int]],
+            split_rules: Sequence[SplitRule],
+            merge_det: bool,
+            word_join_char: str,
+            split_dependency_type: Optional[str]
+    ):
+        old = self.table
+        table = TokenTable()
+        # new position of each old token
+        positions = []
+        # the first piece of each split token, by position of the others
+        split_heads = {}
+
+        def copy_rows(start: int, end: int):
+            # copy the rows in between spans, splitting where a rule says so
+            run = start
+            for i in range(start, end) if split_rules else []:
+                token = old.token(i)
+                pieces = apply_split_rules(token, split_rules)
+                if len(pieces) == 1:
+                    continue
+                table.copy_rows(old, run, i)
+                positions.extend(range(len(table) - (i - run), len(table)))
+                positions.append(len(table))
+                first = len(table)
+                for piece in pieces:
+                    piece.ix = token.ix
+                    if len(table) == first:
+                        piece.dependency_head_ix = token.dependency_head_ix
+                        piece.dependency_type = token.dependency_type
+                    else:
+                        split_heads[len(table)] = first
+                        piece.dependency_type = split_dependency_type
+                    table.append(piece)
+                run = i + 1
+            table.copy_rows(old, run, end)
+            positions.extend(range(len(table) - (end - run), len(table)))
+
+        start = 0
+        for left, right in sorted(spans):
+            if left < start or right < left or right >= len(old):
+                raise ValueError(f'Invalid or overlapping span: '
+                                 f'{(left, right)}.')
+            copy_rows(start, left)
+            merged = merge_tokens(
+                old.tokens(left, right + 1), merge_det, word_join_char)
+            # a separated determiner keeps its own position
+            if len(merged) == 2:
+                positions.append(len(table))
+            positions += [len(table) + len(merged) - 1] * (
+                right + 1 - left - (len(merged) == 2))
+            for token in merged:
+                table.append(token)
+            start = right + 1
+        copy_rows(start, len(old))
+
+        # renumber ix and point heads at the tokens that replaced them
+        first_ix = max(old.ix[0], 0) if len(old) > 0 else 0
+        ix2new = {x: first_ix + positions[i]
+                  for i, x in enumerate(old.ix) if x != -1}
+        table.ix = array('i', [-1 if x == -1 else first_ix + i
+                               for i, x in enumerate(table.ix)])
+        table.dependency_head_ix = array(
+            'i', [ix2new.get(x, -1) for x in table.dependency_head_ix])
+        for i, first in split_heads.items():
+            table.dependency_head_ix[i] = table.ix[first]
+        self.table = table
+        self.invalidate()
+
+    @cached_property
     def text(self) -> str:
-        return ' '.join([str(x) for x in self.tokens])
+        return ' '.join(self.table.text)
+
+    def token_at(self, char_ix: int) -> Optional[Token]:
+        """The token covering a character offset, or None."""
+        token_ix = self.char_index.token_ix_at(char_ix)
+        return None if token_ix is None else self.table.token(token_ix)
+
+    def tokens_in_span(self, start: int, end: int) -> List[Token]:
+        """The tokens overlapping the characters from `start` to `end`."""
+        return [self.table.token(i)
+                for i in self.char_index.token_ixs_in_span(start, end)]
 
 
 class Paragraph(NlpBase):
+    """A list of sentences.
+
+    Aggregates over the sentences are computed once and cached. Each access
+    returns a new list, as for Sentence, so callers may change it. Assigning
+    `sentences` clears the cache, but mutating the list or a sentence in
+    place requires a call to `invalidate`.
+    """
 
     def __init__(self, sentences: List[Sentence]):
         self.sentences = sentences
 
+    def __eq__(self, other):
+        return isinstance(other, Paragraph) and self.digest == other.digest
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_cache', None)
+        return state
+
+    def __hash__(self):
+        return int.from_bytes(self.digest[:8], 'little')
+
     def __len__(self):
         # number of tokens
         return sum(len(x) for x in self.sentences)
@@ -252,33 +759,46 @@ class Paragraph(NlpBase):
     def __repr__(self):
         return self.text
 
+    def __setattr__(self, name, value):
+        if name == 'sentences':
+            self.invalidate()
+        super().__setattr__(name, value)
+
+    @cached_property
+    def digest(self) -> bytes:
+        return base.get_digest([x.digest for x in self.sentences])
+
     @property
     def entities(self) -> List[Token]:
-        entities = []
-        for x in self.sentences:
-            entities += x.entities
-        return entities
+        return list(self._entities)
+
+    @cached_property
+    def _entities(self) -> Tuple[Token, ...]:
+        return tuple([x for s in self.sentences for x in s.entities])
 
     @property
     def hashtags(self) -> List[Token]:
-        hashtags = []
-        for x in self.sentences:
-            hashtags += x.hashtags
-        return hashtags
+        return list(self._hashtags)
+
+    @cached_property
+    def _hashtags(self) -> Tuple[Token, ...]:
+        return tuple([x for s in self.sentences for x in s.hashtags])
 
     @property
     def mentions(self) -> List[Token]:
-        mentions = []
-        for x in self.sentences:
-            mentions += x.mentions
-        return mentions
+        return list(self._mentions)
+
+    @cached_property
+    def _mentions(self) -> Tuple[Token, ...]:
+        return tuple([x for s in self.sentences for x in s.mentions])
 
     @property
     def urls(self) -> List[Token]:
-        urls = []
-        for x in self.sentences:
-            urls += x.urls
-        return urls
+        return list(self._urls)
+
+    @cached_property
+    def _urls(self) -> Tuple[Token, ...]:
+        return tuple([x for s in self.sentences for x in s.urls])
 
     def get_noun_phrases(
             self,
@@ -296,57 +816,131 @@ class Paragraph(NlpBase):
             vps += sentence.get_verb_phrases(max_len=max_len)
         return vps
 
-    @property
+    def invalidate(self):
+        """Clear cached aggregates, to be called after changing sentences."""
+        self.__dict__.pop('_cache', None)
+
+    def iter_entities(self) -> Iterator[Token]:
+        for sentence in self.sentences:
+            yield from sentence.iter_entities()
+
+    def iter_hashtags(self) -> Iterator[Token]:
+        for sentence in self.sentences:
+            yield from sentence.iter_hashtags()
+
+    def iter_mentions(self) -> Iterator[Token]:
+        for sentence in self.sentences:
+            yield from sentence.iter_mentions()
+
+    def iter_noun_phrases(
+            self,
+            det: bool = False,
+            max_len: int = 10
+    ) -> Iterator[List[Token]]:
+        for sentence in self.sentences:
+            yield from sentence.iter_noun_phrases(det=det, max_len=max_len)
+
+    def iter_tokens(self) -> Iterator[Token]:
+        for sentence in self.sentences:
+            yield from sentence.iter_tokens()
+
+    def iter_urls(self) -> Iterator[Token]:
+        for sentence in self.sentences:
+            yield from sentence.iter_urls()
+
+    def iter_verb_phrases(self, max_len: int = 10) -> Iterator[List[Token]]:
+        for sentence in self.sentences:
+            yield from sentence.iter_verb_phrases(max_len=max_len)
+
+    @cached_property
     def text(self) -> str:
         return ' '.join([str(x) for x in self.sentences])
 
     @property
-    def tokens(self) -> List[str]:
-        tokens = []
-        for s in self.sentences:
-            tokens += s.tokens
-        return tokens
+    def tokens(self) -> List[Token]:
+        return list(self._tokens)
+
+    @cached_property
+    def _tokens(self) -> Tuple[Token, ...]:
+        return tuple([x for s in self.sentences for x in s.tokens])
 
 
 class Document(NlpBase):
+    """A list of paragraphs.
+
+    Aggregates over the paragraphs are computed once and cached, along with
+    flat offset arrays for locating sentences and tokens. Each access returns
+    a new list, as for Sentence. Assigning `paragraphs` clears the cache;
+    after mutating anything in place, call `invalidate`, which also clears
+    the cache of every paragraph.
+    """
 
     def __init__(self, paragraphs: List[Paragraph]):
         self.paragraphs = paragraphs
 
+    def __eq__(self, other):
+        return isinstance(other, Document) and self.digest == other.digest
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_cache', None)
+        return state
+
+    def __hash__(self):
+        return int.from_bytes(self.digest[:8], 'little')
+
     def __len__(self):
         # number of tokens
-        return sum(len(x) for x in self.paragraphs)
+        return self.sentence_offsets[-1]
 
     def __repr__(self):
         return self.text
 
+    def __setattr__(self, name, value):
+        if name == 'paragraphs':
+            self.invalidate()
+        super().__setattr__(name, value)
+
+    @cached_property
+    def char_index(self) -> CharIndex:
+        # character offsets of every token, by index into `tokens`
+        return CharIndex.from_tables([x.table for x in self._sentences])
+
+    @cached_property
+    def digest(self) -> bytes:
+        return base.get_digest([x.digest for x in self.paragraphs])
+
     @property
     def entities(self) -> List[Token]:
-        entities = []
-        for x in self.paragraphs:
-            entities += x.entities
-        return entities
+        return list(self._entities)
+
+    @cached_property
+    def _entities(self) -> Tuple[Token, ...]:
+        return tuple([x for p in self.paragraphs for x in p._entities])
 
     @property
     def hashtags(self) -> List[Token]:
-        hashtags = []
-        for x in self.paragraphs:
-            hashtags += x.hashtags
-        return hashtags
+        return list(self._hashtags)
+
+    @cached_property
+    def _hashtags(self) -> Tuple[Token, ...]:
+        return tuple([x for p in self.paragraphs for x in p._hashtags])
 
     @property
     def mentions(self) -> List[Token]:
-        mentions = []
-        for x in self.paragraphs:
-            mentions += x.mentions
-        return mentions
+        return list(self._mentions)
+
+    @cached_property
+    def _mentions(self) -> Tuple[Token, ...]:
+        return tuple([x for p in self.paragraphs for x in p._mentions])
 
     @property
     def urls(self) -> List[Token]:
-        urls = []
-        for x in self.paragraphs:
-            urls += x.urls
-        return urls
+        return list(self._urls)
+
+    @cached_property
+    def _urls(self) -> Tuple[Token, ...]:
+        return tuple([x for p in self.paragraphs for x in p._urls])
 
     def get_noun_phrases(
             self,
@@ -364,22 +958,131 @@ class Document(NlpBase):
             vps += paragraph.get_verb_phrases(max_len=max_len)
         return vps
 
-    @property
-    def sentences(self) -> List[Sentence]:
-        sentences = []
+    def invalidate(self):
+        """Clear cached aggregates here and in every paragraph."""
+        self.__dict__.pop('_cache', None)
+        for paragraph in self.__dict__.get('paragraphs', []):
+            paragraph.invalidate()
+
+    def iter_entities(self) -> Iterator[Token]:
+        for paragraph in self.paragraphs:
+            yield from paragraph.iter_entities()
+
+    def iter_hashtags(self) -> Iterator[Token]:
+        for paragraph in self.paragraphs:
+            yield from paragraph.iter_hashtags()
+
+    def iter_mentions(self) -> Iterator[Token]:
+        for paragraph in self.paragraphs:
+            yield from paragraph.iter_mentions()
+
+    def iter_noun_phrases(
+            self,
+            det: bool = False,
+            max_len: int = 10
+    ) -> Iterator[List[Token]]:
+        for paragraph in self.paragraphs:
+            yield from paragraph.iter_noun_phrases(det=det, max_len=max_len)
+
+    def iter_sentences(self) -> Iterator[Sentence]:
+        for paragraph in self.paragraphs:
+            yield from paragraph.sentences
+
+    def iter_tokens(self) -> Iterator[Token]:
         for paragraph in self.paragraphs:
-            sentences += paragraph.sentences
-        return sentences
+            yield from paragraph.iter_tokens()
+
+    def iter_urls(self) -> Iterator[Token]:
+        for paragraph in self.paragraphs:
+            yield from paragraph.iter_urls()
+
+    def iter_verb_phrases(self, max_len: int = 10) -> Iterator[List[Token]]:
+        for paragraph in self.paragraphs:
+            yield from paragraph.iter_verb_phrases(max_len=max_len)
+
+    def locate(self, token_ix: int) -> Tuple[int, int]:
+        """Find a token by its position in the whole document.
+
+        Args:
+            token_ix: Int. Index into `tokens`.
+
+        Returns:
+            Tuple of the index into `sentences` and the index of the token
+              within that sentence.
+        """
+        if not 0 <= token_ix < len(self):
+            raise IndexError(token_ix)
+        sentence_ix = bisect_right(self.sentence_offsets, token_ix) - 1
+        return sentence_ix, token_ix - self.sentence_offsets[sentence_ix]
+
+    @cached_property
+    def paragraph_offsets(self) -> array:
+        # index of the first sentence of each paragraph, plus the total
+        offsets = array('I', [0])
+        for paragraph in self.paragraphs:
+            offsets.append(offsets[-1] + len(paragraph.sentences))
+        return offsets
+
+    @cached_property
+    def sentence_offsets(self) -> array:
+        # index of the first token of each sentence, plus the total
+        offsets = array('I', [0])
+        for sentence in self._sentences:
+            offsets.append(offsets[-1] + len(sentence))
+        return offsets
 
     @property
+    def sentences(self) -> List[Sentence]:
+        return list(self._sentences)
+
+    @cached_property
+    def _sentences(self) -> Tuple[Sentence, ...]:
+        return tuple([x for p in self.paragraphs for x in p.sentences])
+
+    @cached_property
     def text(self) -> str:
         return '\n\n'.join([str(x) for x in self.paragraphs])
 
+    def token_at(self, char_ix: int) -> Optional[Token]:
+        """Find the token covering a character offset.
+
+        Args:
+            char_ix: Int. Character offset, as in `Token.start_char_ix`.
+
+        Returns:
+            The Token, or None if no token with a known offset covers it.
+        """
+        token_ix = self.char_index.token_ix_at(char_ix)
+        if token_ix is None:
+            return None
+        sentence_ix, ix = self.locate(token_ix)
+        return self._sentences[sentence_ix][ix]
+
     @property
-    def tokens(self) -> List[str]:
+    def tokens(self) -> List[Token]:
+        return list(self._tokens)
+
+    @cached_property
+    def _tokens(self) -> Tuple[Token, ...]:
+        return tuple([x for p in self.paragraphs for x in p._tokens])
+
+    def tokens_in_span(self, start: int, end: int) -> List[Token]:
+        """Find the tokens overlapping a span of characters.
+
+        Uses binary search on `char_index`, e.g. to align annotations given
+        as character offsets with the tokens.
+
+        Args:
+            start: Int. First character offset of the span.
+            end: Int. Character offset just past the span.
+
+        Returns:
+            List of Tokens, in order of their offsets.
+        """
         tokens = []
-        for s in self.paragraphs:
-            tokens += s.tokens
+        for token_ix in self.char_index.token_ixs_in_span(start, end):
+            sentence_ix, ix = self.locate(token_ix)
+            tokens.append(self._sentences[sentence_ix][ix])
         return tokens
 
 
@@ -411,14 +1114,15 @@ def merge_tokens(
 
     # if the first token is a determiner, decide whether or not to separate it
     if tokens[0].pos == 'DET' and not merge_det:
-        det = tokens[0]
+        # copy it, so the caller's token is left as it was
+        det = copy.copy(tokens[0])
         # make sure it is not marked as an entity
         det.is_entity = False
         det.entity_type = ''
         # append it to the tokens to return
         tokens_out.append(det)
-        # remove it from the initial token list
-        del tokens[0]
+        # merge the rest, leaving the caller's list as it was
+        tokens = tokens[1:]
 
     # if there was only a determiner for some reason, return now
     if len(tokens) == 0:
@@ -426,14 +1130,17 @@ def merge_tokens(
 
     # with the remaining tokens, merge them based on the defined strategy
     root = get_root(tokens)
+    lemmas = [x.lemma for x in tokens if x.lemma is not None]
     merged = Token(
         # the text is simply joined on the join char
         text=word_join_char.join([x.text for x in tokens]),
+        # the merged token starts where the first one does
+        start_char_ix=tokens[0].start_char_ix,
         # a simple heuristic is to take the last POS, which is usually a NOUN
         # that is modified by the tokens to its left
         pos=tokens[-1].pos,
-        # add the lemmas together
-        lemma=word_join_char.join([x.lemma for x in tokens]),
+        # add the lemmas together, skipping missing ones (e.g. `_` in CoNLL-U)
+        lemma=word_join_char.join(lemmas) if lemmas else None,
         # again, use the last token as a heuristic
         is_entity=tokens[-1].is_entity,
         entity_type=tokens[-1].entity_type,
@@ -453,46 +1160,327 @@ def merge_tokens(
     return tokens_out
 
 
+def apply_split_rules(
+        token: Token,
+        split_rules: Sequence[SplitRule]
+) -> List[Token]:
+    # the pieces from the first rule that splits the token
+    for rule in split_rules:
+        pieces = rule(token)
+        if len(pieces) > 1:
+            return pieces
+    return [token]
+
+
+def get_noun_phrase_spans(
+        tree: TreeIndex,
+        pos: Sequence[int],
+        dependency_type: Sequence[int],
+        det: bool = False,
+        max_len: int = 10
+) -> List[Tuple[int, int]]:
+    """Get the (left, right) token indices of the noun phrases in a sentence.
+
+    Works on the sentence's tree index and columns of vocab codes, so no
+    Token objects are needed.
+
+    Args:
+        tree: TreeIndex of the sentence.
+        pos: Sequence of vocab codes of the part of speech of each token.
+        dependency_type: Sequence of vocab codes of the dependency types.
+        det: Bool. Whether to keep a leading determiner.
+        max_len: Int. Spans longer than this are skipped.
+
+    Returns:
+        List of inclusive (left, right) tuples.
+    """
+    dep2ixs = tree.dep2ixs
+    spans = tree.spans
+    num_tokens = len(pos)
+    # compare codes rather than strings
+    noun = VOCAB.add('NOUN')
+    pron = VOCAB.add('PRON')
+    prep = VOCAB.add('prep')
+    det_type = VOCAB.add('det')
+
+    np_ixs = []
+
+    # use our map to lookup those ixs we need
+    for dep in NP_TARGET_TYPES:
+        if dep in dep2ixs:
+            for ix in dep2ixs[dep]:
+                # NOTE: the below should be refactored into a separate
+                # function
+
+                # noun check here
+                if dep in NP_HEAD_SHOULD_BE_NOUN and pos[ix] != noun:
+                    continue
+                # if we somehow have a terminal node, continue now
+                if ix not in spans:
+                    continue
+                # don't take pronouns
+                if pos[ix] == pron:
+                    continue
+                # now look up the span of the NP
+                left, right = spans[ix]
+                # skip spans that are too long
+                if right - left > max_len:
+                    continue
+                # if left is a PREP, increment
+                if dependency_type[left] == prep:
+                    left += 1
+                # if no tokens left, skip
+                if left > num_tokens - 1:
+                    continue
+                # if left is a det and we don't want it, increment
+                if dependency_type[left] == det_type and not det:
+                    left += 1
+                # if no tokens left, skip
+                if left > num_tokens - 1:
+                    continue
+                # check if we are left with just one token
+                if right - left < 2:
+                    continue
+                # if we get to here, we are good to go
+                np_ixs.append((left, right))
+
+    return np_ixs
+
+
+def get_verb_phrase_spans(
+        tree: TreeIndex,
+        pos: Sequence[int],
+        max_len: int = 10
+) -> List[Tuple[int, int]]:
+    """Get the (left, right) token indices of the verb phrases in a sentence.
+
+    Args:
+        tree: TreeIndex of the sentence.
+        pos: Sequence of vocab codes of the part of speech of each token.
+        max_len: Int. Spans longer than this are skipped.
+
+    Returns:
+        List of inclusive (left, right) tuples.
+    """
+    verb_pos = [VOCAB.add(x) for x in VERB_POS]
+    dep2ixs = tree.dep2ixs
+    spans = tree.spans
+
+    vp_ixs = []
+
+    # use our map to lookup those ixs we need
+    for dep in VP_TARGET_TYPES:
+        if dep in dep2ixs:
+            for ix in dep2ixs[dep]:
+                # verb check here
+                if dep in VP_HEAD_SHOULD_BE_VERB \
+                        and pos[ix] not in verb_pos:
+                    continue
+                # if we somehow have a terminal node, continue now
+                if ix not in spans:
+                    continue
+                # now look up the span of the VP
+                left, right = spans[ix]
+                # skip spans that are too long
+                if right - left > max_len:
+                    continue
+                # check if we are left with just one token
+                if right - left < 2:
+                    continue
+                # if we get to here, we are good to go
+                vp_ixs.append((left, right))
+
+    return vp_ixs
+
+
 def get_root(subtree: List[Token]) -> Token:
+    # the first token whose head is outside the span, else one that is its
+    # own head, e.g. the root of the sentence
+    ixs = {x.ix for x in subtree}
     root = next(
-        (x for x in subtree
-         if x.dependency_head_ix not in [y.ix for y in subtree]),
-        None)
-    # debugging while we improve this code
-    if not root:
-        print([x.text for x in subtree])
-        print([x.ix for x in subtree])
-        print([x.dependency_head_ix for x in subtree])
-        raise Exception
+        (x for x in subtree if x.dependency_head_ix not in ixs),
+        next((x for x in subtree if x.dependency_head_ix == x.ix), None))
+    if root is None:
+        raise ValueError(
+            f'Span has no root: {[x.text for x in subtree]}, heads '
+            f'{[x.dependency_head_ix for x in subtree]}.')
     return root
 
 
+def encode_flag(value: Optional[bool]) -> int:
+    return -1 if value is None else int(value)
+
+
+def decode_flag(value: int) -> Optional[bool]:
+    return None if value == -1 else bool(value)
+
+
+def encode_index(value: Optional[int]) -> int:
+    return -1 if value is None else value
+
+
+def decode_index(value: int) -> Optional[int]:
+    return None if value == -1 else value
+
+
+def filter_spans(spans: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Keep the longest of overlapping spans, preferring earlier ones.
+
+    Args:
+        spans: Sequence of inclusive (left, right) token indices.
+
+    Returns:
+        List of non-overlapping spans, sorted by position.
+    """
+    kept = []
+    taken = set()
+    for left, right in sorted(spans, key=lambda x: (x[0] - x[1], x[0])):
+        if any(ix in taken for ix in range(left, right + 1)):
+            continue
+        kept.append((left, right))
+        taken.update(range(left, right + 1))
+    return sorted(kept)
+
+
+def iter_entities(documents: Iterable[Document]) -> Iterator[Token]:
+    for document in documents:
+        yield from document.iter_entities()
+
+
+def iter_hashtags(documents: Iterable[Document]) -> Iterator[Token]:
+    for document in documents:
+        yield from document.iter_hashtags()
+
+
+def iter_mentions(documents: Iterable[Document]) -> Iterator[Token]:
+    for document in documents:
+        yield from document.iter_mentions()
+
+
+def iter_noun_phrases(
+        documents: Iterable[Document],
+        det: bool = False,
+        max_len: int = 10
+) -> Iterator[List[Token]]:
+    for document in documents:
+        yield from document.iter_noun_phrases(det=det, max_len=max_len)
+
+
+def iter_sentences(documents: Iterable[Document]) -> Iterator[Sentence]:
+    for document in documents:
+        yield from document.iter_sentences()
+
+
+def iter_tokens(documents: Iterable[Document]) -> Iterator[Token]:
+    for document in documents:
+        yield from document.iter_tokens()
+
+
+def iter_urls(documents: Iterable[Document]) -> Iterator[Token]:
+    for document in documents:
+        yield from document.iter_urls()
+
+
+def iter_verb_phrases(
+        documents: Iterable[Document],
+        max_len: int = 10
+) -> Iterator[List[Token]]:
+    for document in documents:
+        yield from document.iter_verb_phrases(max_len=max_len)
+
+
 def get_tree_info(
         tokens: List[Token]
 ) -> Tuple[Dict[int, List[int]], Dict[str, List[int]]]:
-    ix2list = {x.ix: ix for ix, x in enumerate(tokens)}
-    children = {ix: [] for ix in range(len(tokens))}
+    return build_tree_info(
+        [x.ix for x in tokens],
+        [x.dependency_head_ix for x in tokens],
+        [x.dependency_type for x in tokens])
+
+
+def build_tree_info(
+        ixs: Sequence[Optional[int]],
+        dependency_head_ixs: Sequence[Optional[int]],
+        dependency_types: Sequence[Optional[str]]
+) -> Tuple[Dict[int, List[int]], Dict[str, List[int]]]:
+    ix2list = {x: ix for ix, x in enumerate(ixs)}
+    children = {ix: [] for ix in range(len(ixs))}
     dep2ixs = {}
-    for token in tokens:
-        token_ix = ix2list[token.ix]
-        if token.dependency_head_ix and token.dependency_head_ix in ix2list:
-            head_ix = ix2list[token.dependency_head_ix]
-            children[head_ix].append(token_ix)
-        if token.dependency_type not in dep2ixs:
-            dep2ixs[token.dependency_type] = []
-        dep2ixs[token.dependency_type].append(token_ix)
+    for ix, head_ix, dependency_type in zip(
+            ixs, dependency_head_ixs, dependency_types):
+        token_ix = ix2list[ix]
+        if head_ix is not None and head_ix in ix2list:
+            children[ix2list[head_ix]].append(token_ix)
+        if dependency_type not in dep2ixs:
+            dep2ixs[dependency_type] = []
+        dep2ixs[dependency_type].append(token_ix)
     return children, dep2ixs
 
 
 def get_left_right(children: Dict, ix: int) -> Tuple[int, int]:
     if len(children[ix]) == 0:
         raise ValueError
-    queue = [ix]
+    queue = deque([ix])
+    # skip edges that close a cycle, e.g. a root that is its own head
+    seen = {ix}
     all_children = []
     while len(queue) > 0:
-        current_head = queue[0]
-        current_children = children[current_head]
+        current_children = [x for x in children[queue.popleft()]
+                            if x not in seen]
+        seen.update(current_children)
         all_children += current_children
         queue += current_children
-        del queue[0]
+    if len(all_children) == 0:
+        raise ValueError
     return min(all_children), max(all_children)
+
+
+def get_spans(children: Dict[int, List[int]]) -> Dict[int, Tuple[int, int]]:
+    """Get the left and right of the subtree of every node with children.
+
+    Gives the same result as calling `get_left_right` for each of those
+    nodes, but in a single post-order traversal. Edges that would form a
+    cycle (e.g. a root that is its own head) are ignored.
+
+    Args:
+        children: Dict, mapping each node to a list of its children.
+
+    Returns:
+        Dict mapping each node with children to the (left, right) indices of
+          its descendants, not including the node itself.
+    """
+    spans = {}
+    # min and max over each finished node together with its descendants
+    extents = {}
+    visited = set()
+    for root in children:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                # come back to this node once its children are done
+                stack.append((node, True))
+                for child in children[node]:
+                    if child not in visited:
+                        visited.add(child)
+                        stack.append((child, False))
+                continue
+            left = right = None
+            for child in children[node]:
+                if child not in extents:
+                    # still on the stack, so this edge closes a cycle
+                    continue
+                child_left, child_right = extents[child]
+                if left is None or child_left < left:
+                    left = child_left
+                if right is None or child_right > right:
+                    right = child_right
+            if left is None:
+                extents[node] = (node, node)
+            else:
+                spans[node] = (left, right)
+                extents[node] = (min(node, left), max(node, right))
+    return spans
@@ -0,0 +1,271 @@
+"""Compact, versioned binary format for the NLP data structures.
+
+An encoded object is laid out as follows, all integers little-endian:
+
+    header      `HEADER`: magic, version, kind and the section sizes
+    strings     u32[n_strings + 1], offsets of each string in the blob
+    paragraphs  u32[n_paragraphs + 1], offsets of each paragraph's sentences
+    sentences   u32[n_sentences + 1], offsets of each sentence's tokens
+    columns     i32[n_tokens] for each of `STRING_COLUMNS`, as ids into the
+                string table, then for each of `nlp.INDEX_ATTRS`
+    flags       i8[n_tokens] for each of `nlp.FLAG_ATTRS`
+    blob        the utf-8 encoded strings
+
+None is stored as -1 throughout. Derived structures such as the tree index
+are not stored; sentences rebuild them when first used.
+"""
+from array import array
+import struct
+import sys
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+from data_structures.nlp import CATEGORICAL_ATTRS, Document, FLAG_ATTRS, \
+    INDEX_ATTRS, Paragraph, Sentence, Token, TokenTable, VOCAB
+
+
+MAGIC = b'DSNL'
+VERSION = 1
+HEADER = struct.Struct('<4sHBxIIIII')
+# kind codes, by position
+KINDS = (Token, Sentence, Paragraph, Document)
+# token attributes stored as ids into the string table
+STRING_COLUMNS = ('text', 'lemma') + CATEGORICAL_ATTRS
+
+
+NlpObject = Union[Token, Sentence, Paragraph, Document]
+
+
+class Reader:
+    """Random access to an encoded object in a buffer.
+
+    Only the header and section offsets are read up front. Strings and
+    sentences are decoded when asked for, so the buffer can be a memory map
+    of a much larger file.
+    """
+
+    def __init__(self, buffer, offset: int = 0):
+        view = memoryview(buffer)
+        magic, version, kind, n_strings, n_bytes, n_paragraphs, \
+            n_sentences, n_tokens = HEADER.unpack_from(view, offset)
+        if magic != MAGIC:
+            raise ValueError('Not an encoded NLP object.')
+        if version != VERSION:
+            raise ValueError(f'Unsupported format version: {version}.')
+        self.kind = KINDS[kind]
+
+        position = offset + HEADER.size
+        self.string_offsets, position = read_ints(
+            view, position, n_strings + 1, 'I')
+        self.paragraph_offsets, position = read_ints(
+            view, position, n_paragraphs + 1, 'I')
+        self.sentence_offsets, position = read_ints(
+            view, position, n_sentences + 1, 'I')
+        self.columns = {}
+        for attr in STRING_COLUMNS + INDEX_ATTRS:
+            self.columns[attr], position = read_ints(
+                view, position, n_tokens, 'i')
+        for attr in FLAG_ATTRS:
+            self.columns[attr], position = read_ints(
+                view, position, n_tokens, 'b')
+        self.blob = view[position:position + n_bytes]
+        # total number of bytes taken by this object
+        self.size = position + n_bytes - offset
+
+        # decoded strings and vocab codes, by string id
+        self._strings = {}
+        self._codes = {}
+
+    @property
+    def num_paragraphs(self) -> int:
+        return len(self.paragraph_offsets) - 1
+
+    @property
+    def num_sentences(self) -> int:
+        return len(self.sentence_offsets) - 1
+
+    def code(self, string_id: int) -> int:
+        code = self._codes.get(string_id)
+        if code is None:
+            code = VOCAB.add(self.string(string_id))
+            self._codes[string_id] = code
+        return code
+
+    def decode(self) -> NlpObject:
+        document = Document(paragraphs=[
+            Paragraph(sentences=[
+                self.sentence(i) for i in self.paragraph_sentence_ixs(j)])
+            for j in range(self.num_paragraphs)])
+        if self.kind is Document:
+            return document
+        paragraph = document.paragraphs[0]
+        if self.kind is Paragraph:
+            return paragraph
+        sentence = paragraph.sentences[0]
+        if self.kind is Sentence:
+            return sentence
+        return sentence[0]
+
+    def paragraph_sentence_ixs(self, paragraph_ix: int) -> range:
+        return range(self.paragraph_offsets[paragraph_ix],
+                     self.paragraph_offsets[paragraph_ix + 1])
+
+    def sentence(self, sentence_ix: int) -> Sentence:
+        return Sentence.from_table(self.table(sentence_ix))
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == -1:
+            return None
+        string = self._strings.get(string_id)
+        if string is None:
+            string = str(self.blob[self.string_offsets[string_id]:
+                                   self.string_offsets[string_id + 1]],
+                         'utf-8')
+            self._strings[string_id] = string
+        return string
+
+    def table(self, sentence_ix: int) -> TokenTable:
+        start = self.sentence_offsets[sentence_ix]
+        end = self.sentence_offsets[sentence_ix + 1]
+        table = TokenTable()
+        table.text = [self.string(x) for x in self.columns['text'][start:end]]
+        table.lemma = [
+            self.string(x) for x in self.columns['lemma'][start:end]]
+        for attr in CATEGORICAL_ATTRS:
+            setattr(table, attr, array(
+                'i', [self.code(x) for x in self.columns[attr][start:end]]))
+        for attr in INDEX_ATTRS:
+            setattr(table, attr, to_array('i', self.columns[attr][start:end]))
+        for attr in FLAG_ATTRS:
+            setattr(table, attr, to_array('b', self.columns[attr][start:end]))
+        return table
+
+
+#
+# functions
+#
+
+
+def dumps(obj: NlpObject) -> bytes:
+    """Encode a Token, Sentence, Paragraph or Document.
+
+    Args:
+        obj: the object to encode.
+
+    Returns:
+        Bytes, to be read back with `loads` or a `Reader`.
+    """
+    kind = get_kind(obj)
+    strings = {}
+
+    def string_id(string: Optional[str]) -> int:
+        if string is None:
+            return -1
+        if string not in strings:
+            strings[string] = len(strings)
+        return strings[string]
+
+    paragraph_offsets = array('I', [0])
+    sentence_offsets = array('I', [0])
+    columns = {attr: array('i') for attr in STRING_COLUMNS + INDEX_ATTRS}
+    flags = {attr: array('b') for attr in FLAG_ATTRS}
+    for tables in get_tables(obj):
+        for table in tables:
+            columns['text'].extend(string_id(x) for x in table.text)
+            columns['lemma'].extend(string_id(x) for x in table.lemma)
+            for attr in CATEGORICAL_ATTRS:
+                columns[attr].extend(
+                    string_id(VOCAB.strings[x]) for x in getattr(table, attr))
+            for attr in INDEX_ATTRS:
+                columns[attr].extend(getattr(table, attr))
+            for attr in FLAG_ATTRS:
+                flags[attr].extend(getattr(table, attr))
+            sentence_offsets.append(len(columns['text']))
+        paragraph_offsets.append(len(sentence_offsets) - 1)
+
+    encoded = [x.encode('utf-8') for x in strings]
+    string_offsets = array('I', [0])
+    for x in encoded:
+        string_offsets.append(string_offsets[-1] + len(x))
+
+    header = HEADER.pack(
+        MAGIC, VERSION, kind, len(encoded), string_offsets[-1],
+        len(paragraph_offsets) - 1, len(sentence_offsets) - 1,
+        len(columns['text']))
+    sections = [string_offsets, paragraph_offsets, sentence_offsets] \
+        + [columns[x] for x in STRING_COLUMNS + INDEX_ATTRS] \
+        + [flags[x] for x in FLAG_ATTRS]
+    return b''.join([header] + [to_little_endian(x) for x in sections]
+                    + encoded)
+
+
+def get_kind(obj: NlpObject) -> int:
+    # the position in KINDS, so that subclasses, e.g. LazySentence, are
+    # encoded as the class they extend
+    for kind, cls in enumerate(KINDS):
+        if isinstance(obj, cls):
+            return kind
+    raise TypeError(f'Cannot encode {type(obj)}.')
+
+
+def get_tables(obj: NlpObject) -> List[List[TokenTable]]:
+    # the token tables of each paragraph, treating everything as a document
+    if isinstance(obj, Document):
+        return [[s.table for s in p.sentences] for p in obj.paragraphs]
+    elif isinstance(obj, Paragraph):
+        return [[s.table for s in obj.sentences]]
+    elif isinstance(obj, Sentence):
+        return [[obj.table]]
+    elif isinstance(obj, Token):
+        return [[TokenTable.from_tokens([obj])]]
+    raise TypeError(f'Cannot encode {type(obj)}.')
+
+
+def loads(data: bytes) -> NlpObject:
+    """Decode an object encoded with `dumps`.
+
+    Args:
+        data: the encoded bytes.
+
+    Returns:
+        The Token, Sentence, Paragraph or Document that was encoded.
+    """
+    return Reader(data).decode()
+
+
+def read_ints(
+        view: memoryview,
+        position: int,
+        count: int,
+        typecode: str
+) -> Tuple[Union[memoryview, array], int]:
+    # read a little-endian array without copying it where we can
+    end = position + count * array(typecode).itemsize
+    if sys.byteorder == 'little':
+        return view[position:end].cast(typecode), end
+    values = array(typecode, view[position:end].tobytes())
+    values.byteswap()
+    return values, end
+
+
+def read_string(data: bytes, position: int) -> Tuple[str, int]:
+    # a u32 length followed by utf-8, as written by `write_string`
+    size, = struct.unpack_from('<I', data, position)
+    position += 4
+    return str(data[position:position + size], 'utf-8'), position + size
+
+
+def to_array(typecode: str, values: Union[memoryview, array]) -> array:
+    return array(typecode, values.tobytes())
+
+
+def to_little_endian(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_string(f: BinaryIO, string: str):
+    encoded = string.encode('utf-8')
+    f.write(struct.pack('<I', len(encoded)))
+    f.write(encoded)
@@ -0,0 +1,258 @@
+"""Streaming reader and writer of CoNLL-U files.
+
+Sentences are parsed straight into `TokenTable` columns, and their tree
+index is built while the rows are read, so no Token objects are created.
+Documents are delimited by `# newdoc` comments and paragraphs by
+`# newpar`. Only one Document is held in memory at a time, so large files
+should mark their documents.
+
+Columns are mapped as follows, `_` meaning None:
+
+    ID      ix, CoNLL-U ids are 1-based and a HEAD of 0 marks the root
+    FORM    text
+    LEMMA   lemma
+    UPOS    pos
+    HEAD    dependency_head_ix, None for the root
+    DEPREL  dependency_type
+    MISC    `TokenRange` (or `start_char`) for start_char_ix, `NER` (or
+            `ner`) for is_entity and entity_type, and `Hashtag`, `Mention`,
+            `Url` and `Stop` for the other flags
+
+XPOS, FEATS and DEPS are not kept.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from data_structures.nlp import decode_index, Document, encode_index, \
+    Paragraph, Sentence, TokenTable, TreeIndex, VOCAB
+
+
+# MISC keys of the token flags
+FLAG_KEYS = {
+    'is_hashtag': 'Hashtag', 'is_mention': 'Mention', 'is_url': 'Url',
+    'is_stop': 'Stop',
+}
+
+
+class SentenceBuilder:
+    """Collects the rows of one sentence into columns and its tree index.
+
+    As long as the ids run 1, 2, 3, ..., as they should, a token's position
+    is its id minus one, so each head is linked to its children as soon as
+    the row is read.
+    """
+
+    def __init__(self):
+        self.table = TokenTable()
+        self.children = {}
+        self.dep2ixs = {}
+        self.heads = []
+        self.sequential = True
+
+    def __len__(self):
+        return len(self.table)
+
+    def add(self, fields: List[str]):
+        table = self.table
+        position = len(table)
+        ix = int(fields[0])
+        head = None if fields[6] in ('_', '0') else int(fields[6])
+        dependency_type = none_if_empty(fields[7])
+        misc = parse_misc(fields[9])
+
+        table.text.append(fields[1])
+        table.lemma.append(
+            fields[2] if fields[2] != '_' or fields[1] == '_' else None)
+        table.pos.append(VOCAB.add(none_if_empty(fields[3])))
+        table.dependency_type.append(VOCAB.add(dependency_type))
+        table.ix.append(ix)
+        table.dependency_head_ix.append(encode_index(head))
+        table.start_char_ix.append(encode_index(get_start_char_ix(misc)))
+        entity_type = misc.get('NER', misc.get('ner'))
+        if entity_type is None:
+            table.is_entity.append(-1)
+            table.entity_type.append(0)
+        elif entity_type == 'O':
+            table.is_entity.append(0)
+            table.entity_type.append(0)
+        else:
+            # strip BIO and BIOES prefixes
+            if entity_type[:2] in ('B-', 'I-', 'E-', 'S-'):
+                entity_type = entity_type[2:]
+            table.is_entity.append(1)
+            table.entity_type.append(VOCAB.add(entity_type))
+        for attr, key in FLAG_KEYS.items():
+            value = misc.get(key)
+            getattr(table, attr).append(
+                -1 if value is None else int(value == 'Yes'))
+
+        # link the tree as we go, as build_tree_info would
+        self.sequential &= ix == position + 1
+        self.heads.append(head)
+        if head:
+            self.children.setdefault(head - 1, []).append(position)
+        self.dep2ixs.setdefault(dependency_type, []).append(position)
+
+    def build(self, build_tree: bool = True) -> Sentence:
+        sentence = Sentence.from_table(self.table)
+        if not build_tree:
+            return sentence
+        num_tokens = len(self.table)
+        if self.sequential and all(
+                x is None or x <= num_tokens for x in self.heads):
+            sentence._tree = TreeIndex(
+                {i: self.children.get(i, []) for i in range(num_tokens)},
+                self.dep2ixs)
+        else:
+            # malformed ids, fall back to matching heads by ix
+            sentence._tree = TreeIndex.from_table(self.table)
+        return sentence
+
+
+#
+# functions
+#
+
+
+def iter_documents(f: TextIO, build_tree: bool = True) -> Iterator[Document]:
+    """Read Documents from a CoNLL-U file, one at a time.
+
+    Args:
+        f: text file handle, read line by line.
+        build_tree: Bool. Whether to build the tree index of each sentence
+          while reading, rather than when first used.
+
+    Yields:
+        Document for each `# newdoc`, or for the whole file if there are
+          none.
+    """
+    paragraphs = []
+    sentences = []
+    builder = SentenceBuilder()
+
+    def end_sentence():
+        nonlocal builder
+        if len(builder) > 0:
+            sentences.append(builder.build(build_tree))
+            builder = SentenceBuilder()
+
+    def end_paragraph():
+        nonlocal sentences
+        end_sentence()
+        if sentences:
+            paragraphs.append(Paragraph(sentences=sentences))
+            sentences = []
+
+    def end_document() -> Optional[Document]:
+        nonlocal paragraphs
+        end_paragraph()
+        if not paragraphs:
+            return None
+        document = Document(paragraphs=paragraphs)
+        paragraphs = []
+        return document
+
+    for line in f:
+        line = line.rstrip('\r\n')
+        if not line:
+            end_sentence()
+        elif line[0] == '#':
+            if line.startswith('# newdoc'):
+                document = end_document()
+                if document is not None:
+                    yield document
+            elif line.startswith('# newpar'):
+                end_paragraph()
+        else:
+            fields = line.split('\t')
+            if len(fields) != 10:
+                raise ValueError(f'Expected 10 fields, got {len(fields)}: '
+                                 f'{line!r}.')
+            # skip multiword token ranges and empty nodes
+            if '-' in fields[0] or '.' in fields[0]:
+                continue
+            builder.add(fields)
+
+    document = end_document()
+    if document is not None:
+        yield document
+
+
+def read_conllu(path: str, build_tree: bool = True) -> Iterator[Document]:
+    with open(path, encoding='utf-8') as f:
+        yield from iter_documents(f, build_tree=build_tree)
+
+
+def write_conllu(documents: Iterable[Document], f: TextIO):
+    """Write Documents to a CoNLL-U file, readable with `iter_documents`.
+
+    Token ids are the positions in each sentence, plus one, and heads are
+    mapped to them through `ix`. A token that is its own head, or whose head
+    is not in the sentence, is written as a root.
+
+    Args:
+        documents: Iterable of Documents, consumed one at a time.
+        f: text file handle.
+    """
+    for document in documents:
+        f.write('# newdoc\n')
+        for paragraph in document.paragraphs:
+            f.write('# newpar\n')
+            for sentence in paragraph.sentences:
+                f.write(f'# text = {sentence.text}\n')
+                f.writelines(get_lines(sentence.table))
+                f.write('\n')
+
+
+def get_lines(table: TokenTable) -> List[str]:
+    # the token rows of a sentence
+    ix2id = {x: i + 1 for i, x in enumerate(table.ix) if x != -1}
+    lines = []
+    for i in range(len(table)):
+        head = ix2id.get(table.dependency_head_ix[i], 0)
+        if head == i + 1:
+            head = 0
+        misc = []
+        start_char_ix = decode_index(table.start_char_ix[i])
+        if start_char_ix is not None:
+            end_char_ix = start_char_ix + len(table.text[i])
+            misc.append(f'TokenRange={start_char_ix}:{end_char_ix}')
+        if table.is_entity[i] == 1:
+            misc.append(f'NER={VOCAB.strings[table.entity_type[i]] or "O"}')
+        elif table.is_entity[i] == 0:
+            misc.append('NER=O')
+        for attr, key in FLAG_KEYS.items():
+            value = getattr(table, attr)[i]
+            if value != -1:
+                misc.append(f'{key}={"Yes" if value == 1 else "No"}')
+        fields = [
+            str(i + 1),
+            table.text[i],
+            table.lemma[i] or '_',
+            VOCAB.strings[table.pos[i]] or '_',
+            '_',
+            '_',
+            str(head),
+            VOCAB.strings[table.dependency_type[i]] or '_',
+            '_',
+            '|'.join(misc) or '_',
+        ]
+        lines.append('\t'.join(fields) + '\n')
+    return lines
+
+
+def get_start_char_ix(misc: Dict[str, str]) -> Optional[int]:
+    if 'TokenRange' in misc:
+        return int(misc['TokenRange'].split(':')[0])
+    if 'start_char' in misc:
+        return int(misc['start_char'])
+    return None
+
+
+def none_if_empty(value: str) -> Optional[str]:
+    return None if value == '_' else value
+
+
+def parse_misc(misc: str) -> Dict[str, str]:
+    if misc == '_':
+        return {}
+    return dict(x.split('=', 1) for x in misc.split('|') if '=' in x)
@@ -0,0 +1,333 @@
+"""Streaming frequency counts of phrases and n-grams over many Documents.
+
+Phrases are interned: each distinct phrase of a kind gets an id once, and
+counts are kept in one flat array per kind indexed by that id. Counters
+built separately, e.g. by different workers, can be merged, and partial
+counts can be saved to disk and loaded back to be merged later.
+
+With `max_size` set, a kind that grows past that many distinct phrases drops
+its least frequent ones, so memory stays bounded on corpora with a long
+tail. This is lossy counting: each phrase also keeps how often it may have
+been seen before it was last added, at most the `errors[kind]` of the time,
+so that `count <= true count <= count + delta`, see `bounds`.
+"""
+from array import array
+import heapq
+import struct
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, \
+    Sequence, Tuple
+
+from data_structures.nlp import Document, Sentence
+from data_structures.nlp_binary import read_ints, read_string, \
+    to_little_endian, write_string
+
+
+MAGIC = b'DSNC'
+VERSION = 2
+HEADER = struct.Struct('<4sHBBBBHQ')
+KINDS = ('entity', 'hashtag', 'mention', 'ngram', 'np', 'vp')
+
+
+class PhraseCounter:
+    """Counts of the phrases of each kind seen in a stream of Documents.
+
+    Args:
+        kinds: Sequence of `KINDS` to count. 'entity', 'hashtag' and
+          'mention' count the same tokens as the corresponding Sentence
+          properties, 'ngram' counts every `n` consecutive tokens, and 'np'
+          and 'vp' count noun and verb phrases.
+        n: Int. Length of the n-grams.
+        lower: Bool. Whether to lowercase phrases before counting.
+        det: Bool. Passed on to noun phrase extraction.
+        max_len: Int. Passed on to noun and verb phrase extraction.
+        max_size: Int. Maximum number of distinct phrases kept per kind, or
+          None to keep everything.
+    """
+
+    def __init__(
+            self,
+            kinds: Sequence[str] = ('np', 'vp'),
+            n: int = 2,
+            lower: bool = False,
+            det: bool = False,
+            max_len: int = 10,
+            max_size: Optional[int] = None
+    ):
+        for kind in kinds:
+            if kind not in KINDS:
+                raise ValueError(f'Unknown phrase kind: {kind}.')
+        if max_size is not None and max_size < 2:
+            raise ValueError(f'max_size must be at least 2, got {max_size}.')
+        self.n = n
+        self.lower = lower
+        self.det = det
+        self.max_len = max_len
+        self.max_size = max_size
+        self.ids = {}
+        self.phrases = {}
+        self.counts = {}
+        # how much the count of each phrase may be too low by
+        self.deltas = {}
+        # the most any phrase not kept may have been counted
+        self.errors = {}
+        for kind in kinds:
+            self._add_kind(kind)
+
+    def __len__(self):
+        return sum(len(x) for x in self.phrases.values())
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self.phrases)
+
+    def add(self, kind: str, phrase: str, count: int = 1):
+        ids = self._ids(kind)
+        if self.lower:
+            phrase = phrase.lower()
+        phrase_id = ids.get(phrase)
+        if phrase_id is None:
+            ids[phrase] = len(ids)
+            self.phrases[kind].append(phrase)
+            self.counts[kind].append(count)
+            # it may have been counted and dropped before
+            self.deltas[kind].append(self.errors[kind])
+            if self.max_size is not None and len(ids) > self.max_size:
+                self._shrink(kind)
+        else:
+            self.counts[kind][phrase_id] += count
+
+    def add_document(self, document: Document):
+        for sentence in document.iter_sentences():
+            self.add_sentence(sentence)
+
+    def add_sentence(self, sentence: Sentence):
+        for kind in self.kinds:
+            for phrase in get_phrases(
+                    sentence, kind, self.n, self.det, self.max_len):
+                self.add(kind, phrase)
+
+    def bounds(self, kind: str, phrase: str) -> Tuple[int, int]:
+        """The least and most times a phrase may have been seen."""
+        if self.lower:
+            phrase = phrase.lower()
+        phrase_id = self._ids(kind).get(phrase)
+        if phrase_id is None:
+            return 0, self.errors[kind]
+        count = self.counts[kind][phrase_id]
+        return count, count + self.deltas[kind][phrase_id]
+
+    def count(self, kind: str, phrase: str) -> int:
+        if self.lower:
+            phrase = phrase.lower()
+        phrase_id = self._ids(kind).get(phrase)
+        return 0 if phrase_id is None else self.counts[kind][phrase_id]
+
+    def iter_counts(self, kind: str) -> Iterator[Tuple[str, int]]:
+        self._check(kind)
+        return zip(self.phrases[kind], self.counts[kind])
+
+    def merge(self, other: 'PhraseCounter') -> 'PhraseCounter':
+        """Add the counts of another counter to this one.
+
+        Args:
+            other: PhraseCounter, with the same n, lower, det and max_len.
+
+        Returns:
+            This counter, for chaining.
+        """
+        for attr in ['n', 'lower', 'det', 'max_len']:
+            if getattr(self, attr) != getattr(other, attr):
+                raise ValueError(
+                    f'Cannot merge counters with different {attr}: '
+                    f'{getattr(self, attr)} and {getattr(other, attr)}.')
+        for kind in other.kinds:
+            if kind not in self.ids:
+                self._add_kind(kind)
+            # phrases are already lowercased where needed
+            ids = self.ids[kind]
+            phrases = self.phrases[kind]
+            counts = self.counts[kind]
+            deltas = self.deltas[kind]
+            # each side may have dropped what only the other kept
+            error = self.errors[kind]
+            other_error = other.errors[kind]
+            other_ids = other.ids[kind]
+            for phrase, phrase_id in ids.items():
+                if phrase not in other_ids:
+                    deltas[phrase_id] += other_error
+            for phrase, count, delta in zip(
+                    other.phrases[kind], other.counts[kind],
+                    other.deltas[kind]):
+                phrase_id = ids.get(phrase)
+                if phrase_id is None:
+                    ids[phrase] = len(ids)
+                    phrases.append(phrase)
+                    counts.append(count)
+                    deltas.append(delta + error)
+                else:
+                    counts[phrase_id] += count
+                    deltas[phrase_id] += delta
+            self.errors[kind] = error + other_error
+            if self.max_size is not None and len(ids) > self.max_size:
+                self._shrink(kind)
+        return self
+
+    def most_common(
+            self,
+            kind: str,
+            k: Optional[int] = None
+    ) -> List[Tuple[str, int]]:
+        """Phrases of a kind with their counts, most frequent first.
+
+        Args:
+            kind: String, one of the counted kinds.
+            k: Int. Number of phrases to return, or None for all of them.
+
+        Returns:
+            List of (phrase, count), ties in the order first seen.
+        """
+        counts = self.counts[self._check(kind)]
+        if k is None:
+            ids = sorted(range(len(counts)), key=lambda x: -counts[x])
+        else:
+            ids = heapq.nsmallest(
+                k, range(len(counts)), key=lambda x: -counts[x])
+        return [(self.phrases[kind][x], counts[x]) for x in ids]
+
+    def prune(self, min_count: int, kind: Optional[str] = None):
+        """Drop phrases counted fewer than `min_count` times.
+
+        Args:
+            min_count: Int. Phrases with lower counts are dropped.
+            kind: String. Only prune this kind, defaults to every kind.
+        """
+        for kind in self.kinds if kind is None else [self._check(kind)]:
+            self._drop(kind, [x >= min_count for x in self.counts[kind]])
+
+    def save(self, f: BinaryIO):
+        f.write(HEADER.pack(
+            MAGIC, VERSION, len(self.phrases), self.n, self.lower, self.det,
+            self.max_len, self.max_size or 0))
+        for kind, phrases in self.phrases.items():
+            write_string(f, kind)
+            f.write(struct.pack('<QI', self.errors[kind], len(phrases)))
+            for phrase in phrases:
+                write_string(f, phrase)
+            f.write(to_little_endian(self.counts[kind]))
+            f.write(to_little_endian(self.deltas[kind]))
+
+    @classmethod
+    def load(cls, f: BinaryIO):
+        data = f.read()
+        magic, version, num_kinds, n, lower, det, max_len, max_size = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a phrase counter.')
+        if version != VERSION:
+            raise ValueError(f'Unsupported counter version: {version}.')
+        counter = cls(kinds=[], n=n, lower=bool(lower), det=bool(det),
+                      max_len=max_len, max_size=max_size or None)
+        view = memoryview(data)
+        position = HEADER.size
+        for _ in range(num_kinds):
+            kind, position = read_string(data, position)
+            counter._add_kind(kind)
+            counter.errors[kind], num_phrases = \
+                struct.unpack_from('<QI', data, position)
+            position += 12
+            phrases = counter.phrases[kind]
+            for _ in range(num_phrases):
+                phrase, position = read_string(data, position)
+                phrases.append(phrase)
+            counts, position = read_ints(view, position, num_phrases, 'Q')
+            counter.counts[kind] = array('Q', counts.tobytes())
+            deltas, position = read_ints(view, position, num_phrases, 'Q')
+            counter.deltas[kind] = array('Q', deltas.tobytes())
+            counter.ids[kind] = {x: i for i, x in enumerate(phrases)}
+        return counter
+
+    def _add_kind(self, kind: str):
+        self.ids[kind] = {}
+        self.phrases[kind] = []
+        self.counts[kind] = array('Q')
+        self.deltas[kind] = array('Q')
+        self.errors[kind] = 0
+
+    def _check(self, kind: str) -> str:
+        if kind not in self.ids:
+            raise ValueError(f'Kind not counted: {kind}.')
+        return kind
+
+    def _drop(self, kind: str, keep: List[bool]):
+        # the most a dropped phrase may have been seen bounds the phrases
+        # not kept
+        counts = self.counts[kind]
+        deltas = self.deltas[kind]
+        kept = [i for i, x in enumerate(keep) if x]
+        self.errors[kind] = max(
+            [self.errors[kind]]
+            + [counts[i] + deltas[i] for i, x in enumerate(keep) if not x])
+        phrases = [self.phrases[kind][i] for i in kept]
+        self.phrases[kind] = phrases
+        self.counts[kind] = array('Q', [counts[i] for i in kept])
+        self.deltas[kind] = array('Q', [deltas[i] for i in kept])
+        self.ids[kind] = {x: i for i, x in enumerate(phrases)}
+
+    def _ids(self, kind: str) -> Dict[str, int]:
+        return self.ids[self._check(kind)]
+
+    def _shrink(self, kind: str):
+        # drop everything that may have been seen no more often than the
+        # phrase at half size, leaving room to grow before the next shrink
+        highs = [x + y for x, y in zip(self.counts[kind], self.deltas[kind])]
+        threshold = heapq.nlargest(self.max_size // 2 + 1, highs)[-1]
+        self._drop(kind, [x > threshold for x in highs])
+
+
+#
+# functions
+#
+
+
+def count_phrases(
+        documents: Iterable[Document],
+        counter: Optional[PhraseCounter] = None,
+        **kwargs
+) -> PhraseCounter:
+    """Add an iterable of Documents to a new or existing counter.
+
+    Args:
+        documents: Iterable of Documents, consumed one at a time.
+        counter: PhraseCounter to add to. If None, a new one is created with
+          `kwargs`.
+
+    Returns:
+        The PhraseCounter.
+    """
+    counter = PhraseCounter(**kwargs) if counter is None else counter
+    for document in documents:
+        counter.add_document(document)
+    return counter
+
+
+def get_phrases(
+        sentence: Sentence,
+        kind: str,
+        n: int = 2,
+        det: bool = False,
+        max_len: int = 10
+) -> List[str]:
+    # the phrases of a kind in a sentence, as space joined token text
+    table = sentence.table
+    if kind in ('entity', 'hashtag', 'mention'):
+        flags = getattr(table, f'is_{kind}')
+        return [table.text[i] for i, x in enumerate(flags) if x == 1]
+    if kind == 'ngram':
+        spans = [(i, i + n - 1) for i in range(len(table) - n + 1)]
+    elif kind == 'np':
+        spans = sentence.get_noun_phrase_spans(det=det, max_len=max_len)
+    elif kind == 'vp':
+        spans = sentence.get_verb_phrase_spans(max_len=max_len)
+    else:
+        raise ValueError(f'Unknown phrase kind: {kind}.')
+    return [' '.join(table.text[left:right + 1]) for left, right in spans]
@@ -0,0 +1,147 @@
+"""Inverted index over a corpus of Documents.
+
+Maps terms of each `FIELDS` to the positions of the tokens they occur at.
+Postings of a term are one flat array of (doc_id, sentence_ix, token_ix)
+triples, so the index stays compact, and Documents can be added as they
+arrive.
+"""
+from array import array
+import struct
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, \
+    Optional, Tuple
+
+from data_structures.nlp import Document, TokenTable, VOCAB
+from data_structures.nlp_binary import read_ints, read_string, \
+    to_little_endian, write_string
+
+
+MAGIC = b'DSNI'
+VERSION = 1
+HEADER = struct.Struct('<4sHBxI')
+# the fields that can be looked up
+FIELDS = ('text', 'lemma', 'entity_type', 'hashtag', 'mention')
+
+
+class Posting(NamedTuple):
+    doc_id: int
+    sentence_ix: int
+    token_ix: int
+
+
+class CorpusIndex:
+    """Postings lists for token text, lemma, entity type, hashtag and mention.
+
+    Doc ids are assigned in the order Documents are added, starting at 0, and
+    sentence indices refer to `Document.sentences`.
+    """
+
+    def __init__(self):
+        self.num_documents = 0
+        self.postings = {field: {} for field in FIELDS}
+
+    def __len__(self):
+        return self.num_documents
+
+    def add(self, document: Document) -> int:
+        doc_id = self.num_documents
+        for sentence_ix, sentence in enumerate(document.iter_sentences()):
+            for field, terms in get_terms(sentence.table).items():
+                postings = self.postings[field]
+                for token_ix, term in terms:
+                    if term not in postings:
+                        postings[term] = array('I')
+                    postings[term].extend((doc_id, sentence_ix, token_ix))
+        self.num_documents += 1
+        return doc_id
+
+    def count(self, field: str, term: str) -> int:
+        return len(self._get(field, term)) // 3
+
+    def doc_ids(self, field: str, term: str) -> List[int]:
+        # each document once, in order
+        return sorted(set(self._get(field, term)[::3]))
+
+    def iter_terms(self, field: str) -> Iterator[str]:
+        return iter(self._field(field))
+
+    def lookup(self, field: str, term: str) -> List[Posting]:
+        postings = self._get(field, term)
+        return [Posting(*postings[i:i + 3])
+                for i in range(0, len(postings), 3)]
+
+    def save(self, f: BinaryIO):
+        f.write(HEADER.pack(MAGIC, VERSION, len(FIELDS), self.num_documents))
+        for field in FIELDS:
+            write_string(f, field)
+            postings = self.postings[field]
+            f.write(struct.pack('<I', len(postings)))
+            for term, values in postings.items():
+                write_string(f, term)
+                f.write(struct.pack('<I', len(values)))
+                f.write(to_little_endian(values))
+
+    @classmethod
+    def load(cls, f: BinaryIO):
+        data = f.read()
+        magic, version, num_fields, num_documents = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a corpus index.')
+        if version != VERSION:
+            raise ValueError(f'Unsupported index version: {version}.')
+        index = cls()
+        index.num_documents = num_documents
+        view = memoryview(data)
+        position = HEADER.size
+        for _ in range(num_fields):
+            field, position = read_string(data, position)
+            postings = index.postings.setdefault(field, {})
+            num_terms, = struct.unpack_from('<I', data, position)
+            position += 4
+            for _ in range(num_terms):
+                term, position = read_string(data, position)
+                size, = struct.unpack_from('<I', data, position)
+                values, position = read_ints(view, position + 4, size, 'I')
+                postings[term] = array('I', values.tobytes())
+        return index
+
+    def _field(self, field: str) -> Dict[str, array]:
+        if field not in self.postings:
+            raise ValueError(f'Unknown field: {field}.')
+        return self.postings[field]
+
+    def _get(self, field: str, term: str) -> array:
+        return self._field(field).get(term, array('I'))
+
+
+#
+# functions
+#
+
+
+def build_index(
+        documents: Iterable[Document],
+        index: Optional[CorpusIndex] = None
+) -> CorpusIndex:
+    """Add an iterable of Documents to a new or existing index."""
+    index = CorpusIndex() if index is None else index
+    for document in documents:
+        index.add(document)
+    return index
+
+
+def get_terms(table: TokenTable) -> Dict[str, List[Tuple[int, str]]]:
+    # (token_ix, term) pairs of each field, read straight from the columns
+    return {
+        'text': list(enumerate(table.text)),
+        'lemma': [(i, x) for i, x in enumerate(table.lemma)
+                  if x is not None],
+        'entity_type': [(i, VOCAB.strings[x])
+                        for i, x in enumerate(table.entity_type)
+                        if table.is_entity[i] == 1
+                        and VOCAB.strings[x] is not None],
+        'hashtag': [(i, table.text[i])
+                    for i, x in enumerate(table.is_hashtag) if x == 1],
+        'mention': [(i, table.text[i])
+                    for i, x in enumerate(table.is_mention) if x == 1],
+    }
@@ -0,0 +1,134 @@
+"""Phrase extraction over many Documents with a process pool.
+
+Workers are only sent the columns that phrase extraction needs, as raw
+array bytes, and send back spans rather than tokens.
+"""
+from array import array
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+import os
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, \
+    Tuple
+
+from data_structures.nlp import build_tree_info, decode_index, Document, \
+    get_noun_phrase_spans, get_verb_phrase_spans, TreeIndex, VOCAB
+
+
+KINDS = ('np', 'vp')
+
+
+# the columns of one sentence: ix, dependency_head_ix, pos, dependency_type
+SentenceData = Tuple[bytes, bytes, bytes, bytes]
+
+
+class PhraseSpan(NamedTuple):
+    doc_id: int
+    sentence_ix: int
+    left: int
+    right: int
+    kind: str
+
+
+def extract_phrases(
+        documents: Iterable[Document],
+        kinds: Sequence[str] = KINDS,
+        workers: Optional[int] = None,
+        chunksize: int = 64,
+        det: bool = False,
+        max_len: int = 10
+) -> Iterator[PhraseSpan]:
+    """Extract noun and/or verb phrase spans from a stream of Documents.
+
+    Args:
+        documents: Iterable of Documents. Consumed lazily, keeping at most a
+          couple of chunks per worker in flight.
+        kinds: Sequence of 'np' and/or 'vp'.
+        workers: Int. Number of processes, defaults to the number of CPUs. With
+          one worker everything runs in this process.
+        chunksize: Int. Number of Documents sent to a worker at a time.
+        det: Bool. Passed on to noun phrase extraction.
+        max_len: Int. Passed on to noun and verb phrase extraction.
+
+    Yields:
+        PhraseSpan for each phrase, in document order. `doc_id` is the
+          position of the Document in `documents`, `sentence_ix` the index
+          into `Document.sentences` and `left` and `right` are inclusive token
+          indices in that sentence, as from `Sentence.get_noun_phrase_spans`.
+    """
+    for kind in kinds:
+        if kind not in KINDS:
+            raise ValueError(f'Unknown phrase kind: {kind}.')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = get_chunks(documents, chunksize)
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from extract_chunk(chunk, VOCAB.strings, kinds, det, max_len)
+        return
+
+    with Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            # the codes in the chunk are only meaningful with our vocab
+            pending.append(pool.apply_async(
+                extract_chunk,
+                (chunk, list(VOCAB.strings), kinds, det, max_len)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def extract_chunk(
+        chunk: List[Tuple[int, List[SentenceData]]],
+        strings: Sequence[Optional[str]],
+        kinds: Sequence[str],
+        det: bool,
+        max_len: int
+) -> List[PhraseSpan]:
+    # map the codes of the sending process to ours
+    codes = [VOCAB.add(x) for x in strings]
+    phrases = []
+    for doc_id, sentences in chunk:
+        for sentence_ix, columns in enumerate(sentences):
+            ixs, head_ixs, pos, dependency_type = \
+                [array('i', x) for x in columns]
+            tree = TreeIndex(*build_tree_info(
+                [decode_index(x) for x in ixs],
+                [decode_index(x) for x in head_ixs],
+                [strings[x] for x in dependency_type]))
+            pos = [codes[x] for x in pos]
+            dependency_type = [codes[x] for x in dependency_type]
+            for kind in kinds:
+                if kind == 'np':
+                    spans = get_noun_phrase_spans(
+                        tree, pos, dependency_type, det=det, max_len=max_len)
+                else:
+                    spans = get_verb_phrase_spans(tree, pos, max_len=max_len)
+                for left, right in spans:
+                    phrases.append(PhraseSpan(
+                        doc_id, sentence_ix, left, right, kind))
+    return phrases
+
+
+def get_chunks(
+        documents: Iterable[Document],
+        chunksize: int
+) -> Iterator[List[Tuple[int, List[SentenceData]]]]:
+    documents = enumerate(documents)
+    while True:
+        chunk = [(doc_id, get_sentence_data(document))
+                 for doc_id, document in islice(documents, chunksize)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_sentence_data(document: Document) -> List[SentenceData]:
+    return [(s.table.ix.tobytes(),
+             s.table.dependency_head_ix.tobytes(),
+             s.table.pos.tobytes(),
+             s.table.dependency_type.tobytes())
+            for s in document.sentences]
@@ -0,0 +1,246 @@
+"""Declarative dependency patterns, compiled to match many rules at once.
+
+A `Pattern` describes the tokens it matches by their dependency type, part
+of speech, entity flag and those of their head, and what span to return for
+a match. A `Matcher` compiles a list of patterns to vocab codes once, and
+groups them by dependency type, so each sentence is matched in a single
+pass over its `dep2ixs` index, testing a token only against the patterns
+that can apply to it.
+
+The noun and verb phrase rules of `nlp` can be written as patterns, see
+`get_noun_phrase_patterns` and `get_verb_phrase_patterns`.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from data_structures.nlp import NP_HEAD_SHOULD_BE_NOUN, NP_TARGET_TYPES, \
+    Sentence, VERB_POS, VOCAB, VP_HEAD_SHOULD_BE_VERB, VP_TARGET_TYPES
+
+
+SPANS = ('subtree', 'token')
+
+
+# a string or any of several strings, None matching anything
+Values = Optional[Union[str, Sequence[str]]]
+
+
+class Pattern(NamedTuple):
+    """A rule matching tokens of a sentence.
+
+    Attributes:
+        name: String, given to the matches of this pattern.
+        dependency_type: the token's dependency type(s).
+        pos: the token's part(s) of speech.
+        not_pos: part(s) of speech the token must not have.
+        is_entity: Bool, whether the token must (not) be an entity. Tokens
+          whose flag is None count as not being one.
+        head_dependency_type: the dependency type(s) of the token's head.
+        head_pos: the part(s) of speech of the token's head.
+        head_is_entity: Bool, whether the head must (not) be an entity.
+        span: 'subtree' for the span of the token's descendants, as in
+          `TreeIndex.spans`, so tokens without children never match, or
+          'token' for the token itself.
+        trim: dependency types to drop from the left of the span, each at
+          most once and in this order.
+        max_len: Int. Matches whose span is wider than this, before
+          trimming, are skipped.
+        min_len: Int. Matches whose span is narrower than this, after
+          trimming, are skipped. Widths are `right - left`.
+    """
+    name: str
+    dependency_type: Values = None
+    pos: Values = None
+    not_pos: Values = None
+    is_entity: Optional[bool] = None
+    head_dependency_type: Values = None
+    head_pos: Values = None
+    head_is_entity: Optional[bool] = None
+    span: str = 'subtree'
+    trim: Sequence[str] = ()
+    max_len: Optional[int] = None
+    min_len: int = 0
+
+
+class Match(NamedTuple):
+    name: str
+    ix: int
+    left: int
+    right: int
+
+
+class Matcher:
+    """Matches a list of patterns against sentences.
+
+    Matches are ordered by pattern, then by the position of the token's
+    dependency type in the pattern's `dependency_type`, then by token, the
+    same order the rules in `nlp` produce their spans in.
+    """
+
+    def __init__(self, patterns: Sequence[Pattern]):
+        self.patterns = list(patterns)
+        # compiled patterns of each dependency type, and those for any type
+        self.by_dependency_type = {}
+        self.any_dependency_type = []
+        self.uses_heads = False
+        for pattern_ix, pattern in enumerate(self.patterns):
+            if pattern.span not in SPANS:
+                raise ValueError(f'Unknown span: {pattern.span}.')
+            compiled = compile_pattern(pattern_ix, pattern)
+            self.uses_heads |= compiled[4]
+            if pattern.dependency_type is None:
+                self.any_dependency_type.append((0, compiled))
+                continue
+            for rank, dep in enumerate(to_tuple(pattern.dependency_type)):
+                self.by_dependency_type.setdefault(dep, []).append(
+                    (rank, compiled))
+        self._any_pattern_ixs = {x[0] for _, x in self.any_dependency_type}
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def match(self, sentence: Sentence) -> List[Match]:
+        table = sentence.table
+        tree = sentence.tree
+        spans = tree.spans
+        pos = table.pos
+        dependency_type = table.dependency_type
+        is_entity = table.is_entity
+        num_tokens = len(table)
+        heads = get_heads(tree.children, num_tokens) \
+            if self.uses_heads else None
+
+        # matches of each pattern, by rank of the dependency type
+        buckets = {}
+        for dep, ixs in tree.dep2ixs.items():
+            candidates = self.by_dependency_type.get(dep, []) \
+                + self.any_dependency_type
+            for rank, compiled in candidates:
+                pattern_ix, pos_codes, not_pos_codes, entity, has_head, \
+                    head_dep_codes, head_pos_codes, head_entity, \
+                    subtree, trim, max_len, min_len = compiled
+                bucket = buckets.setdefault((pattern_ix, rank), [])
+                for ix in ixs:
+                    if pos_codes is not None and pos[ix] not in pos_codes:
+                        continue
+                    if not_pos_codes is not None and pos[ix] in not_pos_codes:
+                        continue
+                    if entity is not None \
+                            and (is_entity[ix] == 1) != entity:
+                        continue
+                    if has_head:
+                        head = heads[ix]
+                        if head == -1:
+                            continue
+                        if head_dep_codes is not None \
+                                and dependency_type[head] \
+                                not in head_dep_codes:
+                            continue
+                        if head_pos_codes is not None \
+                                and pos[head] not in head_pos_codes:
+                            continue
+                        if head_entity is not None \
+                                and (is_entity[head] == 1) != head_entity:
+                            continue
+                    if subtree:
+                        if ix not in spans:
+                            continue
+                        left, right = spans[ix]
+                    else:
+                        left = right = ix
+                    if max_len is not None and right - left > max_len:
+                        continue
+                    for code in trim:
+                        if dependency_type[left] == code:
+                            left += 1
+                        if left > num_tokens - 1:
+                            break
+                    else:
+                        if right - left >= min_len:
+                            bucket.append(Match(
+                                self.patterns[pattern_ix].name, ix, left,
+                                right))
+
+        matches = []
+        for key in sorted(buckets):
+            bucket = buckets[key]
+            if key[0] in self._any_pattern_ixs:
+                # tokens of any type come in dep2ixs order, sort them
+                bucket.sort(key=lambda x: x.ix)
+            matches += bucket
+        return matches
+
+    def match_spans(
+            self,
+            sentence: Sentence
+    ) -> Dict[str, List[Tuple[int, int]]]:
+        # (left, right) spans by pattern name
+        spans = {x.name: [] for x in self.patterns}
+        for match in self.match(sentence):
+            spans[match.name].append((match.left, match.right))
+        return spans
+
+
+#
+# functions
+#
+
+
+def compile_pattern(pattern_ix: int, pattern: Pattern) -> tuple:
+    # the pattern with strings replaced by vocab codes
+    head_dep_codes = to_codes(pattern.head_dependency_type)
+    head_pos_codes = to_codes(pattern.head_pos)
+    return (
+        pattern_ix,
+        to_codes(pattern.pos),
+        to_codes(pattern.not_pos),
+        pattern.is_entity,
+        head_dep_codes is not None or head_pos_codes is not None
+        or pattern.head_is_entity is not None,
+        head_dep_codes,
+        head_pos_codes,
+        pattern.head_is_entity,
+        pattern.span == 'subtree',
+        [VOCAB.add(x) for x in pattern.trim],
+        pattern.max_len,
+        pattern.min_len,
+    )
+
+
+def get_heads(children: Dict[int, List[int]], num_tokens: int) -> List[int]:
+    # the position of the head of each token, -1 for none
+    heads = [-1] * num_tokens
+    for head, ixs in children.items():
+        for ix in ixs:
+            heads[ix] = head
+    return heads
+
+
+def get_noun_phrase_patterns(
+        det: bool = False,
+        max_len: int = 10
+) -> List[Pattern]:
+    """The rules of `nlp.get_noun_phrase_spans` as patterns named 'np'."""
+    trim = ('prep',) if det else ('prep', 'det')
+    return [Pattern(
+        'np', dependency_type=dep,
+        pos='NOUN' if dep in NP_HEAD_SHOULD_BE_NOUN else None,
+        not_pos='PRON', trim=trim, max_len=max_len, min_len=2)
+        for dep in NP_TARGET_TYPES]
+
+
+def get_verb_phrase_patterns(max_len: int = 10) -> List[Pattern]:
+    """The rules of `nlp.get_verb_phrase_spans` as patterns named 'vp'."""
+    return [Pattern(
+        'vp', dependency_type=dep,
+        pos=VERB_POS if dep in VP_HEAD_SHOULD_BE_VERB else None,
+        max_len=max_len, min_len=2)
+        for dep in VP_TARGET_TYPES]
+
+
+def to_codes(values: Values) -> Optional[frozenset]:
+    if values is None:
+        return None
+    return frozenset(VOCAB.add(x) for x in to_tuple(values))
+
+
+def to_tuple(values: Union[str, Sequence[str]]) -> Tuple[str, ...]:
+    return (values,) if isinstance(values, str) else tuple(values)
@@ -0,0 +1,184 @@
+"""On disk store of many Documents, read lazily through a memory map.
+
+The file holds a `HEADER`, each Document encoded with `nlp_binary` (padded
+to four bytes), an index of u64 offsets to each of them, and a `FOOTER`
+giving the index offset and number of Documents.
+"""
+from array import array
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Iterator, List, Union
+
+from data_structures import nlp_binary
+from data_structures.nlp import Document, Paragraph, Sentence, TokenTable
+
+
+MAGIC = b'DSNS'
+VERSION = 1
+HEADER = struct.Struct('<4sHxx')
+FOOTER = struct.Struct('<QQ4s')
+
+
+class LazySentence(Sentence):
+    """A Sentence whose tokens are decoded from a store when first used."""
+
+    def __init__(self, reader: nlp_binary.Reader, sentence_ix: int):
+        self._reader = reader
+        self._sentence_ix = sentence_ix
+        self._table = None
+        self._tree = None
+
+    def __len__(self):
+        # the offsets give us the number of tokens without decoding
+        if self._table is None:
+            return self._reader.sentence_offsets[self._sentence_ix + 1] \
+                - self._reader.sentence_offsets[self._sentence_ix]
+        return len(self._table)
+
+    def __reduce__(self):
+        # pickle as a plain sentence, as the buffer cannot be pickled
+        return Sentence.from_table, (self.table,)
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._table is not None
+
+    @property
+    def table(self) -> TokenTable:
+        if self._table is None:
+            self._table = self._reader.table(self._sentence_ix)
+        return self._table
+
+    @table.setter
+    def table(self, value: TokenTable):
+        self._table = value
+
+
+class DocumentStore:
+    """Read only access to a store written by a `StoreWriter`.
+
+    Indexing returns Documents right away, but each of their sentences is
+    only decoded from the mapped file when it is accessed.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._mmap = None
+        try:
+            # empty files cannot be mapped, and shorter ones have no footer
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER.size + FOOTER.size:
+                raise ValueError(f'Not a document store: {path}.')
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._offsets = self._read_index(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getitem__(
+            self,
+            ix: Union[int, slice]
+    ) -> Union[Document, List[Document]]:
+        if isinstance(ix, slice):
+            return [self.get(i) for i in range(*ix.indices(len(self)))]
+        if ix < 0:
+            ix += len(self)
+        if not 0 <= ix < len(self):
+            raise IndexError(ix)
+        return self.get(ix)
+
+    def __iter__(self) -> Iterator[Document]:
+        for ix in range(len(self)):
+            yield self.get(ix)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def close(self):
+        try:
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # documents from the store are still alive, the map is closed
+            # when they are garbage collected
+            pass
+        self._file.close()
+
+    def _read_index(self, path: str) -> array:
+        magic, version = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'Not a document store: {path}.')
+        if version != VERSION:
+            raise ValueError(f'Unsupported store version: {version}.')
+        index_offset, num_documents, magic = FOOTER.unpack_from(
+            self._mmap, len(self._mmap) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f'Document store is truncated: {path}.')
+        offsets = array(
+            'Q', self._mmap[index_offset:index_offset + 8 * num_documents])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        return offsets
+
+    def get(self, ix: int) -> Document:
+        reader = nlp_binary.Reader(self._mmap, self._offsets[ix])
+        return Document(paragraphs=[
+            Paragraph(sentences=[
+                LazySentence(reader, i)
+                for i in reader.paragraph_sentence_ixs(j)])
+            for j in range(reader.num_paragraphs)])
+
+
+class StoreWriter:
+    """Writes Documents to a new store, to be read with a `DocumentStore`."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._offsets = array('Q')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # without a footer the partial store reads as truncated
+            self._file.close()
+
+    def add(self, document: Document):
+        if not isinstance(document, Document):
+            raise TypeError(f'Expected a Document, got {type(document)}.')
+        self._offsets.append(self._file.tell())
+        data = nlp_binary.dumps(document)
+        # keep every document aligned for the integer arrays
+        self._file.write(data + b'\x00' * (-len(data) % 4))
+
+    def close(self):
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        self._file.write(nlp_binary.to_little_endian(self._offsets))
+        self._file.write(FOOTER.pack(index_offset, len(self._offsets), MAGIC))
+        self._file.close()
+
+
+#
+# functions
+#
+
+
+def write_store(path: str, documents: Iterable[Document]):
+    with StoreWriter(path) as writer:
+        for document in documents:
+            writer.add(document)
@@ -0,0 +1,245 @@
+"""Vectorized phrase extraction over a batch of sentences.
+
+For many short sentences (e.g. tweets) the per-sentence Python overhead of
+`Sentence.get_noun_phrase_spans` dominates. A `SentenceBatch` concatenates
+the columns of all its sentences into flat NumPy arrays, computes every
+subtree span at once, and applies the same rules as `nlp` with array
+operations.
+
+Sentences that the array code cannot treat exactly like `nlp` does, i.e.
+those with repeated `ix` values or cycles in the dependency tree, are
+handled by the per-sentence functions instead, so the results always match.
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from data_structures.nlp import NP_HEAD_SHOULD_BE_NOUN, NP_TARGET_TYPES, \
+    Sentence, VERB_POS, VOCAB, VP_HEAD_SHOULD_BE_VERB, VP_TARGET_TYPES
+
+
+# (sentence_ixs, lefts, rights), with inclusive token indices per sentence
+Spans = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class SentenceBatch:
+    """Sentences flattened into concatenated arrays.
+
+    Attributes:
+        offsets: position of the first token of each sentence, plus the total.
+        sentence_ixs: the sentence of each token.
+        pos: vocab codes of the part of speech of each token.
+        dependency_type: vocab codes of the dependency type of each token.
+        heads: position of the head of each token, -1 if it has none.
+        lefts, rights: positions spanned by the descendants of each token,
+          not including itself, -1 if it has no children.
+        fallback: whether each sentence is handled per sentence instead.
+    """
+
+    def __init__(self, sentences: Sequence[Sentence]):
+        self.sentences = sentences
+        self.offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in sentences], out=self.offsets[1:])
+        num_tokens = int(self.offsets[-1])
+        self.sentence_ixs = np.repeat(
+            np.arange(len(sentences)), np.diff(self.offsets))
+        ixs = self._concatenate('ix')
+        head_ixs = self._concatenate('dependency_head_ix')
+        self.pos = self._concatenate('pos')
+        self.dependency_type = self._concatenate('dependency_type')
+        self.fallback = np.zeros(len(sentences), dtype=bool)
+
+        # find heads by (sentence, ix), as ix need not equal the position
+        size = max(int(ixs.max(initial=0)), int(head_ixs.max(initial=0))) + 2
+        keys = self.sentence_ixs * size + ixs
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        # repeated ix values (None included) map to one position in nlp
+        repeated = sorted_keys[1:] == sorted_keys[:-1]
+        self.fallback[self.sentence_ixs[order[1:][repeated]]] = True
+
+        self.heads = np.full(num_tokens, -1, dtype=np.int64)
+        # None is stored as -1
+        has_head = head_ixs >= 0
+        head_keys = self.sentence_ixs[has_head] * size + head_ixs[has_head]
+        found = np.searchsorted(sorted_keys, head_keys)
+        found[found == num_tokens] = 0
+        matched = sorted_keys[found] == head_keys
+        heads = self.heads[has_head]
+        heads[matched] = order[found[matched]]
+        self.heads[has_head] = heads
+        # a token that is its own head is just a root
+        self.heads[self.heads == np.arange(num_tokens)] = -1
+
+        depths = self._get_depths()
+        # leave the tokens of fallback sentences out of the arrays
+        skipped = self.fallback[self.sentence_ixs]
+        self.heads[skipped] = -1
+        depths[skipped] = 0
+        self.lefts, self.rights = self._get_spans(depths)
+
+    def _concatenate(self, attr: str) -> np.ndarray:
+        data = b''.join(
+            getattr(x.table, attr).tobytes() for x in self.sentences)
+        return np.frombuffer(data, dtype=np.intc).astype(np.int64)
+
+    def _get_depths(self) -> np.ndarray:
+        # walk every token up to its root, one level per step
+        depths = np.zeros(len(self.heads), dtype=np.int64)
+        current = self.heads.copy()
+        max_steps = int(np.diff(self.offsets).max(initial=0))
+        for _ in range(max_steps):
+            active = current != -1
+            if not active.any():
+                break
+            depths[active] += 1
+            current[active] = self.heads[current[active]]
+        # anything still walking is caught in a cycle
+        self.fallback[self.sentence_ixs[current != -1]] = True
+        return depths
+
+    def _get_spans(self, depths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        positions = np.arange(len(self.heads))
+        # min and max over each token together with its descendants
+        subtree_lefts = positions.copy()
+        subtree_rights = positions.copy()
+        # push the extents up one level at a time, deepest first
+        for depth in range(int(depths.max(initial=0)), 0, -1):
+            nodes = positions[depths == depth]
+            np.minimum.at(
+                subtree_lefts, self.heads[nodes], subtree_lefts[nodes])
+            np.maximum.at(
+                subtree_rights, self.heads[nodes], subtree_rights[nodes])
+        nodes = positions[self.heads != -1]
+        lefts = np.full(len(positions), len(positions), dtype=np.int64)
+        rights = np.full(len(positions), -1, dtype=np.int64)
+        np.minimum.at(lefts, self.heads[nodes], subtree_lefts[nodes])
+        np.maximum.at(rights, self.heads[nodes], subtree_rights[nodes])
+        lefts[rights == -1] = -1
+        return lefts, rights
+
+    def _candidates(self, target_types: Sequence[str]) -> np.ndarray:
+        # tokens of the target types in sentences we handle here
+        codes = np.array([VOCAB.add(x) for x in target_types])
+        mask = np.isin(self.dependency_type, codes) \
+            & ~self.fallback[self.sentence_ixs]
+        return np.flatnonzero(mask)
+
+    def _combine(
+            self,
+            target_types: Sequence[str],
+            tokens: np.ndarray,
+            lefts: np.ndarray,
+            rights: np.ndarray,
+            get_fallback_spans
+    ) -> Spans:
+        # order as nlp does: by sentence, then target type, then position
+        codes = [VOCAB.add(x) for x in target_types]
+        ranks = np.zeros(len(VOCAB), dtype=np.int64)
+        ranks[codes] = np.arange(len(codes))
+        sentence_ixs = self.sentence_ixs[tokens]
+        starts = self.offsets[sentence_ixs]
+        keys = [ranks[self.dependency_type[tokens]] * (len(self.heads) + 1)
+                + tokens]
+        lefts = [lefts - starts]
+        rights = [rights - starts]
+        sentence_ixs = [sentence_ixs]
+        for sentence_ix in np.flatnonzero(self.fallback):
+            spans = get_fallback_spans(self.sentences[sentence_ix])
+            keys.append(np.arange(len(spans), dtype=np.int64))
+            lefts.append(np.array([x[0] for x in spans], dtype=np.int64))
+            rights.append(np.array([x[1] for x in spans], dtype=np.int64))
+            sentence_ixs.append(np.full(len(spans), sentence_ix))
+        keys, lefts, rights, sentence_ixs = [
+            np.concatenate(x) for x in (keys, lefts, rights, sentence_ixs)]
+        order = np.lexsort((keys, sentence_ixs))
+        return sentence_ixs[order], lefts[order], rights[order]
+
+    def get_noun_phrase_spans(
+            self,
+            det: bool = False,
+            max_len: int = 10
+    ) -> Spans:
+        """Same as `Sentence.get_noun_phrase_spans` for every sentence.
+
+        Args:
+            det: Bool. Whether to keep a leading determiner.
+            max_len: Int. Spans longer than this are skipped.
+
+        Returns:
+            Arrays of sentence indices, lefts and rights, ordered as if the
+              per-sentence results were concatenated.
+        """
+        tokens = self._candidates(NP_TARGET_TYPES)
+        noun = VOCAB.add('NOUN')
+        head_should_be_noun = np.array(
+            [VOCAB.add(x) for x in NP_HEAD_SHOULD_BE_NOUN])
+        keep = ~(np.isin(self.dependency_type[tokens], head_should_be_noun)
+                 & (self.pos[tokens] != noun))
+        keep &= self.rights[tokens] != -1
+        keep &= self.pos[tokens] != VOCAB.add('PRON')
+        tokens = tokens[keep]
+        lefts = self.lefts[tokens]
+        rights = self.rights[tokens]
+        ends = self.offsets[self.sentence_ixs[tokens] + 1]
+
+        keep = rights - lefts <= max_len
+        tokens, lefts, rights, ends = \
+            tokens[keep], lefts[keep], rights[keep], ends[keep]
+        lefts = lefts + (self.dependency_type[lefts] == VOCAB.add('prep'))
+        keep = lefts < ends
+        tokens, lefts, rights, ends = \
+            tokens[keep], lefts[keep], rights[keep], ends[keep]
+        if not det:
+            lefts = lefts + (self.dependency_type[lefts] == VOCAB.add('det'))
+            keep = lefts < ends
+            tokens, lefts, rights = tokens[keep], lefts[keep], rights[keep]
+        keep = rights - lefts >= 2
+        tokens, lefts, rights = tokens[keep], lefts[keep], rights[keep]
+
+        return self._combine(
+            NP_TARGET_TYPES, tokens, lefts, rights,
+            lambda x: x.get_noun_phrase_spans(det=det, max_len=max_len))
+
+    def get_verb_phrase_spans(self, max_len: int = 10) -> Spans:
+        """Same as `Sentence.get_verb_phrase_spans` for every sentence.
+
+        Args:
+            max_len: Int. Spans longer than this are skipped.
+
+        Returns:
+            Arrays of sentence indices, lefts and rights, ordered as if the
+              per-sentence results were concatenated.
+        """
+        tokens = self._candidates(VP_TARGET_TYPES)
+        head_should_be_verb = np.array(
+            [VOCAB.add(x) for x in VP_HEAD_SHOULD_BE_VERB])
+        verb_pos = np.array([VOCAB.add(x) for x in VERB_POS])
+        keep = ~(np.isin(self.dependency_type[tokens], head_should_be_verb)
+                 & ~np.isin(self.pos[tokens], verb_pos))
+        keep &= self.rights[tokens] != -1
+        tokens = tokens[keep]
+        lefts = self.lefts[tokens]
+        rights = self.rights[tokens]
+        keep = (rights - lefts <= max_len) & (rights - lefts >= 2)
+        tokens, lefts, rights = tokens[keep], lefts[keep], rights[keep]
+
+        return self._combine(
+            VP_TARGET_TYPES, tokens, lefts, rights,
+            lambda x: x.get_verb_phrase_spans(max_len=max_len))
+
+
+#
+# functions
+#
+
+
+def to_lists(
+        spans: Spans,
+        num_sentences: int
+) -> List[List[Tuple[int, int]]]:
+    """Split batch results into per-sentence lists of (left, right)."""
+    results = [[] for _ in range(num_sentences)]
+    for sentence_ix, left, right in zip(*[x.tolist() for x in spans]):
+        results[sentence_ix].append((left, right))
+    return results
@@ -0,0 +1,570 @@
+"""Columnar on disk store of DataBase records, read through a memory map.
+
+Records of one class are written in row groups, each column of a group as
+one chunk, compressed on its own. The file holds a `HEADER`, the chunks
+(each padded to eight bytes), JSON metadata and a `FOOTER` giving the
+metadata offset and size. The metadata makes the file self-describing: the
+record class, the kind of each column, and for each row group its number of
+rows, where its chunks are and how they are compressed, and the minimum and
+maximum of each column.
+
+The kind of a column follows the type its class's `__init__` annotates:
+
+    int         i64, 0 where None
+    float       f64, NaN where None
+    bool        u8
+    datetime    i64 microseconds since the Unix epoch, in UTC
+    date        i32 days since the Unix epoch
+    str         i64[n + 1] offsets, then the utf-8 strings
+    json        as str, each value encoded as with `jsonl.to_jsonl`
+
+Anything else, e.g. nested records, is `json`, as are the keys of records
+that are not fields, in the `_extra` column. A chunk with None values starts
+with a u8 mask of them, padded to eight bytes.
+
+Readers only decode the columns asked for, and skip the row groups whose
+statistics show no row can match a predicate. Uncompressed chunks are read
+without copying.
+"""
+import bz2
+from datetime import date, datetime
+import importlib
+from itertools import chain
+import json
+import lzma
+import mmap
+import os
+import struct
+import typing
+from typing import Any, Dict, Iterable, Iterator, List, Optional, \
+    Sequence, Tuple, Type, Union
+import zlib
+
+import numpy as np
+
+from data_structures.base import DataBase
+from data_structures.jsonl import get_converter, to_value
+from data_structures.twitter_frame import decode_time, encode_time, \
+    NULL_TIME
+
+
+MAGIC = b'DSRS'
+VERSION = 1
+HEADER = struct.Struct('<4sHxx')
+FOOTER = struct.Struct('<QQ4s')
+COMPRESSORS = {
+    'none': lambda x: x,
+    'zlib': zlib.compress,
+    'bz2': bz2.compress,
+    'lzma': lzma.compress,
+}
+DECOMPRESSORS = {
+    'none': lambda x: x,
+    'zlib': zlib.decompress,
+    'bz2': bz2.decompress,
+    'lzma': lzma.decompress,
+}
+# fixed width kinds, as stored
+DTYPES = {
+    'int': np.dtype('<i8'),
+    'float': np.dtype('<f8'),
+    'bool': np.dtype('u1'),
+    'datetime': np.dtype('<i8'),
+    'date': np.dtype('<i4'),
+}
+KIND_TYPES = {
+    int: 'int', float: 'float', bool: 'bool', datetime: 'datetime',
+    date: 'date', str: 'str',
+}
+EPOCH_DATE = date(1970, 1, 1)
+EXTRA = '_extra'
+
+
+# a predicate, `start <= value < end`, either bound None for no bound
+Range = Tuple[Any, Any]
+
+
+class RecordStore:
+    """Read only access to a store written by a `RecordWriter`.
+
+    Args:
+        path: String, path to the file.
+        cls: DataBase subclass to read records as. Defaults to the class
+          they were written from.
+    """
+
+    def __init__(self, path: str, cls: Optional[Type[DataBase]] = None):
+        self._file = open(path, 'rb')
+        self._mmap = None
+        try:
+            # empty files cannot be mapped, and shorter ones have no footer
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER.size + FOOTER.size:
+                raise ValueError(f'Not a record store: {path}.')
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.metadata = self._read_metadata(path)
+        except BaseException:
+            self.close()
+            raise
+        if cls is None:
+            module, name = self.metadata['class'].rsplit('.', 1)
+            cls = getattr(importlib.import_module(module), name)
+        self.cls = cls
+        self.kinds = dict(self.metadata['columns'])
+        self.row_groups = self.metadata['row_groups']
+        hints = typing.get_type_hints(cls.__init__)
+        # turning decoded json values back into the annotated types
+        self._converters = {
+            x: get_converter(hints.get(x)) for x, kind in self.kinds.items()
+            if kind == 'json'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self) -> Iterator[DataBase]:
+        return self.iter_records()
+
+    def __len__(self):
+        return sum(x['num_rows'] for x in self.row_groups)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.kinds)
+
+    def close(self):
+        try:
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # arrays read from the store are still alive, the map is closed
+            # when they are garbage collected
+            pass
+        self._file.close()
+
+    def iter_records(
+            self,
+            columns: Optional[Sequence[str]] = None,
+            where: Optional[Dict[str, Range]] = None
+    ) -> Iterator[DataBase]:
+        """Records in the order written.
+
+        Args:
+            columns: Sequence of column names. Records only get these
+              fields, the others are left out rather than set to None.
+              Defaults to all.
+            where: Dict of column name to (start, end), keeping the records
+              with `start <= value < end`. None never matches.
+
+        Yields:
+            Records of type `cls`.
+        """
+        columns = self._check_columns(columns)
+        for group_ix in self.get_row_groups(where):
+            values, keep = self._read_group(group_ix, columns, where)
+            ixs = np.flatnonzero(keep).tolist()
+            rows = [self._to_python(x, *values[x]) for x in columns]
+            extra_ix = columns.index(EXTRA) if EXTRA in columns else None
+            for i in ixs:
+                kwargs = {x: rows[j][i] for j, x in enumerate(columns)
+                          if j != extra_ix}
+                if extra_ix is not None and rows[extra_ix][i]:
+                    kwargs.update(rows[extra_ix][i])
+                record = self.cls.__new__(self.cls)
+                DataBase.__init__(record, **kwargs)
+                yield record
+
+    def get_row_groups(
+            self,
+            where: Optional[Dict[str, Range]] = None
+    ) -> List[int]:
+        """Indices of the row groups that may have rows matching `where`."""
+        if not where:
+            return list(range(len(self.row_groups)))
+        for column in where:
+            if column not in self.kinds:
+                raise ValueError(f'Unknown column: {column}.')
+            if self.kinds[column] == 'json':
+                raise ValueError(f'Cannot compare json column {column}.')
+        group_ixs = []
+        for group_ix, group in enumerate(self.row_groups):
+            for column, (start, end) in where.items():
+                stats = group['stats'][column]
+                kind = self.kinds[column]
+                if stats is None:
+                    break
+                if start is not None and stats[1] < encode(kind, start):
+                    break
+                if end is not None and stats[0] >= encode(kind, end):
+                    break
+            else:
+                group_ixs.append(group_ix)
+        return group_ixs
+
+    def read_arrays(
+            self,
+            columns: Optional[Sequence[str]] = None,
+            where: Optional[Dict[str, Range]] = None
+    ) -> Dict[str, np.ma.MaskedArray]:
+        """Columns as masked arrays, None being masked.
+
+        Datetimes are `datetime64[us]` in UTC, dates `datetime64[D]`, and
+        str and json columns object arrays.
+
+        Args:
+            columns: Sequence of column names. Defaults to all.
+            where: Dict of column name to (start, end), as for
+              `iter_records`.
+
+        Returns:
+            Dict of column name to masked array.
+        """
+        columns = self._check_columns(columns)
+        parts = {x: [] for x in columns}
+        for group_ix in self.get_row_groups(where):
+            values, keep = self._read_group(group_ix, columns, where)
+            for column in columns:
+                data, nulls, _ = values[column]
+                parts[column].append((data[keep], nulls[keep]))
+        arrays = {}
+        for column in columns:
+            kind = self.kinds[column]
+            if parts[column]:
+                data = np.concatenate([x[0] for x in parts[column]])
+                nulls = np.concatenate([x[1] for x in parts[column]])
+            else:
+                data = np.array([], dtype=DTYPES.get(kind, object))
+                nulls = np.zeros(0, dtype=bool)
+            if kind == 'datetime':
+                data = data.view('datetime64[us]')
+            elif kind == 'date':
+                data = data.astype('datetime64[D]')
+            elif kind == 'bool':
+                data = data.astype(bool)
+            arrays[column] = np.ma.masked_array(data, mask=nulls)
+        return arrays
+
+    def _check_columns(self, columns: Optional[Sequence[str]]) -> List[str]:
+        if columns is None:
+            return self.columns
+        for column in columns:
+            if column not in self.kinds:
+                raise ValueError(f'Unknown column: {column}.')
+        return list(columns)
+
+    def _read_chunk(
+            self,
+            group_ix: int,
+            column: str
+    ) -> Tuple[np.ndarray, np.ndarray, bool]:
+        # values, whether each is None, and whether datetimes were aware
+        group = self.row_groups[group_ix]
+        chunk = group['chunks'][column]
+        num_rows = group['num_rows']
+        data = memoryview(self._mmap)[
+            chunk['offset']:chunk['offset'] + chunk['size']]
+        data = DECOMPRESSORS[chunk['compression']](data)
+        position = 0
+        if chunk['nulls']:
+            nulls = np.frombuffer(data, dtype=np.uint8, count=num_rows) \
+                .astype(bool)
+            position = pad(num_rows)
+        else:
+            nulls = np.zeros(num_rows, dtype=bool)
+        kind = self.kinds[column]
+        if kind in DTYPES:
+            values = np.frombuffer(
+                data, dtype=DTYPES[kind], count=num_rows, offset=position)
+        else:
+            offsets = np.frombuffer(
+                data, dtype='<i8', count=num_rows + 1, offset=position)
+            blob = bytes(data[position + 8 * (num_rows + 1):])
+            offsets = offsets.tolist()
+            values = np.empty(num_rows, dtype=object)
+            values[:] = [str(blob[offsets[i]:offsets[i + 1]], 'utf-8',
+                             'surrogatepass') for i in range(num_rows)]
+            if kind == 'json':
+                convert = self._converters.get(column)
+                for i in np.flatnonzero(~nulls).tolist():
+                    value = json.loads(values[i])
+                    values[i] = value if convert is None else convert(value)
+            values[nulls] = None
+        return values, nulls, chunk.get('aware', False)
+
+    def _read_group(
+            self,
+            group_ix: int,
+            columns: List[str],
+            where: Optional[Dict[str, Range]]
+    ) -> Tuple[Dict[str, Tuple[np.ndarray, np.ndarray, bool]], np.ndarray]:
+        # the chunks asked for and which rows match
+        values = {}
+        keep = np.ones(self.row_groups[group_ix]['num_rows'], dtype=bool)
+        for column, (start, end) in (where or {}).items():
+            values[column] = self._read_chunk(group_ix, column)
+            data, nulls, _ = values[column]
+            keep &= ~nulls
+            kind = self.kinds[column]
+            if kind == 'str':
+                # None does not compare with strings
+                data = np.where(nulls, '', data)
+            if start is not None:
+                keep &= data >= encode(kind, start)
+            if end is not None:
+                keep &= data < encode(kind, end)
+        for column in columns:
+            if column not in values:
+                values[column] = self._read_chunk(group_ix, column)
+        return values, keep
+
+    def _read_metadata(self, path: str) -> Dict[str, Any]:
+        magic, version = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'Not a record store: {path}.')
+        if version != VERSION:
+            raise ValueError(f'Unsupported store version: {version}.')
+        offset, size, magic = FOOTER.unpack_from(
+            self._mmap, len(self._mmap) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f'Record store is truncated: {path}.')
+        return json.loads(self._mmap[offset:offset + size])
+
+    def _to_python(
+            self,
+            column: str,
+            data: np.ndarray,
+            nulls: np.ndarray,
+            aware: bool
+    ) -> List[Any]:
+        kind = self.kinds[column]
+        if kind == 'datetime':
+            if aware:
+                values = [decode_time(x, aware=True) for x in data.tolist()]
+            else:
+                values = data.view('datetime64[us]').tolist()
+        elif kind == 'date':
+            values = data.astype('datetime64[D]').tolist()
+        elif kind == 'bool':
+            values = data.astype(bool).tolist()
+        else:
+            values = data.tolist()
+        if nulls.any():
+            for i in np.flatnonzero(nulls).tolist():
+                values[i] = None
+        return values
+
+
+class RecordWriter:
+    """Writes records of one class to a new store, read with `RecordStore`.
+
+    Args:
+        path: String, path to the file.
+        cls: DataBase subclass of the records.
+        row_group_size: Int. Number of records per row group. Smaller groups
+          can be skipped more precisely, larger ones compress better.
+        compression: String, one of `COMPRESSORS`, or a Dict of column name
+          to one of them, `zlib` for the rest. A chunk is stored as it is if
+          compressing does not make it smaller.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            cls: Type[DataBase],
+            row_group_size: int = 65536,
+            compression: Union[str, Dict[str, str]] = 'zlib'
+    ):
+        self.cls = cls
+        self.row_group_size = row_group_size
+        self.kinds = get_kinds(cls)
+        if isinstance(compression, str):
+            compression = {x: compression for x in self.kinds}
+        for column, codec in compression.items():
+            if column not in self.kinds:
+                raise ValueError(f'Unknown column: {column}.')
+            if codec not in COMPRESSORS:
+                raise ValueError(f'Unknown compression: {codec}.')
+        self.compression = compression
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._records = []
+        self._row_groups = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # without a footer the partial store reads as truncated
+            self._file.close()
+
+    def add(self, record: DataBase):
+        if not isinstance(record, self.cls):
+            raise TypeError(f'Expected a {self.cls.__name__}, got '
+                            f'{type(record)}.')
+        self._records.append(record)
+        if len(self._records) == self.row_group_size:
+            self._write_row_group()
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._records:
+            self._write_row_group()
+        metadata = json.dumps({
+            'class': f'{self.cls.__module__}.{self.cls.__qualname__}',
+            'columns': list(self.kinds.items()),
+            'row_groups': self._row_groups,
+        }).encode('utf-8')
+        offset = self._file.tell()
+        self._file.write(metadata)
+        self._file.write(FOOTER.pack(offset, len(metadata), MAGIC))
+        self._file.close()
+
+    def _write_row_group(self):
+        records = self._records
+        self._records = []
+        group = {'num_rows': len(records), 'chunks': {}, 'stats': {}}
+        for column, kind in self.kinds.items():
+            if column == EXTRA:
+                values = [x._extra or None for x in records]
+            else:
+                values = [getattr(x, column, None) for x in records]
+            data, chunk, stats = encode_chunk(kind, values)
+            codec = self.compression.get(column, 'zlib')
+            compressed = COMPRESSORS[codec](data)
+            if len(compressed) >= len(data):
+                codec, compressed = 'none', data
+            chunk.update(offset=self._file.tell(), size=len(compressed),
+                         compression=codec)
+            self._file.write(compressed + b'\x00' * (-len(compressed) % 8))
+            group['chunks'][column] = chunk
+            group['stats'][column] = stats
+        self._row_groups.append(group)
+
+
+#
+# functions
+#
+
+
+def encode(kind: str, value: Any) -> Any:
+    # a value as stored, to compare with stored values and statistics
+    if kind == 'datetime':
+        return encode_time(value)
+    if kind == 'date':
+        return (value - EPOCH_DATE).days
+    if kind == 'bool':
+        return int(value)
+    return value
+
+
+def encode_chunk(
+        kind: str,
+        values: List[Any]
+) -> Tuple[bytes, Dict[str, Any], Optional[List[Any]]]:
+    """Encode the values of one column of a row group.
+
+    Returns:
+        The chunk as bytes, its metadata, and the minimum and maximum of the
+          values that are not None, as stored, or None if there are none or
+          the kind has no order.
+    """
+    nulls = np.array([x is None for x in values], dtype=bool)
+    chunk = {'nulls': bool(nulls.any())}
+    parts = []
+    if chunk['nulls']:
+        parts.append(nulls.astype(np.uint8).tobytes()
+                     + b'\x00' * (-len(values) % 8))
+    stats = None
+    if kind in DTYPES:
+        if kind == 'datetime':
+            chunk['aware'] = any(
+                x.tzinfo is not None for x in values if x is not None)
+            if chunk['aware']:
+                data = np.array([encode_time(x) for x in values],
+                                dtype=np.int64)
+            else:
+                # NumPy converts naive datetimes itself, None to NaT
+                data = np.array(values, dtype='datetime64[us]') \
+                    .view(np.int64)
+        elif kind == 'float':
+            data = np.array(
+                [np.nan if x is None else x for x in values], dtype=float)
+        else:
+            null = NULL_TIME if kind == 'datetime' else 0
+            data = np.array(
+                [null if x is None else encode(kind, x) for x in values],
+                dtype=DTYPES[kind])
+        if not nulls.all():
+            present = data[~nulls]
+            stats = [present.min().item(), present.max().item()]
+        parts.append(data.astype(DTYPES[kind]).tobytes())
+    else:
+        if kind == 'json':
+            strings = [None if x is None else json.dumps(to_value(x))
+                       for x in values]
+        else:
+            strings = values
+            present = [x for x in values if x is not None]
+            if present:
+                stats = [min(present), max(present)]
+        encoded = [b'' if x is None else x.encode('utf-8', 'surrogatepass')
+                   for x in strings]
+        offsets = np.zeros(len(values) + 1, dtype='<i8')
+        np.cumsum([len(x) for x in encoded], out=offsets[1:])
+        parts.append(offsets.tobytes())
+        parts.append(b''.join(encoded))
+    return b''.join(parts), chunk, stats
+
+
+def get_kinds(cls: Type[DataBase]) -> Dict[str, str]:
+    # the kind of each column, from the annotations of `cls.__init__`
+    hints = typing.get_type_hints(cls.__init__)
+    kinds = {}
+    for field in cls._schema:
+        hint = hints.get(field)
+        if typing.get_origin(hint) is Union:
+            types = [x for x in typing.get_args(hint)
+                     if x is not type(None)]
+            hint = types[0] if len(types) == 1 else None
+        kinds[field] = KIND_TYPES.get(hint, 'json')
+    kinds[EXTRA] = 'json'
+    return kinds
+
+
+def pad(size: int) -> int:
+    return size + (-size % 8)
+
+
+def write_records(
+        path: str,
+        records: Iterable[DataBase],
+        cls: Optional[Type[DataBase]] = None,
+        **kwargs
+):
+    """Write records to a new store.
+
+    Args:
+        path: String, path to the file.
+        records: Iterable of records of one class, consumed lazily.
+        cls: DataBase subclass of the records. Defaults to the class of the
+          first one.
+        kwargs: passed on to `RecordWriter`.
+    """
+    records = iter(records)
+    if cls is None:
+        first = next(records, None)
+        if first is None:
+            raise ValueError('No records to infer the class from.')
+        cls = type(first)
+        records = chain([first], records)
+    with RecordWriter(path, cls, **kwargs) as writer:
+        for record in records:
+            writer.add(record)
+
@@ -1,14 +1,34 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Iterable, Iterator, Optional
 
 from data_structures.base import DataBase
 
 
+# Tweet fields copied from its author, and the TwitterUser field of each
+AUTHOR_FIELDS = {
+    'author_name': 'name',
+    'author_username': 'username',
+    'author_verified': 'verified',
+    'author_created_at': 'created_at',
+    'author_location': 'location',
+    'author_description': 'description',
+}
+
+
 class Tweet(DataBase):
     # Tweet model reference
     # v2 api
     # https://developer.twitter.com/en/docs/twitter-api/data-dictionary/object-model/tweet
 
+    _fields = (
+        'id', 'text', 'author_id', 'conversation_id', 'created_at',
+        'in_reply_to_user_id', 'lang', 'is_reply', 'is_retweet', 'author_name',
+        'author_username', 'author_verified', 'author_created_at',
+        'author_location', 'author_description',
+    )
+    # the UserRegistry of a linked Tweet
+    __slots__ = ('_users',)
+
     def __init__(self,
                  id: int,
                  text: str,
@@ -45,128 +65,17 @@ class Tweet(DataBase):
             **kwargs)
 
     @property
-    def id(self) -> int:
-        return self.__getitem__('id')
-
-    @id.setter
-    def id(self, value: int):
-        self.__setitem__('id', value)
-
-    @property
-    def text(self) -> str:
-        return self.__getitem__('text')
-
-    @text.setter
-    def text(self, value: str):
-        self.__setitem__('text', value)
-
-    @property
-    def author_id(self) -> int:
-        return self.__getitem__('author_id')
-
-    @author_id.setter
-    def author_id(self, value: int):
-        self.__setitem__('author_id', value)
-
-    @property
-    def conversation_id(self) -> int:
-        return self.__getitem__('conversation_id')
-
-    @conversation_id.setter
-    def conversation_id(self, value: int):
-        self.__setitem__('conversation_id', value)
-
-    @property
-    def created_at(self) -> datetime:
-        return self.__getitem__('created_at')
-
-    @created_at.setter
-    def created_at(self, value: datetime):
-        self.__setitem__('created_at', value)
-
-    @property
-    def in_reply_to_user_id(self) -> int:
-        return self.__getitem__('in_reply_to_user_id')
-
-    @in_reply_to_user_id.setter
-    def in_reply_to_user_id(self, value: int):
-        self.__setitem__('in_reply_to_user_id', value)
-
-    @property
-    def lang(self) -> str:
-        return self.__getitem__('lang')
-
-    @lang.setter
-    def lang(self, value: str):
-        self.__setitem__('lang', value)
-
-    @property
-    def is_reply(self) -> bool:
-        return self.__getitem__('is_reply')
-
-    @is_reply.setter
-    def is_reply(self, value: bool):
-        self.__setitem__('is_reply', value)
-
-    @property
-    def is_retweet(self) -> bool:
-        return self.__getitem__('is_retweet')
-
-    @is_retweet.setter
-    def is_retweet(self, value: bool):
-        self.__setitem__('is_retweet', value)
-
-    @property
-    def author_name(self) -> str:
-        return self.__getitem__('author_name')
-
-    @author_name.setter
-    def author_name(self, value: str):
-        self.__setitem__('author_name', value)
-
-    @property
-    def author_username(self) -> str:
-        return self.__getitem__('author_username')
-
-    @author_username.setter
-    def author_username(self, value: str):
-        self.__setitem__('author_username', value)
-
-    @property
-    def author_verified(self) -> bool:
-        return self.__getitem__('author_verified')
-
-    @author_verified.setter
-    def author_verified(self, value: bool):
-        self.__setitem__('author_verified', value)
-
-    @property
-    def author_created_at(self) -> datetime:
-        return self.__getitem__('author_created_at')
-
-    @author_created_at.setter
-    def author_created_at(self, value: datetime):
-        self.__setitem__('author_created_at', value)
-
-    @property
-    def author_location(self) -> str:
-        return self.__getitem__('author_location')
-
-    @author_location.setter
-    def author_location(self, value: str):
-        self.__setitem__('author_location', value)
-
-    @property
-    def author_description(self) -> str:
-        return self.__getitem__('author_description')
-
-    @author_description.setter
-    def author_description(self, value: str):
-        self.__setitem__('author_description', value)
+    def is_linked(self) -> bool:
+        return getattr(self, '_users', None) is not None
 
 
 class TwitterUser(DataBase):
 
+    _fields = (
+        'id', 'name', 'username', 'verified', 'created_at', 'location',
+        'description',
+    )
+
     def __init__(self,
                  id: int,
                  name: str,
@@ -186,58 +95,157 @@ class TwitterUser(DataBase):
             description=description,
             **kwargs)
 
-    @property
-    def id(self) -> int:
-        return self.__getitem__('id')
-
-    @id.setter
-    def id(self, value: int):
-        self.__setitem__('id', value)
-
-    @property
-    def name(self) -> str:
-        return self.__getitem__('name')
-
-    @name.setter
-    def name(self, value: str):
-        self.__setitem__('name', value)
-
-    @property
-    def username(self) -> str:
-        return self.__getitem__('username')
-
-    @username.setter
-    def username(self, value: str):
-        self.__setitem__('username', value)
-
-    @property
-    def verified(self) -> bool:
-        return self.__getitem__('verified')
-
-    @verified.setter
-    def verified(self, value: bool):
-        self.__setitem__('verified', value)
-
-    @property
-    def created_at(self) -> datetime:
-        return self.__getitem__('created_at')
-
-    @created_at.setter
-    def created_at(self, value: datetime):
-        self.__setitem__('created_at', value)
-
-    @property
-    def location(self) -> str:
-        return self.__getitem__('location')
-
-    @location.setter
-    def location(self, value: str):
-        self.__setitem__('location', value)
-
-    @property
-    def description(self) -> str:
-        return self.__getitem__('description')
 
-    @description.setter
-    def description(self, value: str):
-        self.__setitem__('description', value)
+class UserRegistry:
+    """TwitterUsers shared by the Tweets they wrote, keyed by id.
+
+    A Tweet linked to a registry only holds the author fields that differ
+    from those registered for its author. Reading `tweet.author_name`,
+    `tweet['author_name']` and the like otherwise look up its author here,
+    so prolific authors are held once rather than once per Tweet.
+    """
+
+    def __init__(self, users: Iterable[TwitterUser] = ()):
+        self.users = {}
+        for user in users:
+            self.add(user)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.users
+
+    def __getitem__(self, user_id: int) -> TwitterUser:
+        return self.users[user_id]
+
+    def __iter__(self) -> Iterator[TwitterUser]:
+        return iter(self.users.values())
+
+    def __len__(self):
+        return len(self.users)
+
+    def add(self, user: TwitterUser) -> TwitterUser:
+        """Add a user, returning the one registered under its id.
+
+        A user already registered is kept, with any of its None fields
+        filled in from the new one.
+        """
+        existing = self.users.get(user.id)
+        if existing is None:
+            self.users[user.id] = user
+            return user
+        for key, value in user.items():
+            if value is not None and existing.get(key) is None:
+                existing[key] = value
+        return existing
+
+    def get(self, user_id: int) -> Optional[TwitterUser]:
+        return self.users.get(user_id)
+
+    def link(self, tweet: Tweet) -> Tweet:
+        """Register the author of a Tweet and drop its own author fields.
+
+        Deleting an author field of a linked Tweet unlinks it first, so only
+        that Tweet loses the field.
+
+        Args:
+            tweet: Tweet. If it has any author fields, its author is added
+              from them, as with `add`. The Tweet then drops the author
+              fields that are None or equal to the registered author's, and
+              reads those from the registry. Fields that differ, e.g. a bio
+              changed since the author was registered, stay with the Tweet.
+              A Tweet without an `author_id` has no author to register, and
+              is left unlinked with its own author fields.
+
+        Returns:
+            The same Tweet, linked if it has an `author_id`.
+        """
+        if tweet.is_linked:
+            if tweet._users is not self:
+                raise ValueError('Tweet is linked to another registry.')
+            return tweet
+        if tweet.author_id is None:
+            return tweet
+        if any(tweet.get(x) is not None for x in AUTHOR_FIELDS):
+            self.add(get_author(tweet))
+        user = self.users.get(tweet.author_id)
+        for field, user_field in AUTHOR_FIELDS.items():
+            value = tweet.get(field)
+            if value is None or (user is not None
+                                 and value == user.get(user_field)):
+                try:
+                    object.__delattr__(tweet, field)
+                except AttributeError:
+                    pass
+        tweet._users = self
+        return tweet
+
+    def unlink(self, tweet: Tweet) -> Tweet:
+        """Copy the author fields back into a linked Tweet."""
+        if not tweet.is_linked:
+            return tweet
+        values = {x: getattr(tweet, x) for x in AUTHOR_FIELDS}
+        tweet._users = None
+        for field, value in values.items():
+            object.__setattr__(tweet, field, value)
+        return tweet
+
+    def link_all(self, tweets: Iterable[Tweet]) -> Iterator[Tweet]:
+        """Link Tweets as they are consumed."""
+        for tweet in tweets:
+            yield self.link(tweet)
+
+
+#
+# functions
+#
+
+
+def get_author(tweet: Tweet) -> TwitterUser:
+    return TwitterUser(
+        id=tweet.author_id,
+        **{v: tweet.get(k) for k, v in AUTHOR_FIELDS.items()})
+
+
+def get_author_field(slot: Any, field: str) -> property:
+    # reads the slot, or if it is unset in a linked Tweet, the field of its
+    # author in the registry. A property rather than a `__getattr__` on
+    # Tweet, which would slow down reading every attribute.
+    def get(tweet: Tweet) -> Any:
+        try:
+            return slot.__get__(tweet, Tweet)
+        except AttributeError:
+            users = getattr(tweet, '_users', None)
+            if users is None:
+                raise
+        user = users.get(tweet.author_id)
+        return None if user is None else getattr(user, field, None)
+
+    def delete(tweet: Tweet):
+        users = getattr(tweet, '_users', None)
+        if users is not None:
+            # the other author fields are shared, so copy them back first
+            users.unlink(tweet)
+        slot.__delete__(tweet)
+
+    return property(get, slot.__set__, delete)
+
+
+def get_normalized(tweet: Tweet) -> Dict[str, Any]:
+    """The keys of a Tweet other than its author fields."""
+    return {k: v for k, v in tweet.items() if k not in AUTHOR_FIELDS}
+
+
+def get_own_author_fields(tweet: Tweet) -> Dict[str, Any]:
+    """The author fields a Tweet holds itself, not read from a registry."""
+    values = {}
+    for name, slot in AUTHOR_SLOTS.items():
+        try:
+            values[name] = slot.__get__(tweet, Tweet)
+        except AttributeError:
+            pass
+    return values
+
+
+# author fields fall back to the registry of a linked Tweet
+AUTHOR_SLOTS = {x: Tweet.__dict__[x] for x in AUTHOR_FIELDS}
+for _name, _field in AUTHOR_FIELDS.items():
+    setattr(Tweet, _name, get_author_field(AUTHOR_SLOTS[_name], _field))
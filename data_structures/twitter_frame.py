@@ -0,0 +1,252 @@
+"""Columnar batches of Tweets for vectorized queries.
+
+A `TweetFrame` holds each Tweet field as one NumPy array, so filtering,
+sorting and counting millions of tweets are array operations rather than
+Python loops. It lives apart from `twitter` so that Tweets do not need
+NumPy.
+
+Columns are stored as follows, None as the given sentinel:
+
+    ints        int64, -1
+    bools       int8, 1 or 0, -1
+    datetimes   int64 microseconds since the Unix epoch, NULL_TIME. Naive
+                datetimes are taken as UTC, aware ones are converted to it.
+    strings     int32 codes into a per-column list of distinct strings, -1
+
+Keys of a Tweet that are not fields are not kept.
+"""
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_structures.twitter import Tweet
+
+
+INT_COLUMNS = ('id', 'author_id', 'conversation_id', 'in_reply_to_user_id')
+BOOL_COLUMNS = ('is_reply', 'is_retweet', 'author_verified')
+TIME_COLUMNS = ('created_at', 'author_created_at')
+STRING_COLUMNS = ('text', 'lang', 'author_name', 'author_username',
+                  'author_location', 'author_description')
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = EPOCH.replace(tzinfo=timezone.utc)
+# as NaT is stored
+NULL_TIME = np.iinfo(np.int64).min
+
+
+class TweetFrame:
+    """Tweets as columns.
+
+    Attributes:
+        columns: Dict of column name to array, in Tweet field order.
+        strings: Dict of string column name to its distinct strings, indexed
+          by the codes in `columns`. Shared by frames filtered from this one.
+        aware: Set of datetime columns returned as UTC aware datetimes,
+          because they were given aware.
+    """
+
+    def __init__(
+            self,
+            columns: Dict[str, np.ndarray],
+            strings: Dict[str, List[str]],
+            aware: Optional[Iterable[str]] = None
+    ):
+        self.columns = columns
+        self.strings = strings
+        self.aware = set(aware or ())
+        # string to code, per string column queried
+        self._codes = {}
+        lengths = {len(x) for x in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f'Columns differ in length: {sorted(lengths)}.')
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def __len__(self) -> int:
+        return len(self.columns['id'])
+
+    @classmethod
+    def from_tweets(cls, tweets: Sequence[Tweet]) -> 'TweetFrame':
+        get_values = attrgetter(*Tweet._schema)
+        rows = [get_values(x) for x in tweets]
+        values = dict(zip(Tweet._schema, zip(*rows))) if rows \
+            else {x: () for x in Tweet._schema}
+        columns = {}
+        strings = {}
+        aware = []
+        for column in Tweet._schema:
+            if column in INT_COLUMNS:
+                columns[column] = np.array(
+                    [-1 if x is None else x for x in values[column]],
+                    dtype=np.int64)
+            elif column in BOOL_COLUMNS:
+                columns[column] = np.array(
+                    [-1 if x is None else int(x) for x in values[column]],
+                    dtype=np.int8)
+            elif column in TIME_COLUMNS:
+                if any(x.tzinfo is not None
+                       for x in values[column] if x is not None):
+                    aware.append(column)
+                    columns[column] = np.array(
+                        [encode_time(x) for x in values[column]],
+                        dtype=np.int64)
+                else:
+                    # NumPy converts naive datetimes itself, None to NaT
+                    columns[column] = np.array(
+                        values[column], dtype='datetime64[us]').view(np.int64)
+            else:
+                columns[column], strings[column] = encode_strings(
+                    values[column])
+        return cls(columns, strings, aware)
+
+    def count_by(
+            self,
+            column: str,
+            bucket: Optional[timedelta] = None
+    ) -> Dict[Any, int]:
+        """Number of tweets per value of a column.
+
+        Args:
+            column: String, the column to group by.
+            bucket: timedelta. Width of the buckets to count datetimes in,
+              e.g. a day, aligned to the epoch.
+
+        Returns:
+            Dict of value, or start of the bucket, to count, most common
+              first. Ties are in order of stored value, so nulls first.
+        """
+        data = self.columns[column]
+        if bucket is not None:
+            if column not in TIME_COLUMNS:
+                raise ValueError(f'Can only bucket datetimes, not {column}.')
+            width = bucket // timedelta(microseconds=1)
+            nulls = data == NULL_TIME
+            data = data // width * width
+            data[nulls] = NULL_TIME
+        keys, counts = np.unique(data, return_counts=True)
+        order = np.argsort(-counts, kind='stable')
+        keys = self._decode(column, keys[order])
+        return dict(zip(keys, counts[order].tolist()))
+
+    def equals(self, column: str, value: Any) -> np.ndarray:
+        """Boolean mask of the rows where a column equals a value."""
+        return self.columns[column] == self._encode(column, value)
+
+    def filter(self, mask: np.ndarray) -> 'TweetFrame':
+        """The rows where a boolean mask is True, or at the given indices."""
+        return TweetFrame(
+            {k: v[mask] for k, v in self.columns.items()},
+            self.strings,
+            self.aware)
+
+    def isin(self, column: str, values: Iterable[Any]) -> np.ndarray:
+        """Boolean mask of the rows where a column is one of some values."""
+        codes = [self._encode(column, x) for x in values]
+        return np.isin(self.columns[column], codes)
+
+    def between(
+            self,
+            column: str,
+            start: Any = None,
+            end: Any = None
+    ) -> np.ndarray:
+        """Boolean mask of the rows with `start <= value < end`.
+
+        Either bound can be None for no bound. Nulls never match. Not for
+        string columns, whose codes are not ordered.
+        """
+        if column in STRING_COLUMNS:
+            raise ValueError(f'Cannot compare strings in {column}.')
+        data = self.columns[column]
+        mask = data != self._encode(column, None)
+        if start is not None:
+            mask &= data >= self._encode(column, start)
+        if end is not None:
+            mask &= data < self._encode(column, end)
+        return mask
+
+    def sort(self, column: str, descending: bool = False) -> 'TweetFrame':
+        """Rows sorted by a column, nulls lowest, ties kept in order.
+
+        Strings are sorted by value, not code.
+        """
+        data = self.columns[column]
+        if column in STRING_COLUMNS:
+            # rank each code by its string, with -1 (None) before all
+            ranks = np.zeros(len(self.strings[column]) + 1, dtype=np.int64)
+            ranks[1:][np.argsort(self.strings[column], kind='stable')] = \
+                np.arange(1, len(self.strings[column]) + 1)
+            data = ranks[data + 1]
+        if descending:
+            # sort the reversed rows and reverse back, keeping ties in order
+            order = len(data) - 1 - np.argsort(data[::-1], kind='stable')
+            order = order[::-1]
+        else:
+            order = np.argsort(data, kind='stable')
+        return self.filter(order)
+
+    def to_tweets(self) -> List[Tweet]:
+        values = [self._decode(x, self.columns[x]) for x in Tweet._schema]
+        return [Tweet(**dict(zip(Tweet._schema, row)))
+                for row in zip(*values)]
+
+    def values(self, column: str) -> List[Any]:
+        """The values of a column as Python objects."""
+        return self._decode(column, self.columns[column])
+
+    def _decode(self, column: str, data: np.ndarray) -> List[Any]:
+        if column in TIME_COLUMNS and column not in self.aware:
+            return data.view('datetime64[us]').tolist()
+        data = data.tolist()
+        if column in INT_COLUMNS:
+            return [None if x == -1 else x for x in data]
+        if column in BOOL_COLUMNS:
+            return [None if x == -1 else bool(x) for x in data]
+        if column in TIME_COLUMNS:
+            return [decode_time(x, aware=True) for x in data]
+        strings = self.strings[column]
+        return [None if x == -1 else strings[x] for x in data]
+
+    def _encode(self, column: str, value: Any) -> int:
+        # a query value as stored, strings not in the column as -2
+        if column in TIME_COLUMNS:
+            return encode_time(value)
+        if value is None:
+            return -1
+        if column in STRING_COLUMNS:
+            if column not in self._codes:
+                self._codes[column] = {
+                    x: i for i, x in enumerate(self.strings[column])}
+            return self._codes[column].get(value, -2)
+        return int(value)
+
+
+#
+# functions
+#
+
+
+def decode_time(value: int, aware: bool = False) -> Optional[datetime]:
+    if value == NULL_TIME:
+        return None
+    return (EPOCH_UTC if aware else EPOCH) + timedelta(microseconds=value)
+
+
+def encode_strings(
+        values: Iterable[Optional[str]]
+) -> Tuple[np.ndarray, List[str]]:
+    # int32 codes, and the distinct strings in order of first appearance
+    codes = {}
+    data = np.array(
+        [-1 if x is None else codes.setdefault(x, len(codes)) for x in values],
+        dtype=np.int32)
+    return data, list(codes)
+
+
+def encode_time(value: Optional[datetime]) -> int:
+    if value is None:
+        return NULL_TIME
+    epoch = EPOCH if value.tzinfo is None else EPOCH_UTC
+    return (value - epoch) // timedelta(microseconds=1)
@@ -0,0 +1,256 @@
+"""Conversation threads assembled from a stream of Tweets.
+
+Tweets are grouped by `conversation_id` as they arrive, in one dict lookup
+each, and the size, participants and time span of every thread are kept up
+to date as they do. Reply structure, and so depth, is worked out per thread
+when first asked for. After that, a Tweet that arrives later in time than
+the others is placed in it directly, and anything else has it worked out
+again when next asked for.
+
+The v2 API only gives the user a Tweet replies to. When a Tweet also has
+the id of the Tweet it replies to, as `in_reply_to_tweet_id` or a
+`replied_to` entry in `referenced_tweets`, that is its parent. Otherwise
+its parent is the latest earlier Tweet in the thread by the user it replies
+to, or else the root.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from data_structures.twitter import Tweet
+
+
+class Thread:
+    """The Tweets of one conversation.
+
+    Attributes:
+        conversation_id: Int, the id of the Tweet that started it.
+        tweets: Dict of Tweet id to Tweet, in order added.
+        participants: Set of the author ids of its Tweets.
+        replies: Dict of (author id, id of the user replied to) to the number
+          of such replies.
+        start, end: the first and last `created_at`.
+    """
+
+    def __init__(self, conversation_id: int):
+        self.conversation_id = conversation_id
+        self.tweets = {}
+        self.participants = set()
+        self.replies = {}
+        self.start = None
+        self.end = None
+        # tweet id -> parent tweet id, depth and child tweet ids, worked out
+        # when needed
+        self._parents = None
+        self._depths = None
+        self._children = None
+        # for placing Tweets as they arrive: the latest Tweet id by each
+        # author, the sort key of the last Tweet placed, and the ids replied
+        # to that are not in the thread
+        self._latest = None
+        self._last_key = None
+        self._missing = None
+
+    def __contains__(self, tweet_id: int) -> bool:
+        return tweet_id in self.tweets
+
+    def __iter__(self) -> Iterator[Tweet]:
+        return iter(self.tweets.values())
+
+    def __len__(self):
+        return len(self.tweets)
+
+    @property
+    def depth(self) -> int:
+        """Length of the longest reply chain, 0 for a lone Tweet."""
+        return max(self.depths.values(), default=0)
+
+    @property
+    def depths(self) -> Dict[int, int]:
+        """Number of replies between each Tweet and the root."""
+        if self._depths is None:
+            self._build()
+        return self._depths
+
+    @property
+    def parents(self) -> Dict[int, Optional[int]]:
+        """The id of the Tweet each Tweet replies to, None if not known."""
+        if self._parents is None:
+            self._build()
+        return self._parents
+
+    @property
+    def root(self) -> Optional[Tweet]:
+        return self.tweets.get(self.conversation_id)
+
+    @property
+    def size(self) -> int:
+        return len(self.tweets)
+
+    @property
+    def time_span(self) -> Optional[timedelta]:
+        if self.start is None:
+            return None
+        return self.end - self.start
+
+    def add(self, tweet: Tweet) -> bool:
+        """Add a Tweet, returning whether it was new."""
+        if tweet.id in self.tweets:
+            return False
+        self.tweets[tweet.id] = tweet
+        self.participants.add(tweet.author_id)
+        if tweet.in_reply_to_user_id is not None:
+            key = (tweet.author_id, tweet.in_reply_to_user_id)
+            self.replies[key] = self.replies.get(key, 0) + 1
+        created_at = tweet.created_at
+        if created_at is not None:
+            if self.start is None or created_at < self.start:
+                self.start = created_at
+            if self.end is None or created_at > self.end:
+                self.end = created_at
+        if self._parents is not None:
+            key = get_sort_key(tweet)
+            if (self._last_key is None or key > self._last_key) \
+                    and tweet.id not in self._missing \
+                    and tweet.id != self.conversation_id:
+                parent = self._place(tweet, key)
+                self._depths[tweet.id] = self._depths.get(parent, -1) + 1 \
+                    if parent is not None else 0
+            else:
+                # earlier Tweets may now have another parent
+                self._parents = None
+                self._depths = None
+                self._children = None
+        return True
+
+    def children(self, tweet_id: int) -> List[int]:
+        if self._children is None:
+            self._build()
+        return list(self._children.get(tweet_id, ()))
+
+    def _build(self):
+        self._parents = {}
+        self._children = {}
+        self._latest = {}
+        self._last_key = None
+        self._missing = set()
+        # in order of creation, so the latest Tweet by each user is known
+        for tweet in sorted(self.tweets.values(), key=get_sort_key):
+            self._place(tweet, get_sort_key(tweet))
+        self._depths = get_depths(self._parents)
+
+    def _place(
+            self,
+            tweet: Tweet,
+            key: Tuple[bool, datetime, int]
+    ) -> Optional[int]:
+        # set the parent of the next Tweet in order of creation
+        parent = get_reply_to_tweet_id(tweet)
+        if parent not in self.tweets:
+            if parent is not None:
+                self._missing.add(parent)
+            parent = None
+            if tweet.in_reply_to_user_id is not None:
+                parent = self._latest.get(tweet.in_reply_to_user_id)
+            if parent is None and tweet.id != self.conversation_id \
+                    and self.root is not None:
+                parent = self.conversation_id
+        self._parents[tweet.id] = parent
+        self._children.setdefault(tweet.id, [])
+        if parent is not None:
+            self._children.setdefault(parent, []).append(tweet.id)
+        self._latest[tweet.author_id] = tweet.id
+        self._last_key = key
+        return parent
+
+
+class ThreadIndex:
+    """Tweets grouped into Threads by conversation, updated as they arrive.
+
+    Args:
+        tweets: Iterable of Tweets to start with.
+    """
+
+    def __init__(self, tweets: Iterable[Tweet] = ()):
+        self.threads = {}
+        self.update(tweets)
+
+    def __contains__(self, conversation_id: int) -> bool:
+        return conversation_id in self.threads
+
+    def __getitem__(self, conversation_id: int) -> Thread:
+        return self.threads[conversation_id]
+
+    def __iter__(self) -> Iterator[Thread]:
+        return iter(self.threads.values())
+
+    def __len__(self):
+        return len(self.threads)
+
+    def add(self, tweet: Tweet) -> Thread:
+        """Add a Tweet, returning its Thread.
+
+        A Tweet without a `conversation_id` starts a thread of its own.
+        """
+        conversation_id = tweet.conversation_id
+        if conversation_id is None:
+            conversation_id = tweet.id
+        thread = self.threads.get(conversation_id)
+        if thread is None:
+            thread = self.threads[conversation_id] = Thread(conversation_id)
+        thread.add(tweet)
+        return thread
+
+    def largest(self, k: int) -> List[Thread]:
+        """The k Threads with the most Tweets, largest first."""
+        return sorted(self.threads.values(), key=len, reverse=True)[:k]
+
+    def update(self, tweets: Iterable[Tweet]):
+        for tweet in tweets:
+            self.add(tweet)
+
+
+#
+# functions
+#
+
+
+def get_depths(parents: Dict[int, Optional[int]]) -> Dict[int, int]:
+    depths = {}
+    for tweet_id in parents:
+        # walk up until a known depth, the root, or a cycle
+        path = []
+        seen = set()
+        current = tweet_id
+        while current is not None and current not in depths \
+                and current not in seen:
+            seen.add(current)
+            path.append(current)
+            current = parents.get(current)
+        depth = depths.get(current, -1) if current is not None else -1
+        for x in reversed(path):
+            depth += 1
+            depths[x] = depth
+    return depths
+
+
+def get_reply_to_tweet_id(tweet: Tweet) -> Optional[int]:
+    tweet_id = tweet.get('in_reply_to_tweet_id')
+    if tweet_id is None:
+        for reference in tweet.get('referenced_tweets') or ():
+            if reference.get('type') == 'replied_to':
+                tweet_id = reference.get('id')
+                break
+    return to_int(tweet_id)
+
+
+def get_sort_key(tweet: Tweet) -> Tuple[bool, datetime, int]:
+    # Tweets without a time go last
+    created_at = tweet.created_at
+    return (created_at is None, created_at or datetime.min, tweet.id)
+
+
+def to_int(value: Any) -> Any:
+    # the API gives ids as strings
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
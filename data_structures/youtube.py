@@ -8,6 +8,10 @@ from data_structures.base import DataBase
 class YouTubeChannel(DataBase):
     # https://developers.google.com/youtube/v3/docs/channels
 
+    _fields = (
+        'id', 'title', 'created_at', 'description', 'lang', 'country',
+    )
+
     def __init__(self,
                  id: str,
                  title: str,
@@ -25,57 +29,14 @@ class YouTubeChannel(DataBase):
             country=country,
             **kwargs)
 
-    @property
-    def id(self) -> str:
-        return self.__getitem__('id')
-
-    @id.setter
-    def id(self, value: str):
-        self.__setitem__('id', value)
-
-    @property
-    def title(self) -> str:
-        return self.__getitem__('title')
-
-    @title.setter
-    def title(self, value: str):
-        self.__setitem__('title', value)
-
-    @property
-    def description(self) -> str:
-        return self.__getitem__('description')
-
-    @description.setter
-    def description(self, value: str):
-        self.__setitem__('description', value)
-
-    @property
-    def lang(self) -> str:
-        return self.__getitem__('lang')
-
-    @lang.setter
-    def lang(self, value: str):
-        self.__setitem__('lang', value)
-
-    @property
-    def country(self) -> str:
-        return self.__getitem__('country')
-
-    @country.setter
-    def country(self, value: str):
-        self.__setitem__('country', value)
-
-    @property
-    def created_at(self) -> datetime:
-        return self.__getitem__('created_at')
-
-    @created_at.setter
-    def created_at(self, value: datetime):
-        self.__setitem__('created_at', value)
-
 
 class YouTubeVideoStats(DataBase):
 
+    _fields = (
+        'video_id', 'collected_at', 'num_views', 'num_likes', 'num_comments',
+        'num_dislikes',
+    )
+
     def __init__(self,
                  video_id: str,
                  collected_at: datetime,
@@ -93,80 +54,23 @@ class YouTubeVideoStats(DataBase):
             num_dislikes=num_dislikes,
             **kwargs)
 
-    @property
-    def video_id(self) -> str:
-        return self.__getitem__('video_id')
-
-    @video_id.setter
-    def video_id(self, value: str):
-        self.__setitem__('video_id', value)
-
-    @property
-    def collected_at(self) -> datetime:
-        return self.__getitem__('collected_at')
-
-    @collected_at.setter
-    def collected_at(self, value: datetime):
-        self.__setitem__('collected_at', value)
-
-    @property
-    def num_views(self) -> int:
-        return self.__getitem__('num_views')
-
-    @num_views.setter
-    def num_views(self, value: int):
-        self.__setitem__('num_views', value)
-
-    @property
-    def num_likes(self) -> int:
-        return self.__getitem__('num_likes')
-
-    @num_likes.setter
-    def num_likes(self, value: int):
-        self.__setitem__('num_likes', value)
-
-    @property
-    def num_comments(self) -> int:
-        return self.__getitem__('num_comments')
-
-    @num_comments.setter
-    def num_comments(self, value: int):
-        self.__setitem__('num_comments', value)
-
-    @property
-    def num_dislikes(self) -> int:
-        return self.__getitem__('num_dislikes')
-
-    @num_dislikes.setter
-    def num_dislikes(self, value: int):
-        self.__setitem__('num_dislikes', value)
-
 
 class YouTubeVideoTag(DataBase):
 
+    _fields = ('video_id', 'tag')
+
     def __init__(self, video_id: str, tag: str):
         super().__init__(video_id=video_id, tag=tag)
 
-    @property
-    def video_id(self) -> str:
-        return self.__getitem__('video_id')
-
-    @video_id.setter
-    def video_id(self, value: str):
-        self.__setitem__('video_id', value)
-
-    @property
-    def tag(self) -> str:
-        return self.__getitem__('tag')
-
-    @tag.setter
-    def tag(self, value: str):
-        self.__setitem__('tag', value)
-
 
 class YouTubeVideo(DataBase):
     # https://developers.google.com/youtube/v3/docs/videos
 
+    _fields = (
+        'id', 'channel_id', 'created_at', 'title', 'description', 'duration',
+        'dimension', 'definition', 'projection', 'channel', 'stats', 'tags',
+    )
+
     def __init__(self,
                  id: str,
                  channel_id: str,
@@ -196,105 +100,13 @@ class YouTubeVideo(DataBase):
             tags=tags,
             **kwargs)
 
-    @property
-    def id(self) -> str:
-        return self.__getitem__('id')
-
-    @id.setter
-    def id(self, value: str):
-        self.__setitem__('id', value)
-
-    @property
-    def channel_id(self) -> str:
-        return self.__getitem__('channel_id')
-
-    @channel_id.setter
-    def channel_id(self, value: str):
-        self.__setitem__('channel_id', value)
-
-    @property
-    def created_at(self) -> datetime:
-        return self.__getitem__('created_at')
-
-    @created_at.setter
-    def created_at(self, value: datetime):
-        self.__setitem__('created_at', value)
-
-    @property
-    def title(self) -> str:
-        return self.__getitem__('title')
-
-    @title.setter
-    def title(self, value: str):
-        self.__setitem__('title', value)
-
-    @property
-    def description(self) -> str:
-        return self.__getitem__('description')
-
-    @description.setter
-    def description(self, value: str):
-        self.__setitem__('description', value)
-
-    @property
-    def duration(self) -> str:
-        return self.__getitem__('duration')
-
-    @duration.setter
-    def duration(self, value: str):
-        self.__setitem__('duration', value)
-
-    @property
-    def dimension(self) -> str:
-        return self.__getitem__('dimension')
-
-    @dimension.setter
-    def dimension(self, value: str):
-        self.__setitem__('dimension', value)
-
-    @property
-    def definition(self) -> str:
-        return self.__getitem__('definition')
-
-    @definition.setter
-    def definition(self, value: str):
-        self.__setitem__('definition', value)
-
-    @property
-    def projection(self) -> str:
-        return self.__getitem__('projection')
-
-    @projection.setter
-    def projection(self, value: str):
-        self.__setitem__('projection', value)
-
-    @property
-    def channel(self) -> YouTubeChannel:
-        return self.__getitem__('channel')
-
-    @channel.setter
-    def channel(self, value: YouTubeChannel):
-        self.__setitem__('channel', value)
-
-    @property
-    def stats(self) -> YouTubeVideoStats:
-        return self.__getitem__('stats')
-
-    @stats.setter
-    def stats(self, value: YouTubeVideoStats):
-        self.__setitem__('stats', value)
-
-    @property
-    def tags(self) -> List[YouTubeVideoTag]:
-        return self.__getitem__('tags')
-
-    @tags.setter
-    def tags(self, value: List[YouTubeVideoTag]):
-        self.__setitem__('tags', value)
-
 
 class YouTubeCommentStats(DataBase):
 
+    _fields = (
+        'comment_id', 'collected_at', 'num_likes', 'num_replies', 'rank',
+    )
+
     def __init__(self,
                  comment_id: str,
                  collected_at: datetime,
@@ -310,50 +122,16 @@ class YouTubeCommentStats(DataBase):
             rank=rank,
             **kwargs)
 
-    @property
-    def comment_id(self) -> str:
-        return self.__getitem__('comment_id')
-
-    @comment_id.setter
-    def comment_id(self, value: str):
-        self.__setitem__('comment_id', value)
-
-    @property
-    def collected_at(self) -> datetime:
-        return self.__getitem__('collected_at')
-
-    @collected_at.setter
-    def collected_at(self, value: datetime):
-        self.__setitem__('collected_at', value)
-
-    @property
-    def num_likes(self) -> int:
-        return self.__getitem__('num_likes')
-
-    @num_likes.setter
-    def num_likes(self, value: int):
-        self.__setitem__('num_likes', value)
-
-    @property
-    def num_replies(self) -> int:
-        return self.__getitem__('num_replies')
-
-    @num_replies.setter
-    def num_replies(self, value: int):
-        self.__setitem__('num_replies', value)
-
-    @property
-    def rank(self) -> int:
-        return self.__getitem__('rank')
-
-    @rank.setter
-    def rank(self, value: int):
-        self.__setitem__('rank', value)
-
 
 class YouTubeComment(DataBase):
     # https://developers.google.com/youtube/v3/docs/comments
 
+    _fields = (
+        'id', 'video_id', 'author_channel_id', 'comment_thread_id',
+        'created_at', 'text', 'channel', 'video', 'stats',
+        'replied_to_comment_id',
+    )
+
     def __init__(self,
                  id: str,
                  video_id: str,
@@ -378,83 +156,3 @@ class YouTubeComment(DataBase):
             stats=stats,
             replied_to_comment_id=replied_to_comment_id,
             **kwargs)
-
-    @property
-    def id(self) -> str:
-        return self.__getitem__('id')
-
-    @id.setter
-    def id(self, value: str):
-        self.__setitem__('id', value)
-
-    @property
-    def video_id(self) -> str:
-        return self.__getitem__('video_id')
-
-    @video_id.setter
-    def video_id(self, value: str):
-        self.__setitem__('video_id', value)
-
-    @property
-    def author_channel_id(self) -> str:
-        return self.__getitem__('author_channel_id')
-
-    @author_channel_id.setter
-    def author_channel_id(self, value: str):
-        self.__setitem__('author_channel_id', value)
-
-    @property
-    def comment_thread_id(self) -> str:
-        return self.__getitem__('comment_thread_id')
-
-    @comment_thread_id.setter
-    def comment_thread_id(self, value: str):
-        self.__setitem__('comment_thread_id', value)
-
-    @property
-    def replied_to_comment_id(self) -> str:
-        return self.__getitem__('replied_to_comment_id')
-
-    @replied_to_comment_id.setter
-    def replied_to_comment_id(self, value: str):
-        self.__setitem__('replied_to_comment_id', value)
-
-    @property
-    def created_at(self) -> datetime:
-        return self.__getitem__('created_at')
-
-    @created_at.setter
-    def created_at(self, value: datetime):
-        self.__setitem__('created_at', value)
-
-    @property
-    def text(self) -> str:
-        return self.__getitem__('text')
-
-    @text.setter
-    def text(self, value: str):
-        self.__setitem__('text', value)
-
-    @property
-    def channel(self) -> YouTubeChannel:
-        return self.__getitem__('channel')
-
-    @channel.setter
-    def channel(self, value: YouTubeChannel):
-        self.__setitem__('channel', value)
-
-    @property
-    def video(self) -> YouTubeVideo:
-        return self.__getitem__('video')
-
-    @video.setter
-    def video(self, value: YouTubeVideo):
-        self.__setitem__('video', value)
-
-    @property
-    def stats(self) -> List[YouTubeCommentStats]:
-        return self.__getitem__('stats')
-
-    @stats.setter
-    def stats(self, value: List[YouTubeCommentStats]):
-        self.__setitem__('stats', value)
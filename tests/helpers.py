@@ -0,0 +1,70 @@
+from datetime import datetime
+import random
+
+from data_structures.nlp import Sentence, Token
+from data_structures.twitter import Tweet
+
+
+DEPENDENCY_TYPES = [
+    'nsubj', 'dobj', 'pobj', 'appos', 'attr', 'cop', 'nsubjpass', 'obj',
+    'advcl', 'ccomp', 'csubj', 'parataxis', 'pcomp', 'relcl', 'root', 'ROOT',
+    'xcomp', 'prep', 'det', 'amod', 'punct', None,
+]
+POS = ['NOUN', 'PROPN', 'PRON', 'VERB', 'AUX', 'DET', 'ADP', 'ADJ', None]
+
+
+def get_cat_sentence(cat: str = 'cat') -> Sentence:
+    # "I saw a cat in a hat"
+    return Sentence(tokens=[
+        Token('I', ix=0, dependency_head_ix=1, dependency_type='nsubj',
+              pos='PRON'),
+        Token('saw', ix=1, dependency_head_ix=None, dependency_type='root',
+              pos='VERB'),
+        Token('a', ix=2, dependency_head_ix=3, dependency_type='det'),
+        Token(cat, ix=3, dependency_head_ix=1, dependency_type='dobj',
+              pos='NOUN'),
+        Token('in', ix=4, dependency_head_ix=3, dependency_type='prep'),
+        Token('a', ix=5, dependency_head_ix=6, dependency_type='det'),
+        Token('hat', ix=6, dependency_head_ix=4, dependency_type='pobj'),
+    ])
+
+
+def get_random_sentence(rng: random.Random) -> Sentence:
+    n = rng.randint(0, 25)
+    # like spacy, ix is often the position in the document
+    first_ix = rng.choice([0, 0, 1, rng.randint(2, 100)])
+    ixs = list(range(first_ix, first_ix + n))
+    heads = []
+    for position in range(n):
+        if position == 0 or rng.random() < 0.1:
+            heads.append(rng.choice([None, ixs[position]]))
+        else:
+            heads.append(ixs[rng.randrange(position)])
+    # shuffle the word order while keeping the tree
+    order = list(range(n))
+    if rng.random() < 0.5:
+        rng.shuffle(order)
+    tokens = [
+        Token(f'w{i}', ix=ixs[i], dependency_head_ix=heads[i],
+              dependency_type=rng.choice(DEPENDENCY_TYPES),
+              pos=rng.choice(POS))
+        for i in order]
+    # the odd malformed sentence: repeated ixs, dangling heads, cycles
+    if n > 2 and rng.random() < 0.1:
+        tokens[1].ix = tokens[0].ix
+    if n > 2 and rng.random() < 0.1:
+        tokens[2].dependency_head_ix = 10_000
+    if n > 3 and rng.random() < 0.1:
+        tokens[0].dependency_head_ix = tokens[1].ix
+        tokens[1].dependency_head_ix = tokens[0].ix
+    return Sentence(tokens=tokens)
+
+
+def get_tweet(id: int, **kwargs) -> Tweet:
+    # a plain Tweet, with any of its fields given in kwargs instead
+    values = dict(
+        text=str(id), author_id=1, conversation_id=id,
+        created_at=datetime(2021, 1, 1), in_reply_to_user_id=None,
+        lang='en', is_reply=False, is_retweet=False)
+    values.update(kwargs)
+    return Tweet(id=id, **values)
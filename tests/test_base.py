@@ -1,9 +1,11 @@
 from datetime import datetime
 import json
 from json import JSONDecodeError
+import pickle
 import unittest
 
-from data_structures.twitter import TwitterUser
+from data_structures.base import DataBase, get_digest
+from data_structures.twitter import Tweet, TwitterUser
 from data_structures.youtube import YouTubeChannel, YouTubeVideo
 
 
@@ -39,6 +41,105 @@ class TestBaseFunctionality(unittest.TestCase):
             created_at=datetime(2021, 1, 1, 2, 2, 2))
         self.assertFalse(user1 == user2)
 
+    def test_digest(self):
+        def get_user(id: int) -> TwitterUser:
+            return TwitterUser(
+                id=id,
+                name='1',
+                username='1',
+                verified=False,
+                created_at=datetime(2021, 1, 1, 2, 2, 2))
+
+        user1, user2, user3 = get_user(1), get_user(1), get_user(2)
+        self.assertEqual(16, len(user1.digest))
+        self.assertEqual(user1.digest, user2.digest)
+        self.assertNotEqual(user1.digest, user3.digest)
+        self.assertEqual(2, len({user1, user2, user3}))
+        # both digests known, so equality compares them
+        self.assertTrue(user1 == user2)
+        self.assertFalse(user1 == user3)
+        # changing a key clears the digest
+        user3.id = 1
+        self.assertEqual(user1.digest, user3.digest)
+        self.assertTrue(user1 == user3)
+        # the same content as another type is not equal
+        channel = YouTubeChannel(id='1', title='1', created_at=None)
+        self.assertNotEqual(channel.digest, get_user(1).digest)
+
+    def test_digest_is_stable(self):
+        # digests must not change between runs, e.g. with hash randomization
+        self.assertEqual(
+            get_digest({'b': [1, 2.5, None], 'a': ('x', True)}),
+            get_digest({'a': ['x', True], 'b': (1, 2.5, None)}))
+        self.assertNotEqual(get_digest(['ab', 'c']), get_digest(['a', 'bc']))
+        self.assertNotEqual(get_digest(1), get_digest(True))
+        self.assertEqual('d858417d42eb623c64e75bcef724c5d6',
+                         get_digest(['x', 1]).hex())
+        with self.assertRaises(TypeError):
+            get_digest(object())
+
+    def test_fields_are_slots(self):
+        user = TwitterUser(id=1, name='1', username='1', verified=False,
+                           created_at=None, followers=3)
+        self.assertFalse(hasattr(user, '__dict__'))
+        self.assertEqual(1, user['id'])
+        self.assertEqual(3, user['followers'])
+        user['name'] = '2'
+        self.assertEqual('2', user.name)
+        self.assertEqual(
+            ['id', 'name', 'username', 'verified', 'created_at', 'location',
+             'description', 'followers'],
+            list(user))
+        self.assertEqual(8, len(user))
+        del user['location']
+        self.assertNotIn('location', user)
+        with self.assertRaises(KeyError):
+            user['location']
+        with self.assertRaises(AttributeError):
+            user.followers = 4
+
+    def test_mapping_reads(self):
+        user = TwitterUser(id=1, name='1', username='1', verified=False,
+                           created_at=None, followers=3)
+        del user['location']
+        self.assertIn('name', user)
+        self.assertIn('followers', user)
+        self.assertNotIn('location', user)
+        self.assertNotIn('following', user)
+        self.assertEqual('1', user.get('name'))
+        self.assertEqual(3, user.get('followers'))
+        self.assertEqual('here', user.get('location', 'here'))
+        self.assertIsNone(user.get('following'))
+
+    def test_store_is_read_only(self):
+        user = TwitterUser(id=1, name='1', username='1', verified=False,
+                           created_at=None, followers=3)
+        self.assertEqual(dict(user), dict(user.store))
+        with self.assertRaises(TypeError):
+            user.store['name'] = '2'
+        self.assertEqual('1', user.name)
+
+    def test_subclass_fields(self):
+        class Retweet(Tweet):
+            _fields = ('retweeted_id',)
+
+        self.assertEqual('retweeted_id', Retweet._schema[-1])
+        self.assertEqual(Tweet._schema, Retweet._schema[:-1])
+        with self.assertRaises(TypeError):
+            class Bad(DataBase):
+                _fields = ('keys',)
+
+    def test_pickle(self):
+        user = TwitterUser(id=1, name='1', username='1', verified=False,
+                           created_at=datetime(2021, 1, 1), followers=3)
+        loaded = pickle.loads(pickle.dumps(user))
+        self.assertEqual(user, loaded)
+        self.assertEqual(3, loaded['followers'])
+        # as pickled when fields were kept in a dict
+        old = TwitterUser.__new__(TwitterUser)
+        old.__setstate__({'store': dict(user)})
+        self.assertEqual(user, old)
+
     def test_unpack(self):
         def f(**kwargs):
             for key, value in kwargs.items():
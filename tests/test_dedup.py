@@ -0,0 +1,75 @@
+import unittest
+
+from data_structures.dedup import deduplicate, get_bands, \
+    get_text_shingles, get_token_shingles, LshIndex
+from data_structures.nlp import Document, Paragraph, Sentence, Token
+from tests.helpers import get_tweet
+
+
+SPAM = 'RT @deals: Buy cheap followers now at http://spam.example #ad #win'
+
+
+class TestLshIndex(unittest.TestCase):
+
+    def test_clusters(self):
+        index = LshIndex(threshold=0.7)
+        self.assertEqual(0, index.add(1, get_text_shingles(SPAM)))
+        self.assertEqual(0, index.add(2, get_text_shingles(SPAM + ' !!')))
+        self.assertEqual(0, index.add(3, get_text_shingles(SPAM.upper())))
+        self.assertEqual(1, index.add(4, get_text_shingles(
+            'The cat sat on the mat and looked out of the window.')))
+        self.assertEqual(3, index.sizes[0])
+        self.assertEqual(2, index.num_clusters)
+        self.assertEqual(4, len(index))
+        self.assertIn(2, index)
+        self.assertEqual(1, index.cluster_of(4))
+        self.assertEqual(0, index.query(get_text_shingles(SPAM + '.')))
+        self.assertIsNone(index.query(get_text_shingles('hello world')))
+        with self.assertRaises(ValueError):
+            index.add(1, get_text_shingles(SPAM))
+
+    def test_similarity_estimate(self):
+        index = LshIndex(num_perm=256)
+        first = {str(i) for i in range(100)}
+        second = {str(i) for i in range(50, 150)}
+        similarity = (index.signature(first)
+                      == index.signature(second)).mean()
+        # the true Jaccard similarity is 1/3
+        self.assertAlmostEqual(1 / 3, similarity, delta=0.1)
+
+    def test_document_tokens(self):
+        def get_document(words):
+            return Document(paragraphs=[Paragraph(sentences=[
+                Sentence(tokens=[Token(x) for x in words.split()])])])
+
+        index = LshIndex(threshold=0.5)
+        words = 'we will not be silenced join the march on sunday'
+        for key, text in enumerate([words, words + ' please', 'hi there']):
+            index.add(key, get_token_shingles(
+                x.text for x in get_document(text).tokens))
+        self.assertEqual([0, 0, 1], [index.cluster_of(x) for x in range(3)])
+
+    def test_bands(self):
+        self.assertEqual((25, 5), get_bands(0.5, 128))
+        bands, rows = get_bands(0.9, 128)
+        self.assertLess(bands, 25)
+        self.assertLessEqual(bands * rows, 128)
+        with self.assertRaises(ValueError):
+            LshIndex(bands=200)
+
+
+class TestDeduplicate(unittest.TestCase):
+
+    def test_tweets(self):
+        tweets = [get_tweet(1, text=SPAM),
+                  get_tweet(2, text='Good morning Taipei!'),
+                  get_tweet(3, text=SPAM + ' '),
+                  get_tweet(4, text=SPAM + ' #3')]
+        self.assertEqual([1, 2], [x.id for x in deduplicate(tweets)])
+
+    def test_shingles(self):
+        self.assertEqual({'hi x'},
+                         get_text_shingles(' Hi \n x'))
+        self.assertEqual(set(), get_text_shingles(''))
+        self.assertEqual({'abc', 'bcd'}, get_text_shingles('abcd', 3))
+        self.assertEqual({'a b', 'b c'}, get_token_shingles(['a', 'B', 'c']))
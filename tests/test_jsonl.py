@@ -0,0 +1,160 @@
+from datetime import date, datetime, timedelta, timezone
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from data_structures import jsonl
+from data_structures.jsonl import format_datetime, load_jsonl, to_jsonl, \
+    to_normalized_jsonl
+from data_structures.twitter import Tweet, TwitterUser, UserRegistry
+from data_structures.youtube import YouTubeChannel, YouTubeVideo, \
+    YouTubeVideoStats
+
+
+def get_records():
+    tweet = Tweet(
+        id=1, text='hi 你好', author_id=2, conversation_id=1,
+        created_at=datetime(2021, 1, 1, 2, 2, 2, 500),
+        in_reply_to_user_id=None, lang='en', is_reply=False,
+        is_retweet=False, collected_on=date(2021, 1, 2))
+    video = YouTubeVideo(
+        id='1', channel_id='1', created_at=datetime(2021, 1, 1, 2, 2, 2),
+        title='title1', description='description1',
+        channel=YouTubeChannel(
+            id='1', title='1', created_at=datetime(2021, 11, 11, 12, 12, 12)),
+        stats=[YouTubeVideoStats(
+            video_id='1', collected_at=datetime(2021, 11, 12),
+            num_views=1, num_likes=2, num_comments=3)],
+        tags=None)
+    return [tweet, video, tweet]
+
+
+class TestToJsonl(unittest.TestCase):
+
+    def test_lines_decode_as_to_json(self):
+        records = get_records()
+        for backend in jsonl.BACKENDS:
+            if backend == 'orjson' and jsonl.orjson is None:
+                continue
+            f = io.StringIO()
+            self.assertEqual(3, to_jsonl(records, f, backend=backend,
+                                         chunk_size=2))
+            lines = f.getvalue().splitlines()
+            self.assertEqual([json.loads(x.to_json()) for x in records],
+                             [json.loads(x) for x in lines])
+
+    def test_binary_handle(self):
+        f = io.BytesIO()
+        to_jsonl(get_records(), f, backend='json')
+        lines = f.getvalue().decode('utf-8').splitlines()
+        self.assertEqual('hi 你好', json.loads(lines[0])['text'])
+
+    def test_deleted_field(self):
+        tweet = get_records()[0]
+        del tweet['lang']
+        f = io.StringIO()
+        to_jsonl([tweet], f, backend='json')
+        self.assertNotIn('lang', json.loads(f.getvalue()))
+
+    def test_format_datetime_by_zone(self):
+        utc = datetime(2021, 1, 1, 8, tzinfo=timezone.utc)
+        taipei = utc.astimezone(timezone(timedelta(hours=8)))
+        self.assertEqual(utc, taipei)
+        self.assertEqual('2021-01-01 08:00:00', format_datetime(utc))
+        self.assertEqual('2021-01-01 16:00:00', format_datetime(taipei))
+
+    def test_format_datetime_as_strftime(self):
+        values = [datetime(2021, 1, 1) + timedelta(seconds=x, microseconds=x)
+                  for x in range(0, 86400 * 2, 997)]
+        values.append(datetime(999, 12, 31, 23, 59, 59))
+        for value in values:
+            self.assertEqual(value.strftime('%Y-%m-%d %H:%M:%S'),
+                             format_datetime(value))
+        # the date part is cached once per day
+        self.assertIn(datetime(2021, 1, 2).toordinal(), jsonl.DATE_CACHE)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            to_jsonl([], io.StringIO(), backend='ujson')
+
+
+class TestLoadJsonl(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'records.jsonl')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        tweets = [
+            Tweet(id=i, text=str(i), author_id=2, conversation_id=1,
+                  created_at=datetime(2021, 1, 1, 2, 2, i),
+                  in_reply_to_user_id=None, lang='en', is_reply=False,
+                  is_retweet=False, author_created_at=datetime(2020, 1, 1))
+            for i in range(10)]
+        with open(self.path, 'wb') as f:
+            to_jsonl(tweets, f)
+        for workers in [1, 2]:
+            self.assertEqual(
+                tweets,
+                list(load_jsonl(self.path, chunk_size=3, workers=workers)))
+
+    def test_nested_records(self):
+        _, video, _ = get_records()
+        # written one at a time, as before bulk export
+        with open(self.path, 'w') as f:
+            f.write(video.to_json() + '\n\n')
+        loaded, = load_jsonl(self.path, cls=YouTubeVideo, backend='json')
+        self.assertEqual(video, loaded)
+        self.assertIsInstance(loaded.channel, YouTubeChannel)
+        self.assertEqual(datetime(2021, 11, 12),
+                         loaded.stats[0].collected_at)
+
+    def test_normalized(self):
+        tweets = [
+            Tweet(id=i, text=str(i), author_id=i % 2, conversation_id=1,
+                  created_at=datetime(2021, 1, 1), in_reply_to_user_id=None,
+                  lang='en', is_reply=False, is_retweet=False,
+                  author_username=f'user{i % 2}',
+                  author_created_at=datetime(2020, 1, 1))
+            for i in range(4)]
+        expected = [json.loads(x.to_json()) for x in tweets]
+        tweets_path = os.path.join(self.dir.name, 'tweets.jsonl')
+        users_path = os.path.join(self.dir.name, 'users.jsonl')
+        with open(tweets_path, 'wb') as f, open(users_path, 'wb') as g:
+            self.assertEqual((4, 2), to_normalized_jsonl(tweets, f, g))
+        with open(tweets_path) as f:
+            self.assertNotIn('author_username', json.loads(next(f)))
+        users = UserRegistry(load_jsonl(users_path, cls=TwitterUser))
+        self.assertEqual(datetime(2020, 1, 1), users[1].created_at)
+        loaded = users.link_all(load_jsonl(tweets_path))
+        self.assertEqual(expected, [json.loads(x.to_json()) for x in loaded])
+
+    def test_normalized_without_author_id(self):
+        tweet = get_records()[0]
+        tweet.author_id = None
+        tweet.author_name = 'Alice'
+        tweets_path = os.path.join(self.dir.name, 'tweets.jsonl')
+        users_path = os.path.join(self.dir.name, 'users.jsonl')
+        with open(tweets_path, 'wb') as f, open(users_path, 'wb') as g:
+            self.assertEqual((1, 0), to_normalized_jsonl([tweet], f, g))
+        loaded, = load_jsonl(tweets_path)
+        self.assertEqual('Alice', loaded.author_name)
+
+    def test_normalized_keeps_diverging_author_fields(self):
+        tweets = [get_records()[0], get_records()[0]]
+        tweets[0].author_description = 'old bio'
+        tweets[1].id = 2
+        tweets[1].author_description = 'new bio'
+        tweets_path = os.path.join(self.dir.name, 'tweets.jsonl')
+        users_path = os.path.join(self.dir.name, 'users.jsonl')
+        with open(tweets_path, 'wb') as f, open(users_path, 'wb') as g:
+            self.assertEqual((2, 1), to_normalized_jsonl(tweets, f, g))
+        users = UserRegistry(load_jsonl(users_path, cls=TwitterUser))
+        loaded = list(users.link_all(load_jsonl(tweets_path)))
+        self.assertEqual(['old bio', 'new bio'],
+                         [x.author_description for x in loaded])
@@ -1,7 +1,10 @@
 import dill
+import random
 import unittest
 
-from data_structures.nlp import merge_tokens, Sentence, Token
+from data_structures import nlp
+from data_structures.nlp import Document, filter_spans, get_left_right, \
+    get_spans, merge_tokens, Paragraph, Sentence, Token
 
 
 class TestToken(unittest.TestCase):
@@ -70,9 +73,459 @@ class TestToken(unittest.TestCase):
             dependency_type='dobj')
         self.assertEqual(expected_angeles, angeles)
 
+    def test_split_keeps_char_offsets(self):
+        los_angeles = Token(text='Los Angeles', start_char_ix=10)
+        los, angeles = los_angeles.split(' ')
+        self.assertEqual(10, los.start_char_ix)
+        self.assertEqual(13, los.end_char_ix)
+        self.assertEqual(14, angeles.start_char_ix)
+        self.assertEqual(21, angeles.end_char_ix)
+
+    def test_slotted_with_interned_categories(self):
+        cat = Token('cat', pos='NOUN', dependency_type='dobj')
+        hat = Token('hat', pos='NOUN', dependency_type='pobj')
+        self.assertFalse(hasattr(cat, '__dict__'))
+        self.assertEqual(cat._pos, hat._pos)
+        self.assertEqual('NOUN', hat.pos)
+        hat.pos = 'VERB'
+        self.assertEqual('VERB', hat.pos)
+        self.assertEqual('NOUN', cat.pos)
+
+    def test_set_state_from_old_dict(self):
+        token = Token.__new__(Token)
+        token.__setstate__({'text': 'cat', 'pos': 'NOUN', 'ix': 3})
+        self.assertEqual(Token('cat', pos='NOUN', ix=3), token)
+        self.assertIsNone(token.start_char_ix)
+        self.assertEqual(-1, token.end_char_ix)
+
+
+class TestSentence(unittest.TestCase):
+
+    def test_tokens_are_rebuilt_from_columns(self):
+        tokens = [
+            Token('I', pos='PRON', ix=0, dependency_head_ix=1,
+                  dependency_type='nsubj', is_stop=True),
+            Token('saw', pos='VERB', ix=1, dependency_head_ix=None,
+                  dependency_type='root', is_stop=False),
+            Token('#LA', pos='PROPN', ix=2, dependency_head_ix=1,
+                  dependency_type='dobj', is_hashtag=True, is_entity=True,
+                  entity_type='CITY'),
+        ]
+        sentence = Sentence(tokens=tokens)
+        self.assertEqual(tokens, sentence.tokens)
+        self.assertEqual(tokens[2], sentence[2])
+        self.assertEqual(tokens[2], sentence[-1])
+        self.assertEqual([tokens[2]], sentence.hashtags)
+        self.assertEqual([tokens[2]], sentence.entities)
+        self.assertEqual([], sentence.urls)
+        self.assertEqual('I saw #LA', sentence.text)
+
+    def test_assign_tokens(self):
+        sentence = Sentence(tokens=[Token('a', ix=0), Token('b', ix=1)])
+        self.assertEqual('a b', sentence.text)
+        self.assertEqual([], sentence.hashtags)
+        tokens = sentence.tokens
+        tokens[1].is_hashtag = True
+        tokens.append(Token('c', ix=2, dependency_head_ix=1))
+        # the tokens read are copies
+        self.assertEqual(2, len(sentence))
+        sentence.tokens = tokens
+        self.assertEqual('a b c', sentence.text)
+        self.assertEqual(['b'], [x.text for x in sentence.hashtags])
+        self.assertEqual([2], sentence.children[1])
+
+    def test_head_at_ix_0(self):
+        # spacy numbers tokens from 0 across the document
+        sentence = Sentence(tokens=[
+            Token('saw', ix=0, dependency_head_ix=0, dependency_type='ROOT'),
+            Token('it', ix=1, dependency_head_ix=0, dependency_type='dobj'),
+        ])
+        self.assertEqual({0: [0, 1], 1: []}, sentence.children)
+        self.assertEqual({0: (1, 1)}, sentence.tree.spans)
+
+    def test_getitem_out_of_range(self):
+        sentence = Sentence(tokens=[Token('hi', ix=0)])
+        with self.assertRaises(IndexError):
+            sentence[1]
+
+
+class TestDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.document = Document(paragraphs=[
+            Paragraph(sentences=[
+                Sentence(tokens=[Token('a', ix=0), Token('#b', ix=1,
+                                                         is_hashtag=True)]),
+                Sentence(tokens=[Token('c', ix=0)]),
+            ]),
+            Paragraph(sentences=[
+                Sentence(tokens=[Token('#d', ix=0, is_hashtag=True),
+                                 Token('e', ix=1), Token('f', ix=2)]),
+            ]),
+        ])
+
+    def test_aggregates_are_cached(self):
+        self.assertIs(self.document._tokens, self.document._tokens)
+        self.assertIs(self.document._sentences, self.document._sentences)
+        self.assertEqual(['#b', '#d'],
+                         [x.text for x in self.document.hashtags])
+        self.assertEqual('a #b c\n\n#d e f', self.document.text)
+        self.assertEqual(6, len(self.document))
+
+    def test_aggregates_are_lists(self):
+        # as for Sentence, each caller gets its own list
+        self.assertIsInstance(self.document.tokens, list)
+        self.assertIsInstance(self.document.paragraphs[0].hashtags, list)
+        self.assertEqual(7, len(self.document.tokens + [Token('g')]))
+        self.document.tokens.append(Token('g'))
+        self.assertEqual(6, len(self.document.tokens))
+        empty = Document(paragraphs=[])
+        self.assertEqual([], empty.hashtags)
+        self.assertEqual([], empty.sentences)
+
+    def test_offsets_and_locate(self):
+        self.assertEqual([0, 2, 3], list(self.document.paragraph_offsets))
+        self.assertEqual([0, 2, 3, 6], list(self.document.sentence_offsets))
+        self.assertEqual((0, 1), self.document.locate(1))
+        self.assertEqual((1, 0), self.document.locate(2))
+        self.assertEqual((2, 2), self.document.locate(5))
+        with self.assertRaises(IndexError):
+            self.document.locate(6)
+
+    def test_assignment_invalidates(self):
+        self.assertEqual(6, len(self.document.tokens))
+        self.document.paragraphs = self.document.paragraphs[:1]
+        self.assertEqual(3, len(self.document.tokens))
+        self.assertEqual(['#b'], [x.text for x in self.document.hashtags])
+
+    def test_explicit_invalidate(self):
+        self.assertEqual(6, len(self.document.tokens))
+        self.document.paragraphs[1].sentences.append(
+            Sentence(tokens=[Token('g', ix=0)]))
+        self.assertEqual(6, len(self.document.tokens))
+        self.document.invalidate()
+        self.assertEqual(7, len(self.document.tokens))
+        self.assertEqual(4, len(self.document.paragraphs[1].tokens))
+
+    def test_iterators_match_lists(self):
+        document = self.document
+        self.assertEqual(document.tokens, list(document.iter_tokens()))
+        self.assertEqual(document.hashtags, list(document.iter_hashtags()))
+        self.assertEqual(document.entities, list(document.iter_entities()))
+        self.assertEqual(document.sentences,
+                         list(document.iter_sentences()))
+        self.assertEqual(document.paragraphs[1].tokens,
+                         list(document.paragraphs[1].iter_tokens()))
+        self.assertEqual(document.get_noun_phrases(),
+                         list(document.iter_noun_phrases()))
+
+    def test_corpus_iterators(self):
+        documents = (x for x in [self.document, self.document])
+        hashtags = nlp.iter_hashtags(documents)
+        self.assertEqual('#b', next(hashtags).text)
+        self.assertEqual(['#d', '#b', '#d'], [x.text for x in hashtags])
+        self.assertEqual(6, sum(1 for _ in nlp.iter_sentences(
+            [self.document, self.document])))
+
+    def test_cache_not_pickled(self):
+        self.assertEqual(6, len(self.document.tokens))
+        _document = dill.loads(self.document.serialize())
+        self.assertNotIn('_cache', _document.__dict__)
+        self.assertNotIn('_cache', _document.paragraphs[0].__dict__)
+        self.assertEqual(self.document.tokens, _document.tokens)
+
+
+class TestDigest(unittest.TestCase):
+
+    def get_document(self, word: str) -> Document:
+        return Document(paragraphs=[Paragraph(sentences=[
+            Sentence(tokens=[Token('a', pos='DET', ix=0),
+                             Token(word, pos='NOUN', ix=1)]),
+        ])])
+
+    def test_equal_content(self):
+        first, second = self.get_document('cat'), self.get_document('cat')
+        other = self.get_document('dog')
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(first.sentences[0], second.sentences[0])
+        self.assertEqual(2, len({first, second, other}))
+        self.assertEqual(1, len({first.tokens[1], second.tokens[1]}))
+        self.assertNotEqual(first.sentences[0], first.paragraphs[0])
+
+    def test_digest_after_change(self):
+        document = self.get_document('cat')
+        digest = document.digest
+        self.assertIs(digest, document.digest)
+        document.sentences[0].table.text[1] = 'dog'
+        self.assertEqual(digest, document.digest)
+        document.sentences[0].invalidate()
+        document.invalidate()
+        self.assertEqual(self.get_document('dog').digest, document.digest)
+        self.assertNotEqual(digest, document.digest)
+
+    def test_digest_survives_pickling(self):
+        document = self.get_document('cat')
+        _document = dill.loads(document.serialize())
+        self.assertEqual(document.digest, _document.digest)
+
+
+class TestCharIndex(unittest.TestCase):
+
+    def setUp(self):
+        # "Hi Bob. Visit https://x.tw now"
+        self.document = Document(paragraphs=[
+            Paragraph(sentences=[
+                Sentence(tokens=[Token('Hi', start_char_ix=0),
+                                 Token('Bob', start_char_ix=3),
+                                 Token('.', start_char_ix=6)]),
+                Sentence(tokens=[Token('Visit', start_char_ix=8),
+                                 Token('https://x.tw', start_char_ix=14),
+                                 Token('now', start_char_ix=27),
+                                 Token('!', start_char_ix=None)]),
+            ]),
+        ])
+
+    def test_token_at(self):
+        self.assertEqual('Bob', self.document.token_at(4).text)
+        self.assertEqual('.', self.document.token_at(6).text)
+        self.assertEqual('https://x.tw', self.document.token_at(25).text)
+        self.assertIsNone(self.document.token_at(7))
+        self.assertIsNone(self.document.token_at(100))
+        self.assertIsNone(self.document.token_at(-1))
+
+    def test_tokens_in_span(self):
+        self.assertEqual(['Bob', '.'], [
+            x.text for x in self.document.tokens_in_span(3, 7)])
+        self.assertEqual(['Bob', '.', 'Visit'], [
+            x.text for x in self.document.tokens_in_span(5, 9)])
+        self.assertEqual(['https://x.tw'], [
+            x.text for x in self.document.tokens_in_span(14, 26)])
+        self.assertEqual([], self.document.tokens_in_span(7, 8))
+        self.assertEqual(6, len(self.document.char_index))
+
+    def test_sentence(self):
+        sentence = self.document.sentences[1]
+        self.assertEqual('now', sentence.token_at(29).text)
+        self.assertEqual(['Visit', 'https://x.tw'], [
+            x.text for x in sentence.tokens_in_span(0, 20)])
+
+    def test_unsorted_offsets(self):
+        sentence = Sentence(tokens=[Token('b', start_char_ix=2),
+                                    Token('a', start_char_ix=0)])
+        self.assertEqual('a', sentence.token_at(0).text)
+        self.assertEqual(['a', 'b'], [
+            x.text for x in sentence.tokens_in_span(0, 3)])
+
+
+class TestSpans(unittest.TestCase):
+
+    def test_same_as_get_left_right(self):
+        rng = random.Random(42)
+        for _ in range(50):
+            n = rng.randint(1, 30)
+            children = {ix: [] for ix in range(n)}
+            for ix in range(1, n):
+                children[rng.randrange(ix)].append(ix)
+            expected = {ix: get_left_right(children, ix)
+                        for ix in children if children[ix]}
+            self.assertEqual(expected, get_spans(children))
+
+    def test_ignores_cycles(self):
+        # a root that is its own head
+        children = {0: [], 1: [0, 1, 2], 2: []}
+        self.assertEqual({1: (0, 2)}, get_spans(children))
+
+    def test_get_left_right_ignores_cycles(self):
+        children = {0: [0, 1], 1: [0], 2: [2]}
+        self.assertEqual((1, 1), get_left_right(children, 0))
+        self.assertEqual((0, 0), get_left_right(children, 1))
+        with self.assertRaises(ValueError):
+            get_left_right(children, 2)
+
+
+class TestMergeSpans(unittest.TestCase):
+
+    def get_sentence(self) -> Sentence:
+        # "I saw the Los Angeles Lakers play", with spacy style document ixs
+        return Sentence(tokens=[
+            Token('I', pos='PRON', lemma='I', ix=10, dependency_head_ix=11,
+                  dependency_type='nsubj'),
+            Token('saw', pos='VERB', lemma='see', ix=11,
+                  dependency_head_ix=11, dependency_type='ROOT'),
+            Token('the', pos='DET', lemma='the', ix=12, dependency_head_ix=15,
+                  dependency_type='det'),
+            Token('Los', pos='PROPN', lemma='Los', ix=13,
+                  dependency_head_ix=14, dependency_type='compound',
+                  is_entity=True, entity_type='ORG'),
+            Token('Angeles', pos='PROPN', lemma='Angeles', ix=14,
+                  dependency_head_ix=15, dependency_type='compound',
+                  is_entity=True, entity_type='ORG'),
+            Token('Lakers', pos='PROPN', lemma='Laker', ix=15,
+                  dependency_head_ix=16, dependency_type='nsubj',
+                  is_entity=True, entity_type='ORG'),
+            Token('play', pos='VERB', lemma='play', ix=16,
+                  dependency_head_ix=11, dependency_type='ccomp'),
+        ])
+
+    def test_merge_with_separate_det(self):
+        sentence = self.get_sentence()
+        self.assertEqual([(3, 5)], sentence.get_entity_spans())
+        sentence.merge_spans([(2, 5), (0, 0)])
+        self.assertEqual('I saw the Los Angeles Lakers play', sentence.text)
+        self.assertEqual(5, len(sentence))
+        merged = sentence[3]
+        self.assertEqual('Los Angeles Lakers', merged.text)
+        self.assertEqual('ORG', merged.entity_type)
+        tokens = sentence.tokens
+        self.assertEqual([10, 11, 12, 13, 14], [x.ix for x in tokens])
+        self.assertEqual([11, 11, 13, 14, 11],
+                         [x.dependency_head_ix for x in tokens])
+        self.assertFalse(sentence[2].is_entity)
+        self.assertEqual({0: [], 1: [0, 1, 4], 2: [], 3: [2], 4: [3]},
+                         sentence.children)
+
+    def test_merge_det(self):
+        sentence = self.get_sentence()
+        sentence.merge_spans([(2, 5)], merge_det=True)
+        tokens = sentence.tokens
+        self.assertEqual(['I', 'saw', 'the Los Angeles Lakers', 'play'],
+                         [x.text for x in tokens])
+        self.assertEqual([11, 11, 13, 11],
+                         [x.dependency_head_ix for x in tokens])
+
+    def test_invalid_spans(self):
+        sentence = self.get_sentence()
+        with self.assertRaises(ValueError):
+            sentence.merge_spans([(2, 4), (4, 5)])
+        with self.assertRaises(ValueError):
+            sentence.merge_spans([(5, 7)])
+
+    def test_span_with_several_roots(self):
+        # both hang from outside the span, the first one is taken
+        new_york = merge_tokens([
+            Token('New', lemma='New', ix=4, dependency_head_ix=6,
+                  dependency_type='nn'),
+            Token('York', lemma='York', ix=5, dependency_head_ix=6,
+                  dependency_type='pobj'),
+        ])
+        self.assertEqual(['New York'], [x.text for x in new_york])
+        self.assertEqual(4, new_york[0].ix)
+        self.assertEqual('nn', new_york[0].dependency_type)
+
+    def test_span_without_root(self):
+        # each token is the head of the other
+        with self.assertRaises(ValueError):
+            merge_tokens([
+                Token('a', lemma='a', ix=0, dependency_head_ix=1),
+                Token('b', lemma='b', ix=1, dependency_head_ix=0)])
+
+    def test_filter_spans(self):
+        self.assertEqual([(0, 1), (2, 5)],
+                         filter_spans([(3, 5), (2, 5), (0, 1), (1, 2)]))
+
+
+class TestRetokenize(unittest.TestCase):
+
+    def get_sentence(self) -> Sentence:
+        # "I saw New York #nyc_life"
+        return Sentence(tokens=[
+            Token('I', start_char_ix=0, ix=10, dependency_head_ix=11,
+                  dependency_type='nsubj'),
+            Token('saw', start_char_ix=2, ix=11, dependency_head_ix=11,
+                  dependency_type='ROOT'),
+            Token('New', start_char_ix=6, lemma='New', ix=12,
+                  dependency_head_ix=13, dependency_type='compound',
+                  is_entity=True, entity_type='GPE'),
+            Token('York', start_char_ix=10, lemma='York', ix=13,
+                  dependency_head_ix=11, dependency_type='dobj',
+                  is_entity=True, entity_type='GPE'),
+            Token('#nyc_life', start_char_ix=15, ix=14,
+                  dependency_head_ix=11, dependency_type='npadvmod',
+                  is_hashtag=True),
+        ])
+
+    def test_split_and_merge(self):
+        sentence = self.get_sentence()
+        sentence.retokenize(
+            split_rules=[lambda x: x.split('_') if x.is_hashtag else [x]],
+            merge_rules=[Sentence.get_entity_spans])
+        tokens = sentence.tokens
+        self.assertEqual(['I', 'saw', 'New York', '#nyc', 'life'],
+                         [x.text for x in tokens])
+        self.assertEqual([10, 11, 12, 13, 14], [x.ix for x in tokens])
+        self.assertEqual([11, 11, 11, 11, 13],
+                         [x.dependency_head_ix for x in tokens])
+        self.assertEqual(['nsubj', 'ROOT', 'dobj', 'npadvmod', 'dep'],
+                         [x.dependency_type for x in tokens])
+        self.assertEqual([15, 20], [x.start_char_ix for x in tokens[3:]])
+        self.assertEqual([4], sentence.children[3])
+        self.assertEqual([4], sentence.dep2ixs['dep'])
+        self.assertEqual('life', sentence.token_at(21).text)
+
+    def test_only_merges_same_as_merge_spans(self):
+        expected = self.get_sentence()
+        expected.merge_spans([(2, 3)])
+        sentence = self.get_sentence()
+        sentence.retokenize(merge_rules=[
+            Sentence.get_entity_spans, lambda x: [(3, 3)]])
+        self.assertEqual(expected.tokens, sentence.tokens)
+
+    def test_without_ix(self):
+        sentence = Sentence(tokens=[Token('a_b'), Token('c')])
+        sentence.retokenize(split_rules=[lambda x: x.split('_')])
+        tokens = sentence.tokens
+        self.assertEqual(['a', 'b', 'c'], [x.text for x in tokens])
+        self.assertEqual([None, None, None],
+                         [x.dependency_head_ix for x in tokens])
+
+    def test_merge_entities_with_shared_head(self):
+        # "visit Paris London", both entities hang from "visit"
+        sentence = Sentence(tokens=[
+            Token('visit', lemma='visit', ix=0, dependency_head_ix=0,
+                  dependency_type='ROOT'),
+            Token('Paris', lemma='Paris', ix=1, dependency_head_ix=0,
+                  dependency_type='dobj', is_entity=True,
+                  entity_type='GPE'),
+            Token('London', lemma='London', ix=2, dependency_head_ix=0,
+                  dependency_type='appos', is_entity=True,
+                  entity_type='GPE'),
+        ])
+        sentence.retokenize(merge_rules=[Sentence.get_entity_spans])
+        tokens = sentence.tokens
+        self.assertEqual(['visit', 'Paris London'], [x.text for x in tokens])
+        self.assertEqual([0, 0], [x.dependency_head_ix for x in tokens])
+        self.assertEqual('dobj', tokens[1].dependency_type)
+
 
 class TestMergeTokens(unittest.TestCase):
 
+    def test_does_not_change_input(self):
+        tokens = [
+            Token('the', pos='DET', lemma='the', is_entity=True,
+                  entity_type='ORG', ix=0, dependency_head_ix=1),
+            Token('Lakers', pos='PROPN', lemma='Laker', is_entity=True,
+                  entity_type='ORG', ix=1),
+        ]
+        det, lakers = merge_tokens(tokens)
+        self.assertEqual(2, len(tokens))
+        self.assertTrue(tokens[0].is_entity)
+        self.assertFalse(det.is_entity)
+        self.assertEqual('Lakers', lakers.text)
+
+    def test_missing_lemmas(self):
+        # as read from CoNLL-U, where a lemma may be `_`
+        merged = merge_tokens([
+            Token('New', lemma=None, ix=0, dependency_head_ix=1),
+            Token('York', lemma='York', ix=1, dependency_head_ix=1),
+        ])
+        self.assertEqual('York', merged[0].lemma)
+        merged = merge_tokens([
+            Token('New', lemma=None, ix=0, dependency_head_ix=1),
+            Token('York', lemma=None, ix=1, dependency_head_ix=1),
+        ])
+        self.assertIsNone(merged[0].lemma)
+
     def test_merge_tokens_case_1_do_not_merge_det(self):
         tokens = [
             Token('the', 'DET', 'the', False, '', False, False, 0, 1, 'det'),
@@ -0,0 +1,85 @@
+import dill
+import unittest
+
+from data_structures import nlp_binary
+from data_structures.nlp import Document, Paragraph, Sentence, Token
+
+
+def get_document() -> Document:
+    return Document(paragraphs=[
+        Paragraph(sentences=[
+            Sentence(tokens=[
+                Token('I', start_char_ix=0, pos='PRON', lemma='I', ix=0,
+                      dependency_head_ix=1, dependency_type='nsubj',
+                      is_stop=True),
+                Token('saw', start_char_ix=2, pos='VERB', lemma='see', ix=1,
+                      dependency_type='root', is_stop=False),
+                Token('台北', start_char_ix=6, pos='PROPN', lemma='台北', ix=2,
+                      dependency_head_ix=1, dependency_type='dobj',
+                      is_entity=True, entity_type='GPE'),
+            ]),
+            Sentence(tokens=[
+                Token('#tbt', pos='X', ix=0, is_hashtag=True),
+            ]),
+        ]),
+        Paragraph(sentences=[]),
+        Paragraph(sentences=[
+            Sentence(tokens=[
+                Token('https://t.co/x', is_url=True, ix=0),
+            ]),
+        ]),
+    ])
+
+
+class TestBinaryFormat(unittest.TestCase):
+
+    def test_document_round_trip(self):
+        document = get_document()
+        _document = nlp_binary.loads(nlp_binary.dumps(document))
+        self.assertIsInstance(_document, Document)
+        self.assertEqual([len(x.sentences) for x in document.paragraphs],
+                         [len(x.sentences) for x in _document.paragraphs])
+        self.assertEqual(document.tokens, _document.tokens)
+        self.assertEqual(document.get_noun_phrases(),
+                         _document.get_noun_phrases())
+        self.assertEqual(document.get_verb_phrases(),
+                         _document.get_verb_phrases())
+
+    def test_round_trip_of_each_kind(self):
+        document = get_document()
+        paragraph = document.paragraphs[0]
+        sentence = paragraph.sentences[0]
+        token = sentence[2]
+
+        _paragraph = nlp_binary.loads(nlp_binary.dumps(paragraph))
+        self.assertIsInstance(_paragraph, Paragraph)
+        self.assertEqual(paragraph.tokens, _paragraph.tokens)
+
+        _sentence = nlp_binary.loads(nlp_binary.dumps(sentence))
+        self.assertIsInstance(_sentence, Sentence)
+        self.assertEqual(sentence.tokens, _sentence.tokens)
+        self.assertEqual(sentence.children, _sentence.children)
+
+        self.assertEqual(token, nlp_binary.loads(nlp_binary.dumps(token)))
+
+    def test_smaller_than_dill(self):
+        document = get_document()
+        self.assertLess(len(nlp_binary.dumps(document)),
+                        len(dill.dumps(document)))
+
+    def test_reader_decodes_single_sentence(self):
+        document = get_document()
+        reader = nlp_binary.Reader(nlp_binary.dumps(document))
+        self.assertEqual(3, reader.num_paragraphs)
+        self.assertEqual(3, reader.num_sentences)
+        self.assertEqual(range(2, 3), reader.paragraph_sentence_ixs(2))
+        self.assertEqual(document.sentences[1].tokens,
+                         reader.sentence(1).tokens)
+
+    def test_rejects_unknown_data(self):
+        data = bytearray(nlp_binary.dumps(Token('x')))
+        with self.assertRaises(ValueError):
+            nlp_binary.loads(b'XXXX' + bytes(data[4:]))
+        data[4] = nlp_binary.VERSION + 1
+        with self.assertRaises(ValueError):
+            nlp_binary.loads(bytes(data))
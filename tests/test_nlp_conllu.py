@@ -0,0 +1,84 @@
+import io
+import unittest
+
+from data_structures.nlp import Document, Paragraph, Sentence, Token, \
+    TreeIndex
+from data_structures.nlp_conllu import iter_documents, write_conllu
+
+
+CONLLU = '''# newdoc id = a
+# newpar
+# sent_id = 1
+# text = I saw Taipei's cats.
+1\tI\tI\tPRON\tPRP\t_\t2\tnsubj\t_\tTokenRange=0:1
+2\tsaw\tsee\tVERB\tVBD\t_\t0\troot\t_\tTokenRange=2:5
+3-4\tTaipei's\t_\t_\t_\t_\t_\t_\t_\t_
+3\tTaipei\tTaipei\tPROPN\tNNP\t_\t5\tnmod:poss\t_\tNER=B-GPE
+4\t's\t's\tPART\tPOS\t_\t3\tcase\t_\tNER=O
+5\tcats\tcat\tNOUN\tNNS\t_\t2\tobj\t_\t_
+6\t.\t.\tPUNCT\t.\t_\t2\tpunct\t_\tStop=No
+
+# newdoc id = b
+1\t#hi\t_\tX\t_\t_\t0\troot\t_\tHashtag=Yes
+
+'''
+
+
+class TestConllu(unittest.TestCase):
+
+    def test_read(self):
+        first, second = iter_documents(io.StringIO(CONLLU))
+        sentence = first.sentences[0]
+        self.assertEqual("I saw Taipei 's cats .", sentence.text)
+        self.assertEqual(
+            Token('I', start_char_ix=0, pos='PRON', lemma='I', ix=1,
+                  dependency_head_ix=2, dependency_type='nsubj'),
+            sentence[0])
+        self.assertIsNone(sentence[1].dependency_head_ix)
+        self.assertEqual(['Taipei'], [x.text for x in sentence.entities])
+        self.assertEqual('GPE', sentence[2].entity_type)
+        self.assertFalse(sentence[3].is_entity)
+        self.assertFalse(sentence[5].is_stop)
+        self.assertEqual(['#hi'], [x.text for x in second.hashtags])
+
+    def test_tree_built_while_reading(self):
+        document, _ = iter_documents(io.StringIO(CONLLU))
+        sentence = document.sentences[0]
+        self.assertIsNotNone(sentence._tree)
+        expected = TreeIndex.from_table(sentence.table)
+        self.assertEqual(expected.children, sentence.children)
+        self.assertEqual(expected.dep2ixs, sentence.dep2ixs)
+        self.assertEqual(expected.spans, sentence.tree.spans)
+        document, _ = iter_documents(
+            io.StringIO(CONLLU), build_tree=False)
+        self.assertIsNone(document.sentences[0]._tree)
+
+    def test_round_trip(self):
+        documents = list(iter_documents(io.StringIO(CONLLU)))
+        f = io.StringIO()
+        write_conllu(documents, f)
+        f.seek(0)
+        self.assertEqual(
+            [[x.tokens for x in d.sentences] for d in documents],
+            [[x.tokens for x in d.sentences] for d in iter_documents(f)])
+
+    def test_write_maps_heads_to_ids(self):
+        # spacy style: ix offset in the document, the root its own head
+        document = Document(paragraphs=[Paragraph(sentences=[
+            Sentence(tokens=[
+                Token('hi', ix=7, dependency_head_ix=7,
+                      dependency_type='ROOT'),
+                Token('there', ix=8, dependency_head_ix=7,
+                      dependency_type='advmod'),
+            ]),
+        ])])
+        f = io.StringIO()
+        write_conllu([document], f)
+        rows = [x.split('\t') for x in f.getvalue().splitlines()
+                if x and x[0] != '#']
+        self.assertEqual([['1', '0'], ['2', '1']],
+                         [[x[0], x[6]] for x in rows])
+
+    def test_invalid_row(self):
+        with self.assertRaises(ValueError):
+            list(iter_documents(io.StringIO('1\tI\tI\n')))
@@ -0,0 +1,138 @@
+from collections import Counter
+import io
+import pickle
+import random
+import unittest
+
+from data_structures.nlp import Document, Paragraph, Sentence, Token
+from data_structures.nlp_counter import count_phrases, PhraseCounter
+from tests.helpers import get_cat_sentence
+
+
+def get_document() -> Document:
+    return Document(paragraphs=[Paragraph(sentences=[
+        get_cat_sentence('Cat'),
+        Sentence(tokens=[
+            Token('#cats', ix=0, is_hashtag=True),
+            Token('@bob', ix=1, is_mention=True),
+            Token('Taipei', ix=2, is_entity=True),
+        ]),
+    ])])
+
+
+class TestPhraseCounter(unittest.TestCase):
+
+    def test_count(self):
+        counter = count_phrases(
+            [get_document(), get_document()],
+            kinds=['np', 'ngram', 'hashtag', 'mention', 'entity'])
+        self.assertEqual(2, counter.count('np', 'Cat in a hat'))
+        self.assertEqual(4, counter.count('ngram', 'a Cat')
+                         + counter.count('ngram', 'a hat'))
+        self.assertEqual(2, counter.count('hashtag', '#cats'))
+        self.assertEqual(2, counter.count('mention', '@bob'))
+        self.assertEqual(2, counter.count('entity', 'Taipei'))
+        self.assertEqual(0, counter.count('ngram', 'hat #cats'))
+        with self.assertRaises(ValueError):
+            counter.count('vp', 'saw a Cat')
+        with self.assertRaises(ValueError):
+            PhraseCounter(kinds=['pp'])
+
+    def test_lower(self):
+        counter = count_phrases([get_document()], kinds=['ngram'], n=3,
+                                lower=True)
+        self.assertEqual(1, counter.count('ngram', 'saw a cat'))
+        self.assertEqual(1, counter.count('ngram', 'SAW A CAT'))
+
+    def test_most_common_and_prune(self):
+        counter = PhraseCounter(kinds=['ngram'])
+        for phrase, count in [('a', 1), ('b', 3), ('c', 2), ('d', 3)]:
+            counter.add('ngram', phrase, count)
+        self.assertEqual([('b', 3), ('d', 3)],
+                         counter.most_common('ngram', 2))
+        self.assertEqual(['b', 'd', 'c', 'a'],
+                         [x for x, _ in counter.most_common('ngram')])
+        counter.prune(2)
+        self.assertEqual(3, len(counter))
+        self.assertEqual(0, counter.count('ngram', 'a'))
+        self.assertEqual(2, counter.count('ngram', 'c'))
+        counter.add('ngram', 'a')
+        self.assertEqual(1, counter.count('ngram', 'a'))
+
+    def test_max_size(self):
+        counter = PhraseCounter(kinds=['ngram'], max_size=4)
+        counter.add('ngram', 'common', 10)
+        for i in range(20):
+            counter.add('ngram', str(i))
+        self.assertLessEqual(len(counter), 4)
+        self.assertEqual(10, counter.count('ngram', 'common'))
+        self.assertEqual((10, 10), counter.bounds('ngram', 'common'))
+
+    def test_max_size_bounds(self):
+        # a phrase that keeps coming back among many that never do
+        rng = random.Random(1234)
+        counter = PhraseCounter(kinds=['ngram'], max_size=4)
+        exact = Counter()
+        for i in range(10):
+            for phrase in ['X'] + [f'{i}-{j}' for j in range(4)]:
+                counter.add('ngram', phrase)
+                exact[phrase] += 1
+        for _ in range(2000):
+            phrase = str(int(rng.paretovariate(1.2)))
+            counter.add('ngram', phrase)
+            exact[phrase] += 1
+        self.assertLessEqual(len(counter), 4)
+        for phrase, count in exact.items():
+            low, high = counter.bounds('ngram', phrase)
+            self.assertLessEqual(low, count)
+            self.assertLessEqual(count, high)
+            self.assertLessEqual(high, low + counter.errors['ngram'])
+
+    def test_merge_bounds(self):
+        exact = Counter()
+        counters = []
+        for seed in range(2):
+            rng = random.Random(seed)
+            counter = PhraseCounter(kinds=['ngram'], max_size=8)
+            for _ in range(500):
+                phrase = str(int(rng.paretovariate(1.5)))
+                counter.add('ngram', phrase)
+                exact[phrase] += 1
+            counters.append(counter)
+        merged = counters[0].merge(counters[1])
+        for phrase, count in exact.items():
+            low, high = merged.bounds('ngram', phrase)
+            self.assertLessEqual(low, count)
+            self.assertLessEqual(count, high)
+
+    def test_merge(self):
+        documents = [get_document(), get_document(), get_document()]
+        kinds = ['np', 'vp', 'ngram']
+        expected = count_phrases(documents, kinds=kinds)
+        first = count_phrases(documents[:1], kinds=kinds)
+        second = count_phrases(documents[1:], kinds=['ngram'])
+        second = pickle.loads(pickle.dumps(second))
+        first.merge(second)
+        self.assertEqual(expected.most_common('ngram'),
+                         first.most_common('ngram'))
+        self.assertEqual(1, first.count('np', 'Cat in a hat'))
+        with self.assertRaises(ValueError):
+            first.merge(PhraseCounter(n=3))
+
+    def test_save_and_load(self):
+        counter = count_phrases(
+            [get_document()], kinds=['np', 'ngram'], lower=True, max_size=8)
+        f = io.BytesIO()
+        counter.save(f)
+        f.seek(0)
+        loaded = PhraseCounter.load(f)
+        self.assertEqual(counter.kinds, loaded.kinds)
+        self.assertTrue(loaded.lower)
+        self.assertEqual(8, loaded.max_size)
+        self.assertEqual(counter.errors, loaded.errors)
+        self.assertEqual(counter.deltas, loaded.deltas)
+        for kind in counter.kinds:
+            self.assertEqual(counter.most_common(kind),
+                             loaded.most_common(kind))
+        loaded.add('ngram', 'Cat In')
+        self.assertEqual(2, loaded.count('ngram', 'cat in'))
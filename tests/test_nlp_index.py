@@ -0,0 +1,61 @@
+import io
+import unittest
+
+from data_structures.nlp import Document, Paragraph, Sentence, Token
+from data_structures.nlp_index import build_index, CorpusIndex, Posting
+
+
+def get_document(city: str) -> Document:
+    return Document(paragraphs=[
+        Paragraph(sentences=[
+            Sentence(tokens=[
+                Token('@bob', lemma='@bob', is_mention=True),
+                Token('loves', lemma='love'),
+                Token(city, lemma=city, is_entity=True, entity_type='GPE'),
+            ]),
+            Sentence(tokens=[
+                Token('#travel', lemma='#travel', is_hashtag=True),
+                Token('loved', lemma='love'),
+            ]),
+        ]),
+    ])
+
+
+class TestCorpusIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = build_index(
+            [get_document('Taipei'), get_document('Tokyo')])
+
+    def test_lookup(self):
+        self.assertEqual(2, len(self.index))
+        self.assertEqual(
+            [Posting(0, 0, 1), Posting(0, 1, 1),
+             Posting(1, 0, 1), Posting(1, 1, 1)],
+            self.index.lookup('lemma', 'love'))
+        self.assertEqual([Posting(1, 0, 2)],
+                         self.index.lookup('text', 'Tokyo'))
+        self.assertEqual(2, self.index.count('entity_type', 'GPE'))
+        self.assertEqual([0, 1], self.index.doc_ids('hashtag', '#travel'))
+        self.assertEqual([0, 1], self.index.doc_ids('mention', '@bob'))
+        self.assertEqual([], self.index.lookup('text', 'Osaka'))
+        with self.assertRaises(ValueError):
+            self.index.lookup('pos', 'NOUN')
+
+    def test_incremental(self):
+        doc_id = self.index.add(get_document('Taipei'))
+        self.assertEqual(2, doc_id)
+        self.assertEqual([0, 2], self.index.doc_ids('text', 'Taipei'))
+
+    def test_save_and_load(self):
+        f = io.BytesIO()
+        self.index.save(f)
+        f.seek(0)
+        index = CorpusIndex.load(f)
+        self.assertEqual(2, len(index))
+        for field in ['text', 'lemma', 'entity_type', 'hashtag', 'mention']:
+            self.assertEqual(list(self.index.iter_terms(field)),
+                             list(index.iter_terms(field)))
+            for term in self.index.iter_terms(field):
+                self.assertEqual(self.index.lookup(field, term),
+                                 index.lookup(field, term))
@@ -0,0 +1,55 @@
+import unittest
+
+from data_structures.nlp import Document, Paragraph, Sentence, Token
+from data_structures.nlp_parallel import extract_phrases, PhraseSpan
+from tests.helpers import get_cat_sentence
+
+
+def get_documents():
+    return [
+        Document(paragraphs=[
+            Paragraph(sentences=[get_cat_sentence()]),
+            Paragraph(sentences=[Sentence(tokens=[Token('hi', ix=0)]),
+                                 get_cat_sentence()]),
+        ]),
+        Document(paragraphs=[]),
+        Document(paragraphs=[Paragraph(sentences=[get_cat_sentence()])]),
+    ]
+
+
+def get_expected(documents, det=False):
+    expected = []
+    for doc_id, document in enumerate(documents):
+        for sentence_ix, sentence in enumerate(document.sentences):
+            for left, right in sentence.get_noun_phrase_spans(det=det):
+                expected.append(
+                    PhraseSpan(doc_id, sentence_ix, left, right, 'np'))
+            for left, right in sentence.get_verb_phrase_spans():
+                expected.append(
+                    PhraseSpan(doc_id, sentence_ix, left, right, 'vp'))
+    return expected
+
+
+class TestExtractPhrases(unittest.TestCase):
+
+    def test_in_process(self):
+        documents = get_documents()
+        result = list(extract_phrases(documents, workers=1, chunksize=2))
+        self.assertEqual(get_expected(documents), result)
+        self.assertIn(PhraseSpan(0, 0, 3, 6, 'np'), result)
+
+    def test_with_pool(self):
+        documents = get_documents() * 5
+        result = list(extract_phrases(
+            iter(documents), workers=2, chunksize=2, det=True))
+        self.assertEqual(get_expected(documents, det=True), result)
+
+    def test_single_kind(self):
+        documents = get_documents()
+        result = list(extract_phrases(documents, kinds=['vp'], workers=1))
+        self.assertEqual([x for x in get_expected(documents)
+                          if x.kind == 'vp'], result)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            list(extract_phrases(get_documents(), kinds=['pp']))
@@ -0,0 +1,66 @@
+import random
+import unittest
+
+from data_structures.nlp import Sentence, Token
+from data_structures.nlp_patterns import get_noun_phrase_patterns, \
+    get_verb_phrase_patterns, Match, Matcher, Pattern
+from tests.helpers import get_random_sentence
+
+
+def get_sentence() -> Sentence:
+    return Sentence(tokens=[
+        Token('Alice', ix=1, dependency_head_ix=2, dependency_type='nsubj',
+              pos='PROPN', is_entity=True),
+        Token('saw', ix=2, dependency_head_ix=None, dependency_type='root',
+              pos='VERB'),
+        Token('a', ix=3, dependency_head_ix=4, dependency_type='det'),
+        Token('cat', ix=4, dependency_head_ix=2, dependency_type='dobj',
+              pos='NOUN'),
+        Token('in', ix=5, dependency_head_ix=4, dependency_type='prep'),
+        Token('Taipei', ix=6, dependency_head_ix=5, dependency_type='pobj',
+              pos='PROPN', is_entity=True),
+    ])
+
+
+class TestMatcher(unittest.TestCase):
+
+    def test_phrase_patterns_match_sentence(self):
+        rng = random.Random(4321)
+        sentences = [get_random_sentence(rng) for _ in range(1000)]
+        for det in [False, True]:
+            matcher = Matcher(get_noun_phrase_patterns(det=det, max_len=5)
+                              + get_verb_phrase_patterns(max_len=5))
+            for sentence in sentences:
+                spans = matcher.match_spans(sentence)
+                self.assertEqual(
+                    sentence.get_noun_phrase_spans(det=det, max_len=5),
+                    spans['np'])
+                self.assertEqual(
+                    sentence.get_verb_phrase_spans(max_len=5), spans['vp'])
+
+    def test_token_and_head_constraints(self):
+        matcher = Matcher([
+            Pattern('subject', dependency_type='nsubj', is_entity=True,
+                    head_pos='VERB', span='token'),
+            Pattern('place', pos='PROPN', head_dependency_type='prep',
+                    span='token'),
+            Pattern('entity', is_entity=True, span='token'),
+            Pattern('object', dependency_type=['nsubj', 'dobj'],
+                    head_is_entity=False),
+        ])
+        self.assertEqual([
+            Match('subject', 0, 0, 0),
+            Match('place', 5, 5, 5),
+            Match('entity', 0, 0, 0),
+            Match('entity', 5, 5, 5),
+            Match('object', 3, 2, 5),
+        ], matcher.match(get_sentence()))
+
+    def test_no_matches(self):
+        matcher = Matcher([Pattern('verb', pos='VERB', head_pos='NOUN')])
+        self.assertEqual({'verb': []}, matcher.match_spans(get_sentence()))
+        self.assertEqual([], matcher.match(Sentence(tokens=[])))
+
+    def test_unknown_span(self):
+        with self.assertRaises(ValueError):
+            Matcher([Pattern('x', span='sentence')])
@@ -0,0 +1,96 @@
+import dill
+import os
+import tempfile
+import unittest
+
+from data_structures import nlp_binary
+from data_structures.nlp import Document, Paragraph, Sentence, Token
+from data_structures.nlp_store import DocumentStore, LazySentence, \
+    StoreWriter, write_store
+
+
+def get_document(word: str) -> Document:
+    return Document(paragraphs=[
+        Paragraph(sentences=[
+            Sentence(tokens=[
+                Token(word, pos='NOUN', ix=0, dependency_type='root'),
+                Token('#' + word, ix=1, dependency_head_ix=0,
+                      is_hashtag=True),
+            ]),
+            Sentence(tokens=[
+                Token('ok', ix=0, dependency_type='root'),
+            ]),
+        ]),
+    ])
+
+
+class TestDocumentStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'corpus.bin')
+        self.documents = [get_document(x) for x in ['cat', 'hat', 'bat']]
+        write_store(self.path, self.documents)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_read_documents(self):
+        with DocumentStore(self.path) as store:
+            self.assertEqual(3, len(store))
+            for document, _document in zip(self.documents, store):
+                self.assertEqual(document.tokens, _document.tokens)
+                self.assertEqual(document.text, _document.text)
+            self.assertEqual(self.documents[2].tokens, store[-1].tokens)
+            self.assertEqual(['#hat', '#bat'],
+                             [x.hashtags[0].text for x in store[1:]])
+            with self.assertRaises(IndexError):
+                store[3]
+
+    def test_sentences_decoded_on_access(self):
+        with DocumentStore(self.path) as store:
+            document = store[1]
+            first, second = document.sentences
+            self.assertIsInstance(first, LazySentence)
+            self.assertEqual(2, len(first))
+            self.assertEqual(3, len(document))
+            self.assertFalse(first.is_decoded)
+            self.assertEqual('hat #hat', first.text)
+            self.assertTrue(first.is_decoded)
+            self.assertFalse(second.is_decoded)
+
+    def test_lazy_sentence_pickles_as_sentence(self):
+        with DocumentStore(self.path) as store:
+            sentence = store[0].sentences[0]
+            _sentence = dill.loads(dill.dumps(sentence))
+            self.assertIs(Sentence, type(_sentence))
+            self.assertEqual(sentence.tokens, _sentence.tokens)
+
+    def test_encode_sentences_read_from_store(self):
+        with DocumentStore(self.path) as store:
+            document = store[1]
+            sentence = document.sentences[0]
+            _sentence = nlp_binary.loads(nlp_binary.dumps(sentence))
+            self.assertIs(Sentence, type(_sentence))
+            self.assertEqual(sentence.tokens, _sentence.tokens)
+            _document = nlp_binary.loads(nlp_binary.dumps(document))
+            self.assertEqual(self.documents[1], _document)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a store at all, really not')
+        with self.assertRaises(ValueError):
+            DocumentStore(self.path)
+        for data in [b'', b'DSNS']:
+            with open(self.path, 'wb') as f:
+                f.write(data)
+            with self.assertRaises(ValueError):
+                DocumentStore(self.path)
+
+    def test_failed_write_reads_as_truncated(self):
+        with self.assertRaises(RuntimeError):
+            with StoreWriter(self.path) as writer:
+                writer.add(self.documents[0])
+                raise RuntimeError('interrupted')
+        with self.assertRaisesRegex(ValueError, 'truncated'):
+            DocumentStore(self.path)
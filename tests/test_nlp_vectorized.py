@@ -0,0 +1,46 @@
+import random
+import unittest
+
+from data_structures.nlp_vectorized import SentenceBatch, to_lists
+from tests.helpers import get_random_sentence
+
+
+class TestSentenceBatch(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(1234)
+        self.sentences = [get_random_sentence(rng) for _ in range(2000)]
+
+    def test_noun_phrases_match_sentence(self):
+        batch = SentenceBatch(self.sentences)
+        for det in [False, True]:
+            for max_len in [3, 10]:
+                expected = [
+                    x.get_noun_phrase_spans(det=det, max_len=max_len)
+                    for x in self.sentences]
+                result = to_lists(
+                    batch.get_noun_phrase_spans(det=det, max_len=max_len),
+                    len(self.sentences))
+                self.assertEqual(expected, result)
+
+    def test_verb_phrases_match_sentence(self):
+        batch = SentenceBatch(self.sentences)
+        for max_len in [3, 10]:
+            expected = [x.get_verb_phrase_spans(max_len=max_len)
+                        for x in self.sentences]
+            result = to_lists(
+                batch.get_verb_phrase_spans(max_len=max_len),
+                len(self.sentences))
+            self.assertEqual(expected, result)
+
+    def test_found_phrases(self):
+        # make sure the comparison above is not trivially empty
+        batch = SentenceBatch(self.sentences)
+        self.assertGreater(len(batch.get_noun_phrase_spans()[0]), 100)
+        self.assertGreater(len(batch.get_verb_phrase_spans()[0]), 100)
+        self.assertTrue(batch.fallback.any())
+        self.assertFalse(batch.fallback.all())
+
+    def test_empty_batch(self):
+        batch = SentenceBatch([])
+        self.assertEqual([], to_lists(batch.get_noun_phrase_spans(), 0))
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from data_structures.record_store import RecordStore, RecordWriter, \
+    write_records
+from data_structures.twitter import Tweet
+from data_structures.youtube import YouTubeChannel, YouTubeVideo, \
+    YouTubeVideoStats
+from tests.helpers import get_tweet
+
+
+def get_tweets(num_tweets: int = 10):
+    return [
+        get_tweet(i, text=f'tweet {i}', author_id=i % 3, conversation_id=1,
+                  created_at=datetime(2021, 1, 1) + timedelta(hours=i),
+                  in_reply_to_user_id=None if i % 2 else 7,
+                  lang='en' if i % 4 else None, is_reply=i % 2 == 0,
+                  author_verified=None if i == 3 else True)
+        for i in range(num_tweets)]
+
+
+class TestRecordStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'records.bin')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        tweets = get_tweets()
+        tweets[1]['source'] = 'web'
+        for compression in ['none', 'zlib', 'lzma']:
+            write_records(self.path, tweets, row_group_size=4,
+                          compression=compression)
+            with RecordStore(self.path) as store:
+                self.assertIs(Tweet, store.cls)
+                self.assertEqual(10, len(store))
+                self.assertEqual(3, len(store.row_groups))
+                self.assertEqual(tweets, list(store))
+
+    def test_nested_and_aware(self):
+        video = YouTubeVideo(
+            id='1', channel_id='1',
+            created_at=datetime(2021, 1, 1, tzinfo=timezone.utc),
+            title='title1', description='description1',
+            channel=YouTubeChannel(id='1', title='1'),
+            stats=[YouTubeVideoStats(
+                video_id='1', collected_at=datetime(2021, 11, 12),
+                num_views=1, num_likes=2, num_comments=3)])
+        write_records(self.path, [video])
+        with RecordStore(self.path) as store:
+            loaded, = store
+        self.assertEqual(video, loaded)
+        self.assertIsInstance(loaded.stats[0], YouTubeVideoStats)
+
+    def test_projection_and_predicates(self):
+        write_records(self.path, get_tweets(), row_group_size=4)
+        with RecordStore(self.path) as store:
+            where = {'created_at': (datetime(2021, 1, 1, 5), None)}
+            self.assertEqual([1, 2], store.get_row_groups(where))
+            records = list(store.iter_records(['id', 'lang'], where))
+            self.assertEqual([5, 6, 7, 8, 9], [x.id for x in records])
+            self.assertEqual(['id', 'lang'], list(records[0]))
+            self.assertEqual([], store.get_row_groups(
+                {'author_id': (3, None)}))
+            self.assertEqual([5, 6, 7], [x.id for x in store.iter_records(
+                ['id'], {'id': (4, 8), 'lang': ('en', 'eo')})])
+            with self.assertRaises(ValueError):
+                store.get_row_groups({'tags': (None, 1)})
+
+    def test_read_arrays(self):
+        write_records(self.path, get_tweets(), row_group_size=4)
+        with RecordStore(self.path) as store:
+            arrays = store.read_arrays(
+                ['id', 'created_at', 'in_reply_to_user_id', 'text'],
+                {'id': (2, 6)})
+        self.assertEqual([2, 3, 4, 5], arrays['id'].tolist())
+        self.assertEqual(np.dtype('datetime64[us]'),
+                         arrays['created_at'].dtype)
+        self.assertEqual([7, None, 7, None],
+                         arrays['in_reply_to_user_id'].tolist())
+        self.assertEqual('tweet 3', arrays['text'][1])
+
+    def test_not_a_store(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\x00' * 64)
+        with self.assertRaises(ValueError):
+            RecordStore(self.path)
+        for data in [b'', b'DSRS']:
+            with open(self.path, 'wb') as f:
+                f.write(data)
+            with self.assertRaisesRegex(ValueError, 'Not a record store'):
+                RecordStore(self.path)
+
+    def test_failed_write_reads_as_truncated(self):
+        with self.assertRaises(RuntimeError):
+            with RecordWriter(self.path, Tweet, row_group_size=4) as writer:
+                for tweet in get_tweets():
+                    writer.add(tweet)
+                raise RuntimeError('interrupted')
+        with self.assertRaisesRegex(ValueError, 'truncated'):
+            RecordStore(self.path)
@@ -30,7 +30,33 @@ class TestTokenSerialization(unittest.TestCase):
 class TestSentence(unittest.TestCase):
 
     def test_serialization(self):
-        pass
+        tokens = [
+            Token('I', ix=0, dependency_head_ix=1, dependency_type='nsubj',
+                  pos='PRON'),
+            Token('saw', ix=1, dependency_head_ix=None, dependency_type='root',
+                  pos='VERB'),
+            Token('LA', ix=2, dependency_head_ix=1, dependency_type='dobj',
+                  pos='PROPN', is_entity=True, entity_type='CITY'),
+        ]
+        sentence = Sentence(tokens=tokens)
+        _sentence = dill.loads(sentence.serialize())
+
+        self.assertEqual(tokens, _sentence.tokens)
+        self.assertEqual(sentence.children, _sentence.children)
+        self.assertEqual(sentence.dep2ixs, _sentence.dep2ixs)
+
+    def test_deserialize_token_list_state(self):
+        # dills from before the columnar table held a list of tokens
+        tokens = [
+            Token('I', ix=0, dependency_head_ix=1, dependency_type='nsubj'),
+            Token('saw', ix=1, dependency_head_ix=None,
+                  dependency_type='root'),
+        ]
+        sentence = Sentence.__new__(Sentence)
+        sentence.__setstate__({'tokens': tokens})
+
+        self.assertEqual(tokens, sentence.tokens)
+        self.assertEqual({0: [], 1: [0]}, sentence.children)
 
 
 class TestDocument(unittest.TestCase):
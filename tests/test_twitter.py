@@ -0,0 +1,97 @@
+import json
+import pickle
+import unittest
+
+from data_structures.twitter import TwitterUser, UserRegistry
+from tests.helpers import get_tweet
+
+
+class TestUserRegistry(unittest.TestCase):
+
+    def test_link(self):
+        tweet = get_tweet(1, author_name='Alice', author_username='alice',
+                          author_description='a long description')
+        copy = get_tweet(1, author_name='Alice', author_username='alice',
+                         author_description='a long description')
+        users = UserRegistry()
+        users.link(tweet)
+        self.assertTrue(tweet.is_linked)
+        self.assertEqual(['alice'], [x.username for x in users])
+        # the fields now come from the registry, but read the same
+        self.assertEqual('Alice', tweet.author_name)
+        self.assertEqual('alice', tweet['author_username'])
+        self.assertIsNone(tweet.author_location)
+        self.assertEqual(list(copy), list(tweet))
+        self.assertEqual(copy, tweet)
+        self.assertEqual(copy.to_json(), tweet.to_json())
+        self.assertEqual(copy, pickle.loads(pickle.dumps(tweet)))
+        # changing the author changes every linked Tweet
+        users[1].location = 'Taipei'
+        self.assertEqual('Taipei', tweet.author_location)
+        users.unlink(tweet)
+        self.assertFalse(tweet.is_linked)
+        self.assertEqual('Taipei', tweet.author_location)
+
+    def test_link_without_author_fields(self):
+        users = UserRegistry([TwitterUser(
+            id=1, name='Alice', username='alice', verified=True,
+            created_at=None)])
+        tweets = list(users.link_all([get_tweet(1), get_tweet(2)]))
+        self.assertEqual([True, True], [x.author_verified for x in tweets])
+        self.assertEqual(1, len(users))
+        # unknown authors read as None
+        tweet = UserRegistry().link(get_tweet(3))
+        self.assertIsNone(tweet.author_name)
+        with self.assertRaises(ValueError):
+            users.link(tweet)
+
+    def test_link_keeps_diverging_author_fields(self):
+        old = get_tweet(1, author_id=7, author_name='Alice',
+                        author_description='old bio')
+        new = get_tweet(2, author_id=7, author_name='Alice',
+                        author_description='new bio')
+        users = UserRegistry()
+        users.link(old)
+        users.link(new)
+        self.assertEqual('old bio', users[7].description)
+        self.assertEqual('new bio', new.author_description)
+        self.assertEqual('new bio', json.loads(new.to_json())[
+            'author_description'])
+        # the fields that agree are still read from the registry
+        users[7].name = 'Alicia'
+        self.assertEqual('Alicia', new.author_name)
+        users.unlink(new)
+        self.assertEqual('new bio', new.author_description)
+
+    def test_link_without_author_id(self):
+        tweet = get_tweet(1, author_name='Alice')
+        tweet.author_id = None
+        users = UserRegistry()
+        self.assertIs(tweet, users.link(tweet))
+        self.assertFalse(tweet.is_linked)
+        self.assertEqual('Alice', tweet.author_name)
+        self.assertEqual(0, len(users))
+
+    def test_delete_linked_author_field(self):
+        users = UserRegistry()
+        first = users.link(get_tweet(1, author_name='Alice',
+                                     author_username='alice'))
+        second = users.link(get_tweet(2))
+        self.assertIn('author_name', first)
+        del first['author_name']
+        self.assertNotIn('author_name', first)
+        self.assertFalse(first.is_linked)
+        self.assertEqual('alice', first.author_username)
+        # only the one Tweet lost the field
+        self.assertEqual('Alice', second.author_name)
+        self.assertEqual('Alice', users[1].name)
+
+    def test_add_fills_missing_fields(self):
+        users = UserRegistry()
+        user = users.add(TwitterUser(
+            id=1, name='Alice', username='alice', verified=None,
+            created_at=None))
+        self.assertIs(user, users.add(TwitterUser(
+            id=1, name='Bob', username='bob', verified=True,
+            created_at=None)))
+        self.assertEqual(('Alice', True), (user.name, user.verified))
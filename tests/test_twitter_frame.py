@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+import unittest
+
+import numpy as np
+
+from data_structures.twitter_frame import TweetFrame
+from tests.helpers import get_tweet
+
+
+def get_tweets():
+    langs = ['en', 'zh', None, 'en', 'ja', 'en']
+    return [
+        get_tweet(i, text=f'tweet {i}', author_id=i % 2, conversation_id=1,
+                  created_at=datetime(2021, 1, 1 + i // 2, i),
+                  in_reply_to_user_id=None if i % 3 else 7, lang=lang,
+                  is_reply=i % 3 == 0, is_retweet=i == 4,
+                  author_verified=None if i == 5 else False)
+        for i, lang in enumerate(langs)]
+
+
+class TestTweetFrame(unittest.TestCase):
+
+    def test_round_trip(self):
+        tweets = get_tweets()
+        frame = TweetFrame.from_tweets(tweets)
+        self.assertEqual(6, len(frame))
+        self.assertEqual(np.int64, frame['created_at'].dtype)
+        self.assertEqual(tweets, frame.to_tweets())
+        self.assertEqual([], TweetFrame.from_tweets([]).to_tweets())
+
+    def test_aware_datetimes(self):
+        tweet = get_tweets()[0]
+        tweet.created_at = datetime(
+            2021, 1, 1, 8, tzinfo=timezone(timedelta(hours=8)))
+        result, = TweetFrame.from_tweets([tweet]).to_tweets()
+        self.assertEqual(datetime(2021, 1, 1, tzinfo=timezone.utc),
+                         result.created_at)
+
+    def test_filter(self):
+        frame = TweetFrame.from_tweets(get_tweets())
+        mask = frame.equals('lang', 'en') \
+            & frame.between('created_at', datetime(2021, 1, 2)) \
+            & ~frame.equals('is_retweet', True)
+        self.assertEqual([3, 5], frame.filter(mask).values('id'))
+        self.assertEqual([1, 4], frame.filter(
+            frame.isin('lang', ['zh', 'ja', 'fr'])).values('id'))
+        self.assertEqual([2], frame.filter(
+            frame.equals('lang', None)).values('id'))
+        self.assertEqual([0, 3], frame.filter(
+            frame.between('in_reply_to_user_id', 0)).values('id'))
+        self.assertFalse(frame.equals('lang', 'fr').any())
+
+    def test_sort(self):
+        frame = TweetFrame.from_tweets(get_tweets())
+        self.assertEqual([2, 0, 3, 5, 4, 1],
+                         frame.sort('lang').values('id'))
+        self.assertEqual([1, 4, 0, 3, 5, 2],
+                         frame.sort('lang', descending=True).values('id'))
+        self.assertEqual([5, 4, 3, 2, 1, 0],
+                         frame.sort('created_at', descending=True)
+                         .values('id'))
+
+    def test_count_by(self):
+        frame = TweetFrame.from_tweets(get_tweets())
+        self.assertEqual({'en': 3, 'zh': 1, None: 1, 'ja': 1},
+                         frame.count_by('lang'))
+        self.assertEqual(['en', None, 'zh', 'ja'],
+                         list(frame.count_by('lang')))
+        self.assertEqual({datetime(2021, 1, 1): 2, datetime(2021, 1, 2): 2,
+                          datetime(2021, 1, 3): 2},
+                         frame.count_by('created_at', timedelta(days=1)))
+        with self.assertRaises(ValueError):
+            frame.count_by('lang', timedelta(days=1))
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+import random
+import unittest
+
+from data_structures.twitter_threads import ThreadIndex
+from tests.helpers import get_tweet
+
+
+def get_reply(id: int, author_id: int, minutes: int,
+              in_reply_to_user_id=None, conversation_id=1, **kwargs):
+    return get_tweet(
+        id, author_id=author_id, conversation_id=conversation_id,
+        created_at=datetime(2021, 1, 1) + timedelta(minutes=minutes),
+        in_reply_to_user_id=in_reply_to_user_id,
+        is_reply=in_reply_to_user_id is not None, **kwargs)
+
+
+def get_tweets():
+    # 10 replied to by 20 and 30, 10 answers 20, 20 answers back
+    return [
+        get_reply(1, 10, 0),
+        get_reply(2, 20, 1, 10),
+        get_reply(3, 30, 2, 10),
+        get_reply(4, 10, 3, 20),
+        get_reply(5, 20, 4, 10),
+        get_reply(6, 40, 0, conversation_id=6),
+    ]
+
+
+class TestThreadIndex(unittest.TestCase):
+
+    def test_groups_and_stats(self):
+        index = ThreadIndex(get_tweets())
+        self.assertEqual(2, len(index))
+        thread = index[1]
+        self.assertEqual(5, thread.size)
+        self.assertEqual({10, 20, 30}, thread.participants)
+        self.assertEqual(timedelta(minutes=4), thread.time_span)
+        self.assertEqual(2, thread.replies[(20, 10)])
+        self.assertEqual({1: None, 2: 1, 3: 1, 4: 2, 5: 4}, thread.parents)
+        self.assertEqual(3, thread.depth)
+        self.assertEqual([2, 3], thread.children(1))
+        self.assertEqual(0, index[6].depth)
+        self.assertEqual([thread, index[6]], index.largest(2))
+
+    def test_incremental(self):
+        tweets = get_tweets()
+        index = ThreadIndex(tweets[:2])
+        self.assertEqual(1, index[1].depth)
+        # arriving out of order, and again
+        index.update(reversed(tweets))
+        self.assertEqual(5, len(index[1]))
+        self.assertEqual(3, index[1].depth)
+        # an explicit parent wins over the guess
+        index.add(get_reply(7, 30, 5, 20, in_reply_to_tweet_id='2'))
+        index.add(get_reply(8, 30, 6, 20, referenced_tweets=[
+            {'type': 'replied_to', 'id': 5}]))
+        self.assertEqual(2, index[1].parents[7])
+        self.assertEqual(5, index[1].parents[8])
+        self.assertEqual(4, index[1].depth)
+
+    def test_in_order_adds_extend_structure(self):
+        tweets = get_tweets()[:5]
+        index = ThreadIndex(tweets[:2])
+        thread = index[1]
+        parents = thread.parents
+        index.update(tweets[2:])
+        # placed without working the thread out again
+        self.assertIs(parents, thread.parents)
+        self.assertEqual({1: None, 2: 1, 3: 1, 4: 2, 5: 4}, thread.parents)
+        self.assertEqual({1: 0, 2: 1, 3: 1, 4: 2, 5: 3}, thread.depths)
+        self.assertEqual([2, 3], thread.children(1))
+        self.assertEqual([5], thread.children(4))
+        self.assertEqual([], thread.children(5))
+
+    def test_same_as_rebuild(self):
+        rng = random.Random(0)
+        tweets = [get_reply(1, 10, 0)]
+        for ix in range(2, 60):
+            kwargs = {}
+            if rng.random() < 0.3:
+                kwargs['in_reply_to_tweet_id'] = rng.randint(1, 70)
+            tweets.append(get_reply(ix, rng.choice([10, 20, 30]),
+                                    rng.randint(0, 40), rng.choice([10, 20]),
+                                    **kwargs))
+        for _ in range(5):
+            rng.shuffle(tweets)
+            index = ThreadIndex()
+            for tweet in tweets:
+                index.add(tweet)
+                if rng.random() < 0.2:
+                    index[1].depth
+            expected = ThreadIndex(tweets)[1]
+            thread = index[1]
+            self.assertEqual(expected.parents, thread.parents)
+            self.assertEqual(expected.depths, thread.depths)
+            for tweet_id in expected.parents:
+                self.assertEqual(expected.children(tweet_id),
+                                 thread.children(tweet_id))
+
+    def test_without_root_or_conversation(self):
+        index = ThreadIndex([get_reply(2, 20, 1, 10, conversation_id=None),
+                             get_reply(3, 30, 2, 10, conversation_id=9)])
+        self.assertEqual([2, 9], [x.conversation_id for x in index])
+        self.assertIsNone(index[9].root)
+        self.assertEqual({3: None}, index[9].parents)